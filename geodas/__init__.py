@@ -45,8 +45,11 @@ pkg_resources.require("bottleneck>=0.6.0")
 pkg_resources.require("pandas>=0.9.0")
 
 
-from core.gridded_array import gridded_array, ones, empty
+from core.gridded_array import gridded_array, ones, empty, shared_empty, \
+                               release_shared
 from core.slicing import get_slice, resample, select
+from core.alignment import align
+from core.curvilinear import CurvilinearGrid
 
 from io import read_gdal, read_hdf4, read_hdf5, read_netcdf4
 from io import write_netcdf
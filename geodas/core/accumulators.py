@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+#
+# geodas - Geospatial Data Analysis in Python
+#
+# :Author:    Andreas Hilboll <andreas@hilboll.de>
+# :Date:      Wed Jan 23 11:45:02 2013
+# :Website:   http://andreas-h.github.com/geodas/
+# :License:   GPLv3
+# :Version:   0.1
+# :Copyright: (c) 2012-2013 Andreas Hilboll <andreas@hilboll.de>
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Library imports
+# ============================================================================
+
+import numpy as np
+
+from geodas.core.coordinate import CoordinateArray, CoordinateSet
+from geodas.core.gridded_array import gridded_array
+
+
+# Definition of the ``Accumulator`` base class
+# ============================================================================
+
+class Accumulator(object):
+    """Base class for statistics which are accumulated block by block
+
+    ``gridded_array`` objects are fed into an accumulator one after the
+    other using ``add``; only the running statistics are kept in memory.
+    Partial results, e.g. from different workers, can be combined with
+    ``merge``.
+
+    Parameters
+    ----------
+    axis : str
+        the name of the dimension to reduce. All blocks need to have this
+        dimension (with any length), and identical coordinates along all
+        other dimensions. If ``None``, every block is treated as one
+        sample, and all blocks need to have identical coordinates.
+
+    """
+
+    def __init__(self, axis=None):
+        self.axis = axis
+        self.coordinates = None
+        self.title = ""
+
+    def _check_coordinates(self, coordinates):
+        if self.coordinates is None:
+            self.coordinates = coordinates
+        elif not self.coordinates.equals(coordinates):
+            raise ValueError("The coordinates of the data you passed don't "
+                             "match the coordinates of the data I "
+                             "accumulated so far.")
+
+    def add(self, gdata):
+        """Add the data of the ``gridded_array`` ``gdata``"""
+        if self.axis is None:
+            data = gdata.filled()[np.newaxis]
+            coordinates = gdata.coordinates
+        else:
+            axis = gdata.coordinates.axis(self.axis)
+            data = np.rollaxis(gdata.filled(), axis)
+            coordinates = gdata.coordinates.drop(axis)
+        self._check_coordinates(coordinates)
+        if not self.title:
+            self.title = gdata.title
+        self._add(data)
+        return self
+
+    def merge(self, other):
+        """Merge the statistics accumulated by ``other`` into this
+        accumulator"""
+        if type(other) is not type(self):
+            raise ValueError("I can only merge accumulators of the same "
+                             "type")
+        if other.coordinates is None:
+            return self
+        self._check_coordinates(other.coordinates)
+        self._merge(other)
+        return self
+
+    def _result(self, data):
+        if self.coordinates is None:
+            raise ValueError("You didn't add any data yet")
+        return gridded_array(data, self.coordinates, self.title)
+
+
+# Mean and variance
+# ============================================================================
+
+class MeanAccumulator(Accumulator):
+    """Accumulate count, mean and variance, ignoring NaNs
+
+    The blocks are combined with the parallel variant of Welford's
+    algorithm, which is numerically stable even for long time series.
+
+    """
+
+    def _update(self, count, mean, m2):
+        if not hasattr(self, '_count'):
+            self._count = count
+            self._mean = mean
+            self._m2 = m2
+            return
+        total = self._count + count
+        with np.errstate(invalid='ignore', divide='ignore'):
+            frac = np.where(total > 0, count / total.astype(float), 0.)
+        delta = mean - self._mean
+        self._mean += delta * frac
+        self._m2 += m2 + delta * delta * self._count * frac
+        self._count = total
+
+    def _add(self, data):
+        valid = ~np.isnan(data)
+        count = valid.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = (np.where(valid, data, 0.).sum(axis=0, dtype=float) /
+                    count)
+        mean[count == 0] = 0.
+        dev = np.where(valid, data - mean, 0.)
+        m2 = (dev * dev).sum(axis=0)
+        self._update(count, mean, m2)
+
+    def _merge(self, other):
+        self._update(other._count.copy(), other._mean.copy(),
+                     other._m2.copy())
+
+    def count(self):
+        """The number of valid values"""
+        return self._result(self._count.copy())
+
+    def mean(self):
+        return self._result(np.where(self._count > 0, self._mean, np.nan))
+
+    def var(self, ddof=0):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            var = self._m2 / (self._count - ddof)
+        return self._result(np.where(self._count > ddof, var, np.nan))
+
+    def std(self, ddof=0):
+        res = self.var(ddof)
+        res.data = np.sqrt(res.data)
+        return res
+
+
+# Minimum and maximum
+# ============================================================================
+
+class MinMaxAccumulator(Accumulator):
+    """Accumulate minimum and maximum, ignoring NaNs"""
+
+    def _update(self, dmin, dmax):
+        if not hasattr(self, '_min'):
+            self._min = dmin
+            self._max = dmax
+        else:
+            np.fmin(self._min, dmin, out=self._min)
+            np.fmax(self._max, dmax, out=self._max)
+
+    def _add(self, data):
+        self._update(np.fmin.reduce(data, axis=0).astype(float),
+                     np.fmax.reduce(data, axis=0).astype(float))
+
+    def _merge(self, other):
+        self._update(other._min.copy(), other._max.copy())
+
+    def min(self):
+        return self._result(self._min.copy())
+
+    def max(self):
+        return self._result(self._max.copy())
+
+
+# Number of valid values
+# ============================================================================
+
+class CountAccumulator(Accumulator):
+    """Accumulate the number of valid (not NaN) values"""
+
+    def _add(self, data):
+        self._add_count((~np.isnan(data)).sum(axis=0))
+
+    def _merge(self, other):
+        self._add_count(other._count)
+
+    def _add_count(self, count):
+        if not hasattr(self, '_count'):
+            self._count = count.copy()
+        else:
+            self._count += count
+
+    def count(self):
+        return self._result(self._count.copy())
+
+
+# Histograms
+# ============================================================================
+
+class HistogramAccumulator(Accumulator):
+    """Accumulate a histogram of the values at every grid point
+
+    Parameters
+    ----------
+    bins : array_like
+        the bin edges; as in ``numpy.histogram``, all bins but the last are
+        half-open, and values outside the bins are ignored
+
+    axis : str
+
+    """
+
+    def __init__(self, bins, axis=None):
+        Accumulator.__init__(self, axis)
+        self.bins = np.asarray(bins, dtype=float)
+        if self.bins.ndim != 1 or self.bins.size < 2 or \
+                                        np.any(np.diff(self.bins) <= 0):
+            raise ValueError("The bin edges need to be a monotonically "
+                             "increasing array of at least two values")
+
+    def _add(self, data):
+        nbins = self.bins.size - 1
+        npoints = int(np.prod(data.shape[1:]))
+        idx = np.searchsorted(self.bins, data, side='right') - 1
+        # the last bin includes its right edge
+        idx[data == self.bins[-1]] = nbins - 1
+        valid = (idx >= 0) & (idx < nbins) & ~np.isnan(data)
+        flat = idx * npoints + np.arange(npoints).reshape(data.shape[1:])
+        counts = np.bincount(flat[valid], minlength=nbins * npoints)
+        self._add_counts(counts.reshape((nbins, ) + data.shape[1:]))
+
+    def _add_counts(self, counts):
+        if not hasattr(self, '_counts'):
+            self._counts = counts.copy()
+        else:
+            self._counts += counts
+
+    def _merge(self, other):
+        if not np.array_equal(self.bins, other.bins):
+            raise ValueError("I can only merge histograms with the same "
+                             "bins")
+        self._add_counts(other._counts)
+
+    def histogram(self):
+        """The histogram counts, with an additional leading ``bin``
+        dimension holding the bin centers"""
+        if self.coordinates is None:
+            raise ValueError("You didn't add any data yet")
+        centers = CoordinateArray(.5 * (self.bins[1:] + self.bins[:-1]),
+                                  'bin')
+        coordinates = CoordinateSet([('bin', centers)] +
+                                    list(self.coordinates.items()))
+        return gridded_array(self._counts.copy(), coordinates, self.title)
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+#
+# geodas - Geospatial Data Analysis in Python
+#
+# :Author:    Andreas Hilboll <andreas@hilboll.de>
+# :Date:      Wed Jan 23 11:45:02 2013
+# :Website:   http://andreas-h.github.com/geodas/
+# :License:   GPLv3
+# :Version:   0.1
+# :Copyright: (c) 2012-2013 Andreas Hilboll <andreas@hilboll.de>
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Library imports
+# ============================================================================
+
+from geodas.core.coordinate import CoordinateSet, as_coordinate, \
+                                   get_common_range
+
+
+# Alignment plans
+# ============================================================================
+
+class AlignmentPlan(object):
+    """How to combine two data arrays with the coordinates ``first`` and
+    ``second``
+
+    The dimensions of the result are those of ``first``, followed by the
+    dimensions only present in ``second``. Common dimensions are matched by
+    name and restricted to the range covered by both arrays; missing
+    dimensions are broadcast. Applying a plan only involves basic slicing,
+    transposition and adding new axes, so the aligned arrays are views.
+
+    Parameters
+    ----------
+    first, second : CoordinateSet
+
+    """
+
+    def __init__(self, first, second):
+        dims = list(first.dims) + [d for d in second.dims if d not in first]
+        slices_first, slices_second = {}, {}
+        coords = []
+        for dim in dims:
+            if dim in first and dim in second:
+                cfirst = as_coordinate(first[dim], dim)
+                csecond = as_coordinate(second[dim], dim)
+                if cfirst.equals(csecond):
+                    slices_first[dim] = slices_second[dim] = slice(None)
+                    coords.append((dim, first[dim]))
+                    continue
+                range_first, range_second = get_common_range((cfirst,
+                                                              csecond))
+                slices_first[dim] = slice(*range_first)
+                slices_second[dim] = slice(*range_second)
+                coord = first[dim][slices_first[dim]]
+                if not as_coordinate(coord, dim).equals(
+                                          second[dim][slices_second[dim]]):
+                    raise ValueError("The coordinates of dimension '%s' "
+                                     "don't match, and I cannot align them "
+                                     "by restricting them to a common "
+                                     "range." % dim)
+                coords.append((dim, coord))
+            elif dim in first:
+                slices_first[dim] = slice(None)
+                coords.append((dim, first[dim]))
+            else:
+                slices_second[dim] = slice(None)
+                coords.append((dim, second[dim]))
+        self.coordinates = CoordinateSet(coords)
+        self.index_first = (tuple(slices_first[d] for d in first.dims) +
+                            (None, ) * (len(dims) - len(first)))
+        self.index_second = tuple(slices_second[d] for d in second.dims)
+        self.transpose_second = sorted(range(len(second)),
+                                       key=lambda i: dims.index(
+                                                     second.dims[i]))
+        self.expand_second = tuple(slice(None) if d in second else None
+                                   for d in dims)
+
+    def apply(self, first, second):
+        """Return views of the data arrays ``first`` and ``second`` which
+        broadcast against each other"""
+        return self.align_first(first), self.align_second(second)
+
+    def align_first(self, first):
+        """Return a view of the data array ``first``, aligned to the
+        coordinates of the result"""
+        return first[self.index_first]
+
+    def align_second(self, second):
+        """Return a view of the data array ``second``, aligned to the
+        coordinates of the result"""
+        second = second[self.index_second].transpose(self.transpose_second)
+        return second[self.expand_second]
+
+
+_plan_cache = {}
+_plan_cache_size = 64
+
+
+def get_alignment_plan(first, second):
+    """Get the (cached) ``AlignmentPlan`` for the coordinates ``first`` and
+    ``second``
+
+    Plans are cached by the identity of the coordinate objects, so
+    repeated operations between arrays on the same grids don't need to
+    compare coordinate values again.
+
+    """
+    key = (tuple((k, id(v)) for k, v in first.items()),
+           tuple((k, id(v)) for k, v in second.items()))
+    entry = _plan_cache.get(key)
+    if entry is None:
+        if len(_plan_cache) >= _plan_cache_size:
+            _plan_cache.clear()
+        # keep references to the coordinates, so that their ids cannot be
+        # reused while the plan is cached
+        entry = (AlignmentPlan(first, second),
+                 list(first.values()) + list(second.values()))
+        _plan_cache[key] = entry
+    return entry[0]
+
+
+# Aligning several gridded arrays
+# ============================================================================
+
+def align(*arrays, **kwargs):
+    """Restrict several ``gridded_array`` objects to their common range
+
+    Each dimension present in more than one of the arrays is matched by name
+    and sliced to the range covered by all arrays having it. Dimensions are
+    not reordered or added, and the results are copy-on-write views on the
+    data of ``arrays``, so no data is copied. Finding the common ranges
+    takes O(log n) time per dimension and array.
+
+    Parameters
+    ----------
+    arrays : gridded_array
+
+    join : str
+        ``'inner'`` (the default) to restrict the arrays to their common
+        range, or ``'exact'`` to raise a ``ValueError`` if the coordinates
+        of the arrays differ
+
+    Returns
+    -------
+    out : list of gridded_array
+
+    """
+    join = kwargs.pop('join', 'inner')
+    if kwargs:
+        raise TypeError("align() got an unexpected keyword argument '%s'" %
+                        list(kwargs.keys())[0])
+    if join not in ('inner', 'exact'):
+        raise ValueError("You asked me to align gridded arrays with the join "
+                         "method '%s', but I only know 'inner' and 'exact'" %
+                         join)
+    dims = []
+    for gdata in arrays:
+        dims.extend(d for d in gdata.coordinates.dims if d not in dims)
+    ranges = [{} for gdata in arrays]
+    for dim in dims:
+        members = [i for i, gdata in enumerate(arrays)
+                   if dim in gdata.coordinates]
+        if len(members) < 2:
+            continue
+        coords = [as_coordinate(arrays[i].coordinates[dim], dim)
+                  for i in members]
+        if all(c is coords[0] or c.equals(coords[0]) for c in coords[1:]):
+            continue
+        if join == 'exact':
+            raise ValueError("The coordinates of dimension '%s' differ, and "
+                             "you asked me not to align them" % dim)
+        common = get_common_range(coords)
+        first = coords[0][slice(*common[0])]
+        for i, c, r in zip(members, coords, common):
+            if not as_coordinate(c[slice(*r)], dim).equals(first):
+                raise ValueError("The coordinates of dimension '%s' don't "
+                                 "match, and I cannot align them by "
+                                 "restricting them to a common range." % dim)
+            if r != (0, c.size):
+                ranges[i][dim] = slice(*r)
+    res = []
+    for gdata, rng in zip(arrays, ranges):
+        if not rng:
+            res.append(gdata._share(gdata.data,
+                                    CoordinateSet(gdata.coordinates),
+                                    gdata.valid, gdata.grid))
+            continue
+        coordinates = gdata.coordinates
+        for dim, sl in rng.items():
+            coordinates = coordinates.replace(dim, coordinates[dim][sl])
+        index = tuple(rng.get(d, slice(None)) for d in coordinates.dims)
+        valid = gdata.valid[index] if gdata.valid is not None else None
+        grid = gdata.grid.take(rng) if gdata.grid is not None else None
+        res.append(gdata._share(gdata.data[index], coordinates, valid, grid))
+    return res
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+#
+# geodas - Geospatial Data Analysis in Python
+#
+# :Author:    Andreas Hilboll <andreas@hilboll.de>
+# :Date:      Wed Jan 23 11:45:02 2013
+# :Website:   http://andreas-h.github.com/geodas/
+# :License:   GPLv3
+# :Version:   0.1
+# :Copyright: (c) 2012-2013 Andreas Hilboll <andreas@hilboll.de>
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Library imports
+# ============================================================================
+
+import hashlib
+
+import numpy as np
+
+from geodas.core.coordinate import RegularCoordinateArray
+
+
+"""The mean radius of the earth, in m"""
+EARTH_RADIUS = 6371007.2
+
+
+# Grid cell boundaries
+# ============================================================================
+
+def cell_bounds(coord, lower=None, upper=None):
+    """Get the ``size + 1`` grid cell boundaries of a centered coordinate
+
+    The boundaries are placed half-way between the grid points; the outer
+    boundaries are extrapolated, and optionally clipped to
+    ``[lower, upper]``.
+
+    """
+    if isinstance(coord, RegularCoordinateArray):
+        bounds = (coord.start - .5 * coord.step +
+                  coord.step * np.arange(coord.size + 1))
+    else:
+        values = np.asarray(coord, dtype=float)
+        if values.size == 1:
+            raise ValueError("I cannot guess the cell boundaries of a "
+                             "coordinate with only one grid point")
+        bounds = np.empty(values.size + 1)
+        bounds[1:-1] = .5 * (values[1:] + values[:-1])
+        bounds[0] = values[0] - .5 * (values[1] - values[0])
+        bounds[-1] = values[-1] + .5 * (values[-1] - values[-2])
+    if lower is not None or upper is not None:
+        bounds = np.clip(bounds, lower, upper)
+    return bounds
+
+
+# Cell area weights, cached per coordinate
+# ============================================================================
+
+_weights_cache = {}
+_weights_cache_size = 64
+
+
+def _coordinate_key(coord):
+    """A hashable key identifying the values of ``coord``"""
+    if isinstance(coord, RegularCoordinateArray):
+        return ('regular', coord.start, coord.step, coord.size)
+    values = np.ascontiguousarray(coord, dtype=float)
+    return ('array', values.size, hashlib.md5(values.tostring()).hexdigest())
+
+
+def _area_weights(coord, kind):
+    """Get the one-dimensional area factor of a latitude or longitude
+    coordinate
+
+    For ``kind == 'latitude'``, this is the difference of the sines of the
+    cell boundaries, for ``kind == 'longitude'`` the cell width in
+    radians. The area of a grid cell is the product of both factors times
+    the squared earth radius.
+
+    """
+    key = (kind, _coordinate_key(coord))
+    if key not in _weights_cache:
+        if kind == 'latitude':
+            bounds = np.deg2rad(cell_bounds(coord, -90., 90.))
+            weights = np.abs(np.diff(np.sin(bounds)))
+        elif kind == 'longitude':
+            weights = np.abs(np.diff(np.deg2rad(cell_bounds(coord))))
+        else:
+            raise ValueError("I can only calculate area weights for "
+                             "latitude and longitude coordinates")
+        if len(_weights_cache) >= _weights_cache_size:
+            _weights_cache.clear()
+        weights.flags.writeable = False
+        _weights_cache[key] = weights
+    return _weights_cache[key]
+
+
+def cell_area(latitude, longitude, radius=EARTH_RADIUS):
+    """Get the area of all grid cells of a rectilinear lat/lon grid
+
+    Parameters
+    ----------
+    latitude, longitude : array_like
+        the (centered) grid point coordinates, in degrees
+
+    radius : float
+        the radius of the sphere; by default, the earth's mean radius in m
+
+    Returns
+    -------
+    area : numpy.ndarray
+        the cell areas, with shape ``(latitude.size, longitude.size)``
+
+    """
+    return (radius ** 2 * np.outer(_area_weights(latitude, 'latitude'),
+                                   _area_weights(longitude, 'longitude')))
+
+
+# Area-weighted reductions
+# ============================================================================
+
+def weighted_sum(data, weights, axes, normalize=False, blocksize=2 ** 22):
+    """Calculate the NaN-ignoring weighted sum of ``data`` over ``axes``
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+
+    weights : list of numpy.ndarray
+        one-dimensional weights, one array for each axis in ``axes``
+
+    axes : list of int
+
+    normalize : bool
+        if ``True``, divide by the sum of the weights of all valid
+        elements, i.e., calculate the weighted mean
+
+    blocksize : int
+        the approximate number of data elements processed at once; this
+        limits the size of the temporary arrays
+
+    Returns
+    -------
+    out : numpy.ndarray
+        the result, with ``axes`` removed
+
+    """
+    keep = [i for i in range(data.ndim) if i not in axes]
+    # the weights of all reduced elements, in the order of ``axes``
+    order = np.argsort(axes)
+    w = np.ones(1)
+    for i in order:
+        w = np.multiply.outer(w, weights[i]).ravel()
+    data = data.transpose(keep + sorted(axes))
+    outshape = data.shape[:len(keep)]
+    data = data.reshape((-1, w.size))
+    num = np.empty(data.shape[0])
+    den = np.empty(data.shape[0])
+    step = max(1, blocksize // max(w.size, 1))
+    for start in range(0, data.shape[0], step):
+        block = data[start:start + step]
+        valid = ~np.isnan(block)
+        np.dot(np.where(valid, block, 0.), w, out=num[start:start + step])
+        np.dot(valid.astype(w.dtype), w, out=den[start:start + step])
+    if not normalize:
+        num[den == 0] = np.nan
+        return num.reshape(outshape)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (num / den).reshape(outshape)
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+#
+# geodas - Geospatial Data Analysis in Python
+#
+# :Author:    Andreas Hilboll <andreas@hilboll.de>
+# :Date:      Wed Jan 23 11:45:02 2013
+# :Website:   http://andreas-h.github.com/geodas/
+# :License:   GPLv3
+# :Version:   0.1
+# :Copyright: (c) 2012-2013 Andreas Hilboll <andreas@hilboll.de>
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Library imports
+# ============================================================================
+
+import numpy as np
+
+from geodas.core.coordinate import CoordinateArray, CoordinateSet, \
+                                   intern_coordinates
+from geodas.core.gridded_array import gridded_array
+
+
+# Definition of the ``GriddedBatch`` class
+# ============================================================================
+
+class GriddedBatch(object):
+    """Many small gridded arrays with equal coordinates, in one data block
+
+    Holding e.g. hundreds of thousands of station time series as separate
+    ``gridded_array`` objects spends most of the memory on per-object
+    overhead. A ``GriddedBatch`` stores the data of all members in one
+    contiguous array with a leading member axis, and one (interned)
+    ``CoordinateSet`` for all of them. Indexing with an integer returns a
+    ``gridded_array`` whose data is a view into the block.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        array of shape ``(n, ) + coordinates.shape``
+
+    coordinates : CoordinateSet
+        the coordinates of each member
+
+    titles : sequence of str
+        the titles of the members
+
+    """
+
+    __slots__ = ('data', 'coordinates', 'titles')
+
+    def __init__(self, data, coordinates, titles=None):
+        coordinates = intern_coordinates(CoordinateSet(coordinates))
+        if data.shape[1:] != coordinates.shape:
+            raise ValueError("The data of a batch needs to have the shape "
+                             "(n, ) + %s, not %s" % (coordinates.shape,
+                                                     data.shape))
+        if titles is not None and len(titles) != data.shape[0]:
+            raise ValueError("I need one title for each of the %d members "
+                             "of the batch" % data.shape[0])
+        self.data = data
+        self.coordinates = coordinates
+        self.titles = titles
+
+    @classmethod
+    def empty(cls, n, coordinates, dtype=float):
+        """A batch of ``n`` members filled with NaN (or uninitialized, for
+        integer ``dtype``)"""
+        coordinates = CoordinateSet(coordinates)
+        shape = (n, ) + coordinates.shape
+        if np.issubdtype(np.dtype(dtype), np.inexact):
+            data = np.full(shape, np.nan, dtype=dtype)
+        else:
+            data = np.empty(shape, dtype=dtype)
+        return cls(data, coordinates)
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Collect the ``gridded_array`` objects ``arrays``, which need to
+        have equal coordinates, into one batch"""
+        arrays = list(arrays)
+        if not arrays:
+            raise ValueError("I cannot create a batch without members")
+        coordinates = arrays[0].coordinates
+        for gdata in arrays[1:]:
+            if not gdata.coordinates.equals(coordinates):
+                raise ValueError("All members of a batch need to have the "
+                                 "same coordinates")
+        values = [a.filled() for a in arrays]
+        dtype = np.result_type(*set(v.dtype for v in values))
+        data = np.empty((len(arrays), ) + coordinates.shape, dtype=dtype)
+        for i, v in enumerate(values):
+            data[i] = v
+        return cls(data, coordinates, [a.title for a in arrays])
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            titles = self.titles[key] if self.titles is not None else None
+            return GriddedBatch(self.data[key], self.coordinates, titles)
+        title = self.titles[key] if self.titles is not None else ""
+        return gridded_array(self.data[key], self.coordinates, title)
+
+    def __setitem__(self, key, gdata):
+        if not gdata.coordinates.equals(self.coordinates):
+            raise ValueError("You asked me to store data with coordinates "
+                             "%s in a batch with coordinates %s, but I "
+                             "don't know how to do that" %
+                             (gdata.coordinates.dims, self.coordinates.dims))
+        self.data[key] = gdata.filled()
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def as_gridded_array(self, name='member'):
+        """Return all members as one ``gridded_array``, with a leading axis
+        ``name``"""
+        members = CoordinateArray(np.arange(len(self)), name)
+        coordinates = CoordinateSet([(name, members)] +
+                                    list(self.coordinates.items()))
+        return gridded_array(self.data, coordinates)
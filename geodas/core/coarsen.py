@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+#
+# geodas - Geospatial Data Analysis in Python
+#
+# :Author:    Andreas Hilboll <andreas@hilboll.de>
+# :Date:      Wed Jan 23 11:45:02 2013
+# :Website:   http://andreas-h.github.com/geodas/
+# :License:   GPLv3
+# :Version:   0.1
+# :Copyright: (c) 2012-2013 Andreas Hilboll <andreas@hilboll.de>
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Library imports
+# ============================================================================
+
+import bottleneck as bn
+import numpy as np
+
+from geodas.core.coordinate import RegularCoordinateArray, as_coordinate
+from geodas.core.gridded_array import gridded_array, _nancount
+from geodas.core.parallel import parallel_reduce
+
+
+# Reductions of blocks
+# ============================================================================
+
+"""Reductions which can be applied to the blocks one axis after the other,
+with the function to reduce each block axis, and the function to combine
+the partial results along the following axes"""
+_separable = {
+              'sum' : (bn.nansum, bn.nansum),
+              'min' : (bn.nanmin, bn.nanmin),
+              'max' : (bn.nanmax, bn.nanmax),
+              'count' : (_nancount, bn.nansum),
+             }
+
+"""Reductions which need all values of a block at once"""
+_blockwise = {
+              'median' : bn.nanmedian,
+              'std' : bn.nanstd,
+              'var' : bn.nanvar,
+             }
+
+
+def _reduce_blocks(func, data, axis, factor, boundary, nthreads):
+    """Reduce blocks of ``factor`` elements along ``axis`` of ``data``
+
+    The full blocks are reduced in one call on a view of shape
+    ``(..., nblocks, factor, ...)``; a ragged block at the end is reduced
+    separately (``boundary == 'pad'``) or dropped (``boundary == 'trim'``).
+
+    """
+    nblocks, rest = divmod(data.shape[axis], factor)
+    index = [slice(None)] * data.ndim
+    index[axis] = slice(0, nblocks * factor)
+    main = data[tuple(index)]
+    main = main.reshape(data.shape[:axis] + (nblocks, factor) +
+                        data.shape[axis + 1:])
+    res = parallel_reduce(func, main, axis + 1, nthreads)
+    if rest and boundary == 'pad':
+        index[axis] = slice(nblocks * factor, None)
+        last = func(data[tuple(index)], axis=axis)
+        res = np.concatenate([res, np.expand_dims(last, axis)], axis=axis)
+    return res
+
+
+def _pad(data, axes, factors):
+    """Pad ``data`` with NaN along ``axes`` to multiples of ``factors``"""
+    shape = list(data.shape)
+    for axis, factor in zip(axes, factors):
+        shape[axis] = -(-shape[axis] // factor) * factor
+    if tuple(shape) == data.shape:
+        return data
+    res = np.full(shape, np.nan, dtype=np.result_type(data.dtype, float))
+    res[tuple(slice(0, n) for n in data.shape)] = data
+    return res
+
+
+def _block_centres(coord, name, factor, boundary):
+    """The centres of the blocks of ``factor`` elements of ``coord``"""
+    nblocks, rest = divmod(coord.size, factor)
+    if isinstance(coord, RegularCoordinateArray) and (not rest or
+                                                      boundary == 'trim'):
+        return RegularCoordinateArray(coord.start +
+                                      .5 * (factor - 1) * coord.step,
+                                      coord.step * factor, nblocks,
+                                      name, coord.units)
+    values = np.asarray(coord)
+    if rest and boundary == 'pad':
+        nblocks += 1
+    first = values[np.arange(nblocks) * factor]
+    last = values[np.minimum(np.arange(1, nblocks + 1) * factor,
+                             values.size) - 1]
+    if np.issubdtype(values.dtype, np.datetime64):
+        centres = (first.view('i8') + (last.view('i8') -
+                                       first.view('i8')) // 2)
+        centres = centres.view(values.dtype)
+    else:
+        centres = first + .5 * (last - first)
+    return as_coordinate(centres, name, getattr(coord, 'units', None))
+
+
+# Coarsening of ``gridded_array`` objects
+# ============================================================================
+
+def coarsen(gdata, how='mean', boundary='pad', nthreads=None, **factors):
+    """Reduce blocks of neighbouring grid cells to single values, e.g.::
+
+        coarsen(gdata, latitude=10, longitude=10)
+
+    gives a 1 degree version of data on a 0.1 degree grid.
+
+    The data array is reshaped into blocks as a view, and the blocks are
+    reduced with the NaN-ignoring bottleneck functions. The sum, mean,
+    minimum, maximum and count are computed one block axis after the
+    other, without copying the data; the median, standard deviation and
+    variance need the blocks as contiguous arrays, which are copied. The
+    coordinates of the result are the centres of the blocks.
+
+    Parameters
+    ----------
+    gdata : gridded_array
+
+    how : str
+        ``'mean'``, ``'sum'``, ``'min'``, ``'max'``, ``'count'``,
+        ``'median'``, ``'std'`` or ``'var'``
+
+    boundary : str
+        what to do if a dimension isn't a multiple of its factor:
+        ``'pad'`` reduces the remaining cells to a smaller last block,
+        ``'trim'`` drops them
+
+    nthreads : int
+        the number of threads, see ``geodas.core.parallel.parallel_reduce``
+
+    factors : int
+        the number of grid cells per block, by dimension name
+
+    Returns
+    -------
+    out : gridded_array
+
+    """
+    if how not in _separable and how not in _blockwise and how != 'mean':
+        raise ValueError("You asked me to coarsen by calculating the %s, but "
+                         "I don't know how to do that" % how)
+    if boundary not in ('pad', 'trim'):
+        raise ValueError("You asked me to handle ragged blocks with '%s', "
+                         "but I only know 'pad' and 'trim'" % boundary)
+    coordinates = gdata.coordinates
+    axes, sizes = [], []
+    for dim, factor in factors.items():
+        if dim not in coordinates:
+            raise ValueError("You asked me to coarsen along %s, but I don't "
+                             "know anything about this coordinate "
+                             "dimension" % dim)
+        if int(factor) != factor or factor < 1:
+            raise ValueError("The coarsening factor of %s has to be a "
+                             "positive integer, not %r" % (dim, factor))
+        axes.append(coordinates.axis(dim))
+        sizes.append(int(factor))
+    data = gdata.filled()
+    if how in _blockwise:
+        if boundary == 'pad':
+            data = _pad(data, axes, sizes)
+        else:
+            index = [slice(None)] * data.ndim
+            for axis, factor in zip(axes, sizes):
+                index[axis] = slice(0, data.shape[axis] // factor * factor)
+            data = data[tuple(index)]
+        # split each coarsened axis into (blocks, cells) and move the cells
+        # to the end, where they are merged into one axis
+        shape, keep, cells = [], [], []
+        for i, n in enumerate(data.shape):
+            if i in axes:
+                factor = sizes[axes.index(i)]
+                keep.append(len(shape))
+                cells.append(len(shape) + 1)
+                shape.extend([n // factor, factor])
+            else:
+                keep.append(len(shape))
+                shape.append(n)
+        blocks = data.reshape(shape).transpose(keep + cells)
+        blocks = blocks.reshape(blocks.shape[:len(keep)] + (-1, ))
+        newdata = parallel_reduce(_blockwise[how], blocks, -1, nthreads)
+    elif how == 'mean':
+        total, count = data, data
+        for n, (axis, factor) in enumerate(zip(axes, sizes)):
+            total = _reduce_blocks(bn.nansum, total, axis, factor, boundary,
+                                   nthreads)
+            count = _reduce_blocks(_nancount if n == 0 else bn.nansum,
+                                   count, axis, factor, boundary, nthreads)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            newdata = total / count
+    else:
+        first, combine = _separable[how]
+        newdata = data
+        for n, (axis, factor) in enumerate(zip(axes, sizes)):
+            newdata = _reduce_blocks(first if n == 0 else combine, newdata,
+                                     axis, factor, boundary, nthreads)
+    newcoords = coordinates
+    for axis, factor in zip(axes, sizes):
+        dim = coordinates.name(axis)
+        newcoords = newcoords.replace(dim, _block_centres(coordinates[dim],
+                                                          dim, factor,
+                                                          boundary))
+    return gridded_array(newdata, newcoords, gdata.title,
+                         grid=gdata._grid_on(newcoords))
@@ -31,9 +31,15 @@ geodas - Geospatial Data Analysis in Python
 # ============================================================================
 
 from collections import OrderedDict
+import hashlib
+import numbers
+import weakref
 
 import numpy as np
 
+from geodas.core.pickling import get_slots_state, reduce_with_buffers, \
+                                 set_slots_state
+
 
 # Definition of the ``coordinateset`` class
 # ============================================================================
@@ -41,33 +47,156 @@ import numpy as np
 class CoordinateSet(OrderedDict):
     """Base class for a collection of all coordinates of a data variable
 
+    A ``CoordinateSet`` is an ``OrderedDict`` mapping the names of the data
+    variable's dimensions to their coordinate arrays, in the order of the
+    data array's axes. The mapping from names to axis numbers is cached, and
+    derived sets (with one axis dropped, replaced or the axes reordered)
+    share the coordinate objects instead of copying them.
+
+    Parameters
+    ----------
+    coordinates : OrderedDict or list of tuples
+        the ``(name, coordinate)`` pairs, in the order of the data axes
+
     """
 
 
 # Initialization of the ``coordinateset`` class
 # ----------------------------------------------------------------------------
 
-    def __init__(self, ):
-        """
-        Parameters
-        ----------
+    def __init__(self, *args, **kwargs):
+        # these need to exist before OrderedDict.__init__ calls __setitem__
+        self._axes = None
+        self._flags = {}
+        OrderedDict.__init__(self, *args, **kwargs)
+
+    def __setitem__(self, key, value, *args):
+        if key not in self:
+            self._axes = None
+        OrderedDict.__setitem__(self, key, value, *args)
+
+    def __delitem__(self, key, *args):
+        self._axes = None
+        OrderedDict.__delitem__(self, key, *args)
+
+# Axis lookup
+# ----------------------------------------------------------------------------
+
+    @property
+    def dims(self):
+        """The names of all dimensions, in axis order"""
+        return tuple(self.keys())
+
+    @property
+    def shape(self):
+        """The shape of a data array spanned by these coordinates"""
+        return tuple(np.size(c) for c in self.values())
+
+    def axis(self, dim):
+        """Return the axis number of dimension ``dim``
+
+        ``dim`` can be either the name of the dimension or its axis number
+        (negative numbers count from the end).
 
         """
-        # TODO: decide on calling signature, and properly call
-        #       OrderedDict's __init__()
+        if self._axes is None:
+            self._axes = dict((k, i) for i, k in enumerate(self.keys()))
+        if isinstance(dim, numbers.Integral):
+            if not -len(self) <= dim < len(self):
+                raise ValueError("Axis %d is out of range for %d "
+                                 "dimensions" % (dim, len(self)))
+            return dim % len(self)
+        try:
+            return self._axes[dim]
+        except KeyError:
+            raise ValueError("I don't know anything about the coordinate "
+                             "dimension %s" % (dim, ))
+
+    def name(self, dim):
+        """Return the name of dimension ``dim`` (name or axis number)"""
+        return self.dims[self.axis(dim)]
+
+    def equals(self, other):
+        """``True`` if ``other`` has the same dimensions, in the same order,
+        with the same coordinate values"""
+        if tuple(other.keys()) != self.dims:
+            return False
+        for dim, coord in self.items():
+            if not as_coordinate(coord, dim).equals(other[dim]):
+                return False
+        return True
+
+# Derived coordinate sets
+# ----------------------------------------------------------------------------
+
+    def drop(self, *dims):
+        """Return a new ``CoordinateSet`` without the dimensions ``dims``"""
+        names = set(self.name(d) for d in dims)
+        return CoordinateSet([(k, v) for k, v in self.items()
+                              if k not in names])
+
+    def replace(self, dim, coordinate):
+        """Return a new ``CoordinateSet`` where the coordinate of dimension
+        ``dim`` is replaced by ``coordinate``"""
+        name = self.name(dim)
+        return CoordinateSet([(k, coordinate if k == name else v)
+                              for k, v in self.items()])
+
+    def reorder(self, dims):
+        """Return a new ``CoordinateSet`` with the dimensions in the order
+        given by ``dims``"""
+        names = [self.name(d) for d in dims]
+        if sorted(names) != sorted(self.keys()):
+            raise ValueError("Reordering the coordinates %s to %s would "
+                             "change the dimensions" % (self.dims,
+                                                        tuple(names)))
+        return CoordinateSet([(k, self[k]) for k in names])
+
+# Cached properties of the individual coordinates
+# ----------------------------------------------------------------------------
+
+    def _flag(self, dim, key, func):
+        name = self.name(dim)
+        coord = self[name]
+        cached = self._flags.get((name, key))
+        # the flags are only valid for the very coordinate object they
+        # were computed for
+        if cached is None or cached[0] is not coord:
+            cached = (coord, func(coord))
+            self._flags[(name, key)] = cached
+        return cached[1]
+
+    def is_monotonic(self, dim):
+        """``True`` if the coordinate of ``dim`` is strictly monotonic"""
+        def _monotonic(coord):
+            if isinstance(coord, RegularCoordinateArray):
+                return True
+            diff = np.diff(np.asarray(coord))
+            zero = np.zeros((), dtype=diff.dtype)
+            return bool(np.all(diff > zero) or np.all(diff < zero))
+        return self._flag(dim, 'monotonic', _monotonic)
+
+    def is_regular(self, dim):
+        """``True`` if the coordinate of ``dim`` is equidistant"""
+        def _regular(coord):
+            if isinstance(coord, RegularCoordinateArray):
+                return True
+            return isinstance(as_coordinate(coord, None),
+                              RegularCoordinateArray)
+        return self._flag(dim, 'regular', _regular)
 
 
 # Definition of the ``CoordinateArray`` class
 # ============================================================================
 
-# TODO: write a DatetimeCoordinate(CoordinateArray) class
-
 class CoordinateArray(object):
     """Base class for a coordinate variable
 
-    Currently, the ``coordinate`` class is just a wrapper around
-    ``numpy.ndarray``, with some additional attributes. It doesn't *do*
-    anything yet.
+    The ``CoordinateArray`` class is a thin wrapper around a one-dimensional
+    ``numpy.ndarray``, with some additional attributes. It behaves like an
+    array in most places (``size``, ``shape``, indexing, ``min``/``max``,
+    ``numpy.asarray``), and knows how to translate coordinate values into
+    array indices.
 
     Parameters
     ----------
@@ -75,16 +204,18 @@ class CoordinateArray(object):
 
     name : str
 
-    unit : str
+    units : str
 
     centered : bool
 
     """
 
+    __slots__ = ('_data', 'name', 'units', '_centered', '__weakref__')
+
 # Initialization of the ``CoordinateArray`` class
 # ----------------------------------------------------------------------------
 
-    def __init__(self, data, name, units, centered=True):
+    def __init__(self, data, name, units=None, centered=True):
         """
 
         """
@@ -94,26 +225,527 @@ class CoordinateArray(object):
         self.units = units
         self._centered = centered
 
+    def _derive(self, data):
+        """Return a new coordinate of the same kind holding ``data``"""
+        return CoordinateArray(data, self.name, self.units, self._centered)
+
+    def __reduce_ex__(self, protocol):
+        # with protocol 5, the values are pickled out-of-band
+        res = reduce_with_buffers(self, protocol, self.__getstate__(),
+                                  ['_data'])
+        if res is not None:
+            return res
+        return object.__reduce_ex__(self, protocol)
+
+    def __getstate__(self):
+        return get_slots_state(self)
+
+    def __setstate__(self, state):
+        set_slots_state(self, state)
+
+# Array interface
+# ----------------------------------------------------------------------------
+
+    @property
+    def values(self):
+        """The coordinate values as ``numpy.ndarray``"""
+        return np.asarray(self._data)
+
+    def __array__(self, dtype=None):
+        if dtype is None:
+            return self.values
+        return self.values.astype(dtype)
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __repr__(self):
+        return "%s(%r, name=%r, units=%r)" % (self.__class__.__name__,
+                                              self.values, self.name,
+                                              self.units)
+
+    def __getitem__(self, key):
+        res = self.values[key]
+        if isinstance(res, np.ndarray) and res.ndim > 0:
+            return self._derive(res)
+        return res
+
+    @property
+    def size(self):
+        return self.values.size
+
+    @property
+    def shape(self):
+        return (self.size, )
+
+    @property
+    def ndim(self):
+        return 1
+
+    @property
+    def dtype(self):
+        return self.values.dtype
+
+    def min(self, axis=None, out=None, **kwargs):
+        return np.min(self.values, axis=axis, out=out, **kwargs)
+
+    def max(self, axis=None, out=None, **kwargs):
+        return np.max(self.values, axis=axis, out=out, **kwargs)
+
+    def astype(self, dtype):
+        return self.values.astype(dtype)
+
+    def copy(self):
+        """Return a copy of the coordinate
+
+        Coordinates are never modified in place, so the copy holds a
+        read-only view on the values of this coordinate.
+
+        """
+        values = self.values.view()
+        values.flags.writeable = False
+        return self._derive(values)
+
+    def equals(self, other):
+        """``True`` if ``other`` holds the same coordinate values
+
+        ``other`` may be any array_like; it is converted with
+        ``as_coordinate`` first, so that the result doesn't depend on the
+        representation of the values. Regular coordinates are compared up
+        to rounding errors.
+
+        """
+        if other is self:
+            return True
+        other = as_coordinate(other, self.name)
+        if other.size != self.size:
+            return False
+        regular = [c for c in (self, other)
+                   if isinstance(c, RegularCoordinateArray)]
+        if len(regular) == 2:
+            # the same relative tolerance as for range queries, at both ends
+            # of the coordinate
+            tol = self._eps * abs(self.step)
+            return (abs(self.start - other.start) <= tol and
+                    abs(self.stop - other.stop) <= tol)
+        if regular:
+            if not np.issubdtype(np.result_type(self.dtype, other.dtype),
+                                 np.number):
+                return False
+            tol = regular[0]._eps * abs(regular[0].step)
+            return bool(np.all(np.abs(self.values - other.values) <= tol))
+        return bool(np.all(self.values == other.values))
+
+# Translate coordinate values into array indices
+# ----------------------------------------------------------------------------
+
+    def index(self, value):
+        """Return the index of the coordinate value closest to ``value``"""
+        data = self.values
+        if data.size == 1:
+            return 0
+        if data[0] > data[-1]:
+            return self.size - 1 - self[::-1].index(value)
+        idx = np.clip(np.searchsorted(data, value), 1, self.size - 1)
+        return int(idx - (value - data[idx - 1] < data[idx] - value))
+
+    def index_range(self, lower, upper):
+        """Return ``(start, stop)`` indices of the closed range
+        ``[lower, upper]``
+
+        The coordinate values have to be sorted. Descending coordinates are
+        supported.
+
+        """
+        data = self.values
+        if data.size > 1 and data[0] > data[-1]:
+            start, stop = _array_get_common_range_index((data[::-1],
+                                                         (lower, upper)))[0]
+            return self.size - stop, self.size - start
+        return _array_get_common_range_index((data, (lower, upper)))[0]
+
+
+# Definition of the ``RegularCoordinateArray`` class
+# ============================================================================
+
+class RegularCoordinateArray(CoordinateArray):
+    """Coordinate variable on an equidistant grid
+
+    Only the first value ``start``, the increment ``step`` and the number of
+    grid points ``size`` are stored; the full array of coordinate values is
+    only created when it is explicitly asked for. Value-to-index lookups are
+    done arithmetically in constant time.
+
+    Parameters
+    ----------
+    start : float
+
+    step : float
+        may be negative for descending coordinates
+
+    size : int
+
+    name : str
+
+    units : str
+
+    centered : bool
+
+    """
+
+    __slots__ = ('start', 'step', '_size')
+
+    # relative tolerance (in units of ``step``) for range queries
+    _eps = 1e-6
+
+    def __init__(self, start, step, size, name, units=None, centered=True):
+        if step == 0:
+            raise ValueError("The step of a regular coordinate cannot be 0")
+        self.start = start
+        self.step = step
+        self._size = int(size)
+        self.name = name
+        self.units = units
+        self._centered = centered
+
+    @property
+    def _data(self):
+        return self.start + self.step * np.arange(self._size)
+
+    @property
+    def stop(self):
+        """The last coordinate value"""
+        return self.start + self.step * (self._size - 1)
+
+    def __repr__(self):
+        return "%s(start=%r, step=%r, size=%r, name=%r, units=%r)" % (
+                    self.__class__.__name__, self.start, self.step,
+                    self._size, self.name, self.units)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self._size)
+            size = max(0, (stop - start + step + (-1 if step > 0 else 1))
+                          // step)
+            return RegularCoordinateArray(self.start + self.step * start,
+                                          self.step * step, size, self.name,
+                                          self.units, self._centered)
+        if isinstance(key, numbers.Integral):
+            if key < 0:
+                key += self._size
+            if not 0 <= key < self._size:
+                raise IndexError("index %d is out of bounds for coordinate "
+                                 "of size %d" % (key, self._size))
+            return self.start + self.step * key
+        return CoordinateArray.__getitem__(self, key)
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def dtype(self):
+        return np.result_type(self.start, self.step, float)
+
+    def min(self, axis=None, out=None, **kwargs):
+        return min(self.start, self.stop)
+
+    def max(self, axis=None, out=None, **kwargs):
+        return max(self.start, self.stop)
+
+    def copy(self):
+        return RegularCoordinateArray(self.start, self.step, self._size,
+                                      self.name, self.units, self._centered)
+
+    def index(self, value):
+        idx = int(np.round((value - self.start) / float(self.step)))
+        return min(max(idx, 0), self._size - 1)
+
+    def index_range(self, lower, upper):
+        # position of the bounds in (fractional) index space
+        lo = (lower - self.start) / float(self.step)
+        hi = (upper - self.start) / float(self.step)
+        if self.step < 0:
+            lo, hi = hi, lo
+        start = int(np.ceil(lo - self._eps))
+        stop = int(np.floor(hi + self._eps)) + 1
+        start = min(max(start, 0), self._size)
+        stop = min(max(stop, start), self._size)
+        return start, stop
+
+
+# Definition of the ``DatetimeCoordinate`` class
+# ============================================================================
+
+class DatetimeCoordinate(CoordinateArray):
+    """Coordinate variable holding points in time
+
+    The values are stored as ``datetime64[ns]``. Calendar fields (``year``,
+    ``month``, ``day``, ``hour``, ``dayofyear``, ``season``) are available
+    as integer arrays; each of them is computed only once, the first time it
+    is accessed, so that selecting or grouping time steps boils down to
+    vectorized comparisons.
+
+    Parameters
+    ----------
+    data : array_like
+        anything which can be converted to a ``datetime64[ns]`` array
+
+    name : str
+
+    units : str
+
+    centered : bool
+
+    """
+
+    __slots__ = ('_fields', )
+
+    def __init__(self, data, name='time', units=None, centered=True):
+        CoordinateArray.__init__(self, np.asarray(data, dtype='M8[ns]'),
+                                 name, units, centered)
+        self._fields = {}
+
+    def _derive(self, data):
+        return DatetimeCoordinate(data, self.name, self.units,
+                                  self._centered)
+
+    def to_datetime(self):
+        """Return the coordinate values as ``pandas.DatetimeIndex``"""
+        import pandas as pd
+        return pd.DatetimeIndex(self.values)
+
+    def index_range(self, lower, upper):
+        return CoordinateArray.index_range(self, np.datetime64(lower),
+                                           np.datetime64(upper))
+
+# Calendar fields
+# ----------------------------------------------------------------------------
+
+    def _field(self, key):
+        if key not in self._fields:
+            data = self.values
+            if key == 'year':
+                res = data.astype('M8[Y]').astype(np.int64) + 1970
+            elif key == 'month':
+                res = data.astype('M8[M]').astype(np.int64) % 12 + 1
+            elif key == 'day':
+                res = (data.astype('M8[D]') - data.astype('M8[M]')
+                                          ).astype(np.int64) + 1
+            elif key == 'hour':
+                res = (data - data.astype('M8[D]')).astype('m8[h]')
+            elif key == 'dayofyear':
+                res = (data.astype('M8[D]') - data.astype('M8[Y]')
+                                          ).astype(np.int64) + 1
+            elif key == 'season':
+                res = self.month % 12 // 3
+            elif key == 'season_year':
+                res = self.year + (self.month == 12)
+            self._fields[key] = res.astype(np.int64)
+        return self._fields[key]
+
+    @property
+    def year(self):
+        return self._field('year')
+
+    @property
+    def month(self):
+        """Month of the year, starting at 1 for January"""
+        return self._field('month')
+
+    @property
+    def day(self):
+        """Day of the month, starting at 1"""
+        return self._field('day')
+
+    @property
+    def hour(self):
+        return self._field('hour')
+
+    @property
+    def dayofyear(self):
+        """Day of the year, starting at 1 for January 1st"""
+        return self._field('dayofyear')
+
+    @property
+    def season(self):
+        """Meteorological season: 0 (DJF), 1 (MAM), 2 (JJA), or 3 (SON)"""
+        return self._field('season')
+
+    @property
+    def season_year(self):
+        """The year a meteorological season belongs to; December is counted
+        as part of the following year's DJF"""
+        return self._field('season_year')
+
+
+# Convert arrays to coordinate objects
+# ============================================================================
+
+def as_coordinate(data, name, units=None, centered=True, rtol=1e-6):
+    """Convert ``data`` to a ``CoordinateArray``
+
+    Equidistant numeric arrays are converted to the compact
+    ``RegularCoordinateArray`` representation, arrays of points in time are
+    wrapped in a ``DatetimeCoordinate``, and all other arrays in a
+    ``CoordinateArray``. Coordinate objects are returned unchanged.
+
+    Parameters
+    ----------
+    data : array_like
+        one-dimensional array of coordinate values
+
+    name : str
+
+    units : str
+
+    centered : bool
+
+    rtol : float
+        the maximum deviation from a perfectly regular grid, relative to the
+        grid spacing, for ``data`` to be considered regular. Deviations
+        within the precision of the dtype of ``data`` (e.g. for float32
+        coordinates read from files) are always accepted.
+
+    Returns
+    -------
+    out : CoordinateArray
+
+    """
+    if isinstance(data, CoordinateArray):
+        return data
+    data = np.asarray(data)
+    if np.issubdtype(data.dtype, np.datetime64):
+        return DatetimeCoordinate(data, name, units, centered)
+    if (data.ndim == 1 and data.size > 1 and
+                                  np.issubdtype(data.dtype, np.number)):
+        start = float(data[0])
+        step = (float(data[-1]) - start) / (data.size - 1)
+        tol = rtol * abs(step)
+        if np.issubdtype(data.dtype, np.inexact):
+            tol = max(tol, np.finfo(data.dtype).eps *
+                           max(abs(start), abs(float(data[-1]))))
+        if step != 0 and np.all(np.abs(data - (start + step *
+                    np.arange(data.size))) <= tol):
+            return RegularCoordinateArray(start, step, data.size, name,
+                                          units, centered)
+    return CoordinateArray(data, name, units, centered)
+
+
+# Interning of coordinates
+# ============================================================================
+#
+# Many small arrays (e.g. station time series) often have equal coordinates.
+# Interning replaces equal coordinate objects by one shared instance, which
+# saves memory and lets the identity-based caches (alignment plans, area
+# weights, ``CoordinateSet`` flags) hit.
+
+_interned = weakref.WeakValueDictionary()
+
+_interned_sets = weakref.WeakValueDictionary()
+
+
+def _values_key(coord):
+    """A hashable key identifying the values of ``coord``"""
+    if isinstance(coord, RegularCoordinateArray):
+        return ('regular', coord.start, coord.step, coord.size)
+    values = np.ascontiguousarray(coord.values)
+    return (values.dtype.str, values.size,
+            hashlib.md5(values.view(np.uint8)).hexdigest())
+
+
+def intern_coordinate(coord):
+    """Return a shared coordinate object equal to ``coord``
+
+    The first coordinate with given values, name and units is registered
+    and returned for all equal coordinates passed later, as long as it is
+    alive. Interned coordinates hold a read-only copy of the values, so
+    that the arrays of the caller stay writable.
+
+    """
+    key = (type(coord), coord.name, coord.units, coord._centered,
+           _values_key(coord))
+    res = _interned.get(key)
+    if res is not None and res.equals(coord):
+        return res
+    if not isinstance(coord, RegularCoordinateArray):
+        values = coord.values.copy()
+        values.flags.writeable = False
+        coord = coord._derive(values)
+    _interned[key] = coord
+    return coord
+
+
+def intern_coordinates(coordinates):
+    """Return a shared ``CoordinateSet`` equal to ``coordinates``, holding
+    interned coordinate objects (see ``intern_coordinate``)
+
+    The returned set must not be modified. Like the coordinates, it is
+    shared as long as it is alive.
+
+    """
+    items = [(name, intern_coordinate(as_coordinate(c, name)))
+             for name, c in coordinates.items()]
+    key = tuple((name, id(c)) for name, c in items)
+    res = _interned_sets.get(key)
+    if res is None:
+        # the set keeps references to the coordinates, so that their ids
+        # cannot be reused while it is registered
+        res = CoordinateSet(items)
+        _interned_sets[key] = res
+    return res
+
 
 # Find the indices for slicing two coordinates to a common covered range
 # ============================================================================
 
+def _bounds(coord):
+    """The smallest and largest value of the sorted coordinate ``coord``"""
+    if isinstance(coord, RegularCoordinateArray):
+        return min(coord.start, coord.stop), max(coord.start, coord.stop)
+    values = np.asarray(coord)
+    first, last = values[0], values[-1]
+    return (first, last) if first <= last else (last, first)
+
+
 def get_common_range(coordinates):
     """Get indices to slice ``coordinate`` objects to a common range
 
-    coordinates : tuple of geodas.core.coordinate
+    The coordinates need to be sorted (ascending or descending). Their
+    ranges are given by their first and last values, and the indices are
+    found by binary search (or arithmetically, for regular coordinates), so
+    this takes O(log n) time per coordinate.
+
+    Parameters
+    ----------
+    coordinates : sequence of CoordinateArray
+        plain arrays are accepted as well
+
+    Returns
+    -------
+    indices : list of tuples
+        the ``(start, stop)`` indices of the common range for each
+        coordinate
 
     """
-    # FIXME: this is unfinished work!!!!!
-    mins = [min(t) for t in coordinates]
+    coordinates = [c if isinstance(c, CoordinateArray) else
+                   CoordinateArray(np.asarray(c), None)
+                   for c in coordinates]
+    bounds = [_bounds(c) for c in coordinates]
+    lower = max(b[0] for b in bounds)
+    upper = min(b[1] for b in bounds)
+    return [c.index_range(lower, upper) for c in coordinates]
 
 
 def _array_get_common_range_index(arrays):
     """Get indices to slice sorted arrays to a common range"""
-    mins = [np.min(t) for t in arrays]
-    maxs = [np.max(t) for t in arrays]
-    lower_bound = np.max(mins)
-    upper_bound = np.min(maxs)
+    arrays = [np.asarray(arr) for arr in arrays]
+    # the arrays are sorted, so their first and last elements are the bounds
+    lower_bound = max(arr[0] for arr in arrays)
+    upper_bound = min(arr[-1] for arr in arrays)
     lower_row = [np.searchsorted(arr, lower_bound, side='left')
                                                             for arr in arrays]
     upper_row = [np.searchsorted(arr, upper_bound, side='right')
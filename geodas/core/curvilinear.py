@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+#
+# geodas - Geospatial Data Analysis in Python
+#
+# :Author:    Andreas Hilboll <andreas@hilboll.de>
+# :Date:      Wed Jan 23 11:45:02 2013
+# :Website:   http://andreas-h.github.com/geodas/
+# :License:   GPLv3
+# :Version:   0.1
+# :Copyright: (c) 2012-2013 Andreas Hilboll <andreas@hilboll.de>
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Library imports
+# ============================================================================
+
+import hashlib
+
+import numpy as np
+
+from geodas.core.area import EARTH_RADIUS
+
+
+# Points on the unit sphere
+# ============================================================================
+
+def _xyz(latitude, longitude):
+    """Cartesian coordinates of points on the unit sphere, as array of shape
+    ``(n, 3)``"""
+    lat = np.deg2rad(np.ravel(latitude))
+    lon = np.deg2rad(np.ravel(longitude))
+    coslat = np.cos(lat)
+    return np.column_stack([coslat * np.cos(lon), coslat * np.sin(lon),
+                            np.sin(lat)])
+
+
+def _chord(distance):
+    """Length of the chord through the unit sphere for a great circle
+    ``distance`` on the earth (in m)"""
+    return 2. * np.sin(.5 * np.minimum(distance / EARTH_RADIUS, np.pi))
+
+
+# Spatial index, cached per grid
+# ============================================================================
+
+_index_cache = {}
+_index_cache_size = 16
+
+
+def get_spatial_index(grid):
+    """Get the (cached) spatial index of a ``CurvilinearGrid``
+
+    The index is a ``scipy.spatial.cKDTree`` over the grid points on the
+    unit sphere, so that distances are chords instead of angles on the
+    plate carree, and neither the dateline nor the poles need special
+    treatment. Grid points with missing (non-finite) latitude or longitude
+    are left out. Returns the tuple ``(tree, points)``, where ``points``
+    holds the flat grid index of each point in the tree.
+
+    The index is built once for each set of grid point locations, in
+    O(n log n) time; queries take O(log n) time.
+
+    """
+    key = grid.key
+    entry = _index_cache.get(key)
+    if entry is None:
+        from scipy.spatial import cKDTree
+        points = np.flatnonzero(np.isfinite(grid.latitude) &
+                                np.isfinite(grid.longitude))
+        xyz = _xyz(grid.latitude.ravel()[points],
+                   grid.longitude.ravel()[points])
+        if len(_index_cache) >= _index_cache_size:
+            _index_cache.clear()
+        entry = (cKDTree(xyz), points)
+        _index_cache[key] = entry
+    return entry
+
+
+# Definition of the ``CurvilinearGrid`` class
+# ============================================================================
+
+class CurvilinearGrid(object):
+    """Latitudes and longitudes of the cells of a curvilinear grid
+
+    On curvilinear grids (like satellite swaths, rotated-pole or projected
+    model grids), latitude and longitude are two-dimensional arrays over two
+    dimensions of the data, which themselves are only numbered (or have
+    coordinates in some projection). Selecting regions and points by
+    latitude and longitude therefore uses a spatial index of the grid
+    points (see ``get_spatial_index``).
+
+    Parameters
+    ----------
+    latitude, longitude : array_like
+        two-dimensional arrays of the same shape, in degrees
+
+    dims : tuple of str
+        the names of the data dimensions the two axes of ``latitude`` and
+        ``longitude`` correspond to
+
+    """
+
+    __slots__ = ('latitude', 'longitude', 'dims', '_key', '__weakref__')
+
+    def __init__(self, latitude, longitude, dims=('y', 'x')):
+        latitude = np.asarray(latitude, dtype=float)
+        longitude = np.asarray(longitude, dtype=float)
+        if latitude.ndim != 2 or latitude.shape != longitude.shape:
+            raise ValueError("The latitudes and longitudes of a curvilinear "
+                             "grid have to be 2d arrays of the same shape, "
+                             "not %s and %s" % (latitude.shape,
+                                                longitude.shape))
+        if len(dims) != 2:
+            raise ValueError("A curvilinear grid has two dimensions, not "
+                             "%d" % len(dims))
+        self.latitude = latitude
+        self.longitude = longitude
+        self.dims = tuple(dims)
+        self._key = None
+
+    def __getstate__(self):
+        return dict(latitude=self.latitude, longitude=self.longitude,
+                    dims=self.dims)
+
+    def __setstate__(self, state):
+        self.__init__(state['latitude'], state['longitude'], state['dims'])
+
+    def __repr__(self):
+        return "CurvilinearGrid(%s, shape=%s)" % (", ".join(self.dims),
+                                                  self.shape)
+
+    @property
+    def shape(self):
+        return self.latitude.shape
+
+    @property
+    def key(self):
+        """A hashable key identifying the locations of the grid points"""
+        if self._key is None:
+            md5 = hashlib.md5(str(self.shape).encode())
+            md5.update(np.ascontiguousarray(self.latitude))
+            md5.update(np.ascontiguousarray(self.longitude))
+            self._key = md5.hexdigest()
+        return self._key
+
+    def __getitem__(self, key):
+        """The part of the grid selected by ``key``, which has to keep both
+        axes (slices or ``numpy.ix_`` index arrays)"""
+        return CurvilinearGrid(self.latitude[key], self.longitude[key],
+                               self.dims)
+
+    def take(self, index):
+        """The part of the grid selected by ``index``, a dict of slices or
+        index arrays by dimension name"""
+        key = [index.get(d, slice(None)) for d in self.dims]
+        if all(isinstance(k, slice) for k in key):
+            return self[tuple(key)]
+        return self[np.ix_(*[np.arange(n)[k] for k, n in zip(key,
+                                                             self.shape)])]
+
+    def nearest(self, latitude, longitude, max_distance=None):
+        """Find the grid points nearest to the given points
+
+        Parameters
+        ----------
+        latitude, longitude : array_like
+            the points, in degrees
+
+        max_distance : float
+            if given, points farther than ``max_distance`` (in m) from any
+            grid point get the index -1
+
+        Returns
+        -------
+        index : tuple of numpy.ndarray
+            the index of the nearest grid point along both dimensions of
+            the grid, with the shape of the broadcast ``latitude`` and
+            ``longitude``
+
+        """
+        latitude, longitude = np.broadcast_arrays(latitude, longitude)
+        tree, points = get_spatial_index(self)
+        bound = np.inf if max_distance is None else _chord(max_distance)
+        dist, i = tree.query(_xyz(latitude, longitude),
+                             distance_upper_bound=bound)
+        # points without a grid point within ``bound`` get i == tree.n
+        found = i < tree.n
+        flat = np.full(i.shape, -1, dtype=np.intp)
+        flat[found] = points[i[found]]
+        index = np.unravel_index(np.where(found, flat, 0), self.shape)
+        return tuple(np.where(found, ix, -1).reshape(latitude.shape)
+                     for ix in index)
+
+    def bbox_points(self, latitude=None, longitude=None):
+        """Flat indices of the grid points within a latitude/longitude box
+
+        ``latitude`` and ``longitude`` are ``(min, max)`` tuples (inclusive
+        bounds) or ``None`` for no restriction; the longitude range may
+        cross the dateline, e.g. ``(170., -170.)``. The candidate points are
+        looked up in the spatial index with a ball around the box, and only
+        these are compared with the bounds.
+
+        """
+        lat0, lat1 = latitude if latitude is not None else (-90., 90.)
+        lat0 = -90. if lat0 is None else lat0
+        lat1 = 90. if lat1 is None else lat1
+        if longitude is None or None in longitude:
+            lon0, width = -180., 360.
+        else:
+            lon0 = longitude[0]
+            width = longitude[1] - longitude[0]
+            if width < 0. or width > 360.:
+                width %= 360.
+        tree, points = get_spatial_index(self)
+        if lat0 > lat1 or tree.n == 0:
+            return np.zeros(0, dtype=np.intp)
+        # sample the boundary of the box; the box lies within the ball
+        # around the mean of these samples which touches the farthest
+        # sample, widened by the distance between neighbouring samples
+        lats = np.linspace(lat0, lat1, 33)
+        lons = lon0 + np.linspace(0., width, 33)
+        boundary = np.concatenate([
+                       _xyz(lats, np.full(33, lons[0])),
+                       _xyz(lats, np.full(33, lons[-1])),
+                       _xyz(np.full(33, lat0), lons),
+                       _xyz(np.full(33, lat1), lons)])
+        centre = boundary.mean(axis=0)
+        norm = np.sqrt(np.sum(centre ** 2))
+        if norm > 1e-6:
+            centre /= norm
+            # the farthest point of the box is on its boundary, unless the
+            # box contains the antipode of the centre
+            alat = -np.rad2deg(np.arcsin(np.clip(centre[2], -1., 1.)))
+            alon = np.rad2deg(np.arctan2(-centre[1], -centre[0]))
+            if (lat0 <= alat <= lat1 and (width >= 360. or
+                                          (alon - lon0) % 360. <= width)):
+                norm = 0.
+        if norm <= 1e-6:
+            candidates = np.arange(tree.n)
+        else:
+            step = np.sqrt(np.sum(np.diff(boundary, axis=0) ** 2, axis=1))
+            step = step[np.arange(step.size) % 33 != 32].max()
+            radius = np.sqrt(np.sum((boundary - centre) ** 2, axis=1)).max()
+            candidates = np.asarray(tree.query_ball_point(centre,
+                                                          radius + step),
+                                    dtype=np.intp)
+        flat = points[candidates]
+        lat = self.latitude.ravel()[flat]
+        lon = self.longitude.ravel()[flat]
+        inside = (lat >= lat0) & (lat <= lat1)
+        if width < 360.:
+            inside &= (lon - lon0) % 360. <= width
+        return np.sort(flat[inside])
+
+    def bbox_slices(self, latitude=None, longitude=None):
+        """The index ranges along both dimensions of the grid covering all
+        grid points within a latitude/longitude box
+
+        See ``bbox_points`` for the arguments. Returns a dict of slices by
+        dimension name; the slices are empty if no grid point is within the
+        box. As the grid is curvilinear, the selected part of the grid
+        generally contains grid points outside the box as well.
+
+        """
+        flat = self.bbox_points(latitude, longitude)
+        if not flat.size:
+            return dict((d, slice(0, 0)) for d in self.dims)
+        index = np.unravel_index(flat, self.shape)
+        return dict((d, slice(ix.min(), ix.max() + 1))
+                    for d, ix in zip(self.dims, index))
+
+
+def as_slice_request(coordinates, grid, slice_request):
+    """Translate latitude and longitude ranges in ``slice_request`` to
+    ranges of the grid dimensions in ``coordinates``
+
+    Returns a new slice request for ``get_coordinate_slices``; the ranges
+    of the grid dimensions are given in the values of their coordinates.
+
+    """
+    slice_request = dict(slice_request)
+    latitude = slice_request.pop('latitude', None)
+    longitude = slice_request.pop('longitude', None)
+    if latitude is None and longitude is None:
+        return slice_request
+    for d, sl in grid.bbox_slices(latitude, longitude).items():
+        if sl.stop == sl.start:
+            raise ValueError("There are no grid points within the latitude "
+                             "and longitude ranges you requested")
+        values = np.asarray(coordinates[d][:])
+        first, last = values[sl.start], values[sl.stop - 1]
+        slice_request[d] = (min(first, last), max(first, last))
+    return slice_request
@@ -26,13 +26,20 @@
 # Library imports
 # ============================================================================
 
-from collections import OrderedDict
+import weakref
 
 import bottleneck as bn
 import numpy as np
-import numpy.ma as ma
 
-from geodas.core.coordinate import CoordinateArray
+from geodas.core.alignment import get_alignment_plan
+from geodas.core.area import EARTH_RADIUS, _area_weights, weighted_sum
+from geodas.core.coordinate import CoordinateArray, CoordinateSet, \
+                                   as_coordinate
+from geodas.core.missing import ValidityMask, filled, isvalid, masked
+from geodas.core.parallel import parallel_reduce
+from geodas.core.pickling import get_slots_state, reduce_with_buffers, \
+                                 set_slots_state
+from geodas.core.sharedmem import SharedBuffer, from_handle
 
 
 # Definition of the ``dimension`` class
@@ -45,85 +52,735 @@ class gridded_array(object):
     ----------
     data : numpy.ndarray
 
-    coordinates : OrderedDict
+    coordinates : CoordinateSet
+        the coordinates of the data axes; anything which can be passed to
+        ``CoordinateSet()``, like an ``OrderedDict`` or a list of
+        ``(name, coordinate)`` tuples, is accepted as well
 
     title : str
 
+    valid : ValidityMask
+        for integer data, which cannot hold NaN: the mask of valid elements.
+        Missing floating point values are always NaN.
+
+    grid : CurvilinearGrid
+        for data on a curvilinear grid: the two-dimensional latitudes and
+        longitudes of the grid points, over two of the data dimensions (see
+        ``geodas.core.curvilinear``)
+
     """
 
+    __slots__ = ('_data', '_shared', '_shm', 'coordinates', 'title', 'valid',
+                 'grid', '__weakref__')
+
 
 # Initialization of the ``gridded_array`` class
 # ----------------------------------------------------------------------------
 
-    def __init__(self, data, coordinates, title=""):
+    def __init__(self, data, coordinates, title="", valid=None, grid=None):
         # TODO: Sanity-checks
         self.data = data
-        # TODO: support passing coordinates as list of tuples
+        if not isinstance(coordinates, CoordinateSet):
+            coordinates = CoordinateSet(coordinates)
         self.coordinates = coordinates
         self.title = title
+        self.valid = valid
+        self.grid = grid
+
+# Copy-on-write handling of the data buffer
+# ----------------------------------------------------------------------------
+
+    @property
+    def data(self):
+        """The data array
+
+        After ``copy()`` or slicing (``get_slice``, ``select``, ``align``),
+        the data buffer may be shared with other ``gridded_array`` objects.
+        Item assignment and in-place operators on the ``gridded_array``
+        copy the buffer first, as long as another ``gridded_array`` sharing
+        it is alive (see ``detach()``). Writing to the ``data`` array itself
+        bypasses this and modifies the shared buffer, like for numpy views;
+        call ``detach()`` first to write to it safely.
+
+        """
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        self._leave_share()
+        self._data = data
+        self._shm = None
+
+    def _leave_share(self):
+        """Leave the group of arrays sharing the data buffer; return the
+        other members still alive"""
+        group = getattr(self, '_shared', None)
+        self._shared = None
+        if group is None:
+            return []
+        group.discard(self)
+        return list(group)
+
+    def _share(self, data, coordinates, valid=None, grid=None):
+        """Return a new ``gridded_array`` holding ``data``, a view on this
+        array's data, which shares the buffer until one of them is written
+        to
+
+        The arrays sharing a buffer are tracked in a common ``WeakSet``,
+        so that only arrays which are still alive cause a copy.
+
+        """
+        res = gridded_array(data, coordinates, self.title, valid, grid)
+        if (isinstance(data, np.ndarray) and
+                isinstance(self._data, np.ndarray) and
+                np.may_share_memory(data, self._data)):
+            if self._shared is None:
+                self._shared = weakref.WeakSet([self])
+            self._shared.add(res)
+            res._shared = self._shared
+            res._shm = self._shm
+        return res
+
+    def detach(self):
+        """Make sure the data buffer isn't shared with any other
+        ``gridded_array``, copying it if necessary
+
+        Data in shared memory (see ``shared_empty``) is never copied: it is
+        shared with other processes on purpose, and writes always go to the
+        shared memory, where all views on it see them.
+
+        """
+        others = self._leave_share()
+        if others and self._shm is None:
+            self._data = self._data.copy()
+        return self
+
+    def __setitem__(self, key, value):
+        self.detach()
+        self._data[key] = value
+        if self.valid is not None:
+            valid = self.valid.to_bool()
+            valid[key] = True
+            self.valid = ValidityMask.from_bool(valid)
+
+# Pickling
+# ----------------------------------------------------------------------------
+
+    def __reduce_ex__(self, protocol):
+        # data in shared memory is pickled as a handle to the memory
+        if self._shm is not None:
+            handle = self._shm.handle(self._data)
+            if handle is not None:
+                return (_from_shared, (handle, self.coordinates, self.title,
+                                       self.valid, self.grid))
+        # with protocol 5, the data buffer is pickled out-of-band
+        res = reduce_with_buffers(self, protocol, self.__getstate__(),
+                                  ['_data'])
+        if res is not None:
+            return res
+        return object.__reduce_ex__(self, protocol)
+
+    def __getstate__(self):
+        state = get_slots_state(self)
+        state['_shared'] = None
+        state['_shm'] = None
+        return state
+
+    def __setstate__(self, state):
+        set_slots_state(self, state)
+
+# Missing values
+# ----------------------------------------------------------------------------
+
+    def isvalid(self):
+        """Boolean array which is ``True`` where the data isn't missing"""
+        return isvalid(self.data, self.valid)
+
+    def filled(self, value=np.nan):
+        """The data with missing values replaced by ``value``
+
+        With the default NaN, floating point data is returned as it is, and
+        integer data with missing values is converted to float.
+
+        """
+        return filled(self.data, self.valid, value)
 
 # Get a masked_array version of this ``gridded_data`` instance
 # ----------------------------------------------------------------------------
 
     def masked(self):
-        return gridded_array(ma.masked_invalid(self.data), self.coordinates,
-                             self.title)
+        """Return a ``gridded_array`` holding a ``numpy.ma.MaskedArray``
+
+        The masked array shares the data buffer with this array, only the
+        boolean mask is allocated. Calculations in geodas use NaN for
+        missing values, so this is only meant for passing data on to code
+        which requires masked arrays (like plotting).
 
+        """
+        return gridded_array(masked(self.data, self.valid), self.coordinates,
+                             self.title, grid=self.grid)
 
-# Calculate mean, possible along a given axis
+# Curvilinear grids
 # ----------------------------------------------------------------------------
 
-    def mean(self, axis=None):
-        # TODO: support multiple axes at the same time, via recursion
+    def _grid_on(self, coordinates):
+        """This array's ``grid``, if it still applies to the result of an
+        operation with the given coordinates"""
+        grid = self.grid
+        if grid is None:
+            return None
+        for d, n in zip(grid.dims, grid.shape):
+            if d not in coordinates or coordinates[d].size != n:
+                return None
+        return grid
+
+    def nearest(self, latitude, longitude, max_distance=None):
+        """The values at the grid points nearest to the given points
+
+        On curvilinear grids, this is ``sample(method='nearest')``, with the
+        grid points found in the spatial index of the grid (see
+        ``geodas.core.curvilinear.CurvilinearGrid.nearest``); points
+        farther than ``max_distance`` (in m) from any grid point are NaN.
+
+        """
+        from geodas.core.interpolate import sample
+        return sample(self, 'nearest', max_distance=max_distance,
+                      latitude=latitude, longitude=longitude)
+
+
+# Reductions along one or several axes
+# ----------------------------------------------------------------------------
+
+    def _get_axes(self, axis):
+        """Normalize ``axis`` (a name or number, or a sequence of those) to a
+        sorted list of axis numbers"""
+        if isinstance(axis, (list, tuple)):
+            axes = [self.coordinates.axis(a) for a in axis]
+        else:
+            axes = [self.coordinates.axis(axis)]
+        return sorted(set(axes))
+
+    def _reduce(self, func, axis, name, nthreads=None, **kwargs):
+        """Reduce the data along ``axis`` using ``func(data, axis=...)``
+
+        Several axes are moved to the end (as a view) and merged with one
+        reshape, so that ``func`` only has to reduce a single axis. Large
+        arrays are split into tiles along a non-reduced axis, which are
+        reduced in ``nthreads`` threads (see
+        ``geodas.core.parallel.parallel_reduce``). The coordinates of the
+        reduced axes are dropped from the result.
+
+        """
         if axis is None:
-            return bn.nanmean(self.data)
-        # TODO: support specifying axes as indexed number instead of
-        #       name
-        if axis not in list(self.coordinates.keys()):
-            raise ValueError("You asked me to calculate the mean along axis "
+            return func(self.filled(), axis=None, **kwargs)
+        try:
+            axes = self._get_axes(axis)
+        except ValueError:
+            raise ValueError("You asked me to calculate the %s along axis "
                              "%s, but I don't know anything about this "
-                             "coordinate dimension", axis)
-        # TODO: replace OrderedDict with CoordinateSet
-        newcoords = OrderedDict()
-        # TODO: add keys() as property to CoordinateSet
-        for dim in list(self.coordinates.keys()):
-            if dim != axis:
-                newcoords[dim] = self.coordinates[dim]
-        newdata = bn.nanmean(self.data,
-                             axis=list(self.coordinates.keys()).index(axis))
+                             "coordinate dimension" % (name, axis))
+        data = self.filled()
+        if len(axes) == 1:
+            _axis = axes[0]
+        else:
+            keep = [i for i in range(data.ndim) if i not in axes]
+            data = data.transpose(keep + axes)
+            data = data.reshape(data.shape[:len(keep)] + (-1, ))
+            _axis = -1
+        newdata = parallel_reduce(func, data, _axis, nthreads, **kwargs)
+        newcoords = self.coordinates.drop(*axes)
+        return gridded_array(newdata, newcoords, self.title,
+                             grid=self._grid_on(newcoords))
+
+    def sum(self, axis=None, nthreads=None):
+        """Sum along ``axis``, ignoring NaNs
+
+        ``axis`` can be the name or the number of an axis, or a list of
+        those. If ``None``, the whole array is reduced to a scalar.
+        ``nthreads`` is the number of threads to use for large arrays; it
+        defaults to ``geodas.core.parallel.get_num_threads()``. The same
+        applies to all other reductions.
+
+        """
+        return self._reduce(bn.nansum, axis, 'sum', nthreads)
+
+    def mean(self, axis=None, nthreads=None):
+        """Mean along ``axis``, ignoring NaNs"""
+        return self._reduce(bn.nanmean, axis, 'mean', nthreads)
+
+    def std(self, axis=None, ddof=0, nthreads=None):
+        """Standard deviation along ``axis``, ignoring NaNs"""
+        return self._reduce(bn.nanstd, axis, 'std', nthreads, ddof=ddof)
+
+    def var(self, axis=None, ddof=0, nthreads=None):
+        """Variance along ``axis``, ignoring NaNs"""
+        return self._reduce(bn.nanvar, axis, 'var', nthreads, ddof=ddof)
+
+    def min(self, axis=None, nthreads=None):
+        """Minimum along ``axis``, ignoring NaNs"""
+        return self._reduce(bn.nanmin, axis, 'min', nthreads)
+
+    def max(self, axis=None, nthreads=None):
+        """Maximum along ``axis``, ignoring NaNs"""
+        return self._reduce(bn.nanmax, axis, 'max', nthreads)
+
+    def median(self, axis=None, nthreads=None):
+        """Median along ``axis``, ignoring NaNs"""
+        return self._reduce(bn.nanmedian, axis, 'median', nthreads)
+
+    def count(self, axis=None, nthreads=None):
+        """Number of valid (not NaN) values along ``axis``"""
+        return self._reduce(_nancount, axis, 'count', nthreads)
+
+    def percentile(self, q, axis=None, nthreads=None):
+        """The ``q``-th percentile(s) along ``axis``, ignoring NaNs
+
+        If ``q`` is a sequence, the result gets an additional leading
+        ``percentile`` axis.
+
+        """
+        res = self._reduce(np.nanpercentile, axis, 'percentile',
+                           nthreads, q=q)
+        if np.ndim(q) == 0 or axis is None:
+            return res
+        newcoords = CoordinateSet([('percentile', CoordinateArray(
+                                   np.asarray(q, dtype=float), 'percentile',
+                                   'percent'))] +
+                                  list(res.coordinates.items()))
+        return gridded_array(res.data, newcoords, self.title, grid=res.grid)
+
+
+# Area-weighted reductions over latitude and/or longitude
+# ----------------------------------------------------------------------------
+
+    def _area_reduce(self, axis, normalize, scale=1.):
+        axes = self._get_axes(axis)
+        names = [self.coordinates.name(a) for a in axes]
+        for n in names:
+            if n not in ['latitude', 'longitude']:
+                raise ValueError("You asked me to calculate an area-weighted "
+                                 "reduction along axis %s, but I can only "
+                                 "do that along latitude and longitude" % n)
+        weights = [_area_weights(self.coordinates[n], n) for n in names]
+        newdata = weighted_sum(self.filled(), weights, axes, normalize)
+        if scale != 1.:
+            newdata *= scale
+        newcoords = self.coordinates.drop(*axes)
+        if not newcoords:
+            return newdata[()]
         return gridded_array(newdata, newcoords, self.title)
 
+    def area_mean(self, axis=('latitude', 'longitude')):
+        """Area-weighted mean along ``axis``, ignoring NaNs
+
+        By default, the spatial mean over latitude and longitude is
+        calculated; with ``axis='longitude'``, this gives the zonal mean,
+        and with ``axis='latitude'``, the cos(latitude)-weighted meridional
+        mean. The cell areas are calculated from the coordinates once per
+        grid and cached.
+
+        """
+        return self._area_reduce(axis, True)
+
+    def area_sum(self, axis=('latitude', 'longitude')):
+        """Integral of the data over the area covered by the grid cells,
+        in m^2, ignoring NaNs"""
+        if len(self._get_axes(axis)) != 2:
+            raise ValueError("I can only integrate over latitude and "
+                             "longitude at the same time")
+        return self._area_reduce(axis, False, EARTH_RADIUS ** 2)
+
+
+# Arithmetics with automatic alignment of the coordinates
+# ----------------------------------------------------------------------------
+
+    # make numpy defer to our reflected operators in older numpy versions
+    __array_priority__ = 20
+
+    def _apply_ufunc(self, ufunc, *inputs, **kwargs):
+        """Apply ``ufunc`` to ``inputs``, aligning ``gridded_array`` inputs
+        by coordinate name"""
+        if any(getattr(x, '_deferred', False) for x in inputs):
+            # let deferred expressions record the operation
+            return NotImplemented
+        garrays = [x for x in inputs if isinstance(x, gridded_array)]
+        if len(garrays) > 2:
+            raise ValueError("I can only align up to two gridded arrays in "
+                             "one operation")
+        if len(garrays) == 2:
+            plan = get_alignment_plan(garrays[0].coordinates,
+                                      garrays[1].coordinates)
+            views = plan.apply(garrays[0].filled(), garrays[1].filled())
+            coordinates = plan.coordinates
+            args = []
+            for x in inputs:
+                if x is garrays[0]:
+                    args.append(views[0])
+                elif x is garrays[1]:
+                    args.append(views[1])
+                else:
+                    args.append(x)
+        else:
+            coordinates = garrays[0].coordinates
+            args = [x.filled() if isinstance(x, gridded_array) else x
+                    for x in inputs]
+        res = ufunc(*args, **kwargs)
+        if isinstance(res, tuple):
+            return tuple(self._wrap_result(r, coordinates) for r in res)
+        return self._wrap_result(res, coordinates)
+
+    def _wrap_result(self, data, coordinates):
+        if np.shape(data) != coordinates.shape:
+            raise ValueError("The result of the operation has the shape %s, "
+                             "which doesn't match the coordinates %s" %
+                             (np.shape(data), coordinates.dims))
+        return gridded_array(data, coordinates, self.title,
+                             grid=self._grid_on(coordinates))
+
+    def _apply_inplace(self, ufunc, other):
+        if self.valid is not None:
+            raise ValueError("You asked me to modify integer data with "
+                             "missing values in place, but I don't know how "
+                             "to do that; use filled() to convert it to "
+                             "float first")
+        if isinstance(other, gridded_array):
+            plan = get_alignment_plan(self.coordinates, other.coordinates)
+            if not plan.coordinates.equals(self.coordinates):
+                raise ValueError("In-place operations cannot change the "
+                                 "coordinates of a gridded array")
+            other = plan.apply(self.data, other.filled())[1]
+        self.detach()
+        ufunc(self.data, other, out=self.data)
+        return self
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if method != '__call__' or 'out' in kwargs:
+            return NotImplemented
+        return self._apply_ufunc(ufunc, *inputs, **kwargs)
+
+    def __add__(self, other):
+        return self._apply_ufunc(np.add, self, other)
+
+    def __radd__(self, other):
+        return self._apply_ufunc(np.add, other, self)
+
+    def __iadd__(self, other):
+        return self._apply_inplace(np.add, other)
+
+    def __sub__(self, other):
+        return self._apply_ufunc(np.subtract, self, other)
+
+    def __rsub__(self, other):
+        return self._apply_ufunc(np.subtract, other, self)
+
+    def __isub__(self, other):
+        return self._apply_inplace(np.subtract, other)
+
+    def __mul__(self, other):
+        return self._apply_ufunc(np.multiply, self, other)
+
+    def __rmul__(self, other):
+        return self._apply_ufunc(np.multiply, other, self)
+
+    def __imul__(self, other):
+        return self._apply_inplace(np.multiply, other)
+
+    def __truediv__(self, other):
+        return self._apply_ufunc(np.true_divide, self, other)
+
+    def __rtruediv__(self, other):
+        return self._apply_ufunc(np.true_divide, other, self)
+
+    def __itruediv__(self, other):
+        return self._apply_inplace(np.true_divide, other)
+
+    # without ``from __future__ import division``, ``/`` behaves like
+    # ``numpy.divide``, i.e. floor division for integer data
+    def __div__(self, other):
+        return self._apply_ufunc(np.divide, self, other)
+
+    def __rdiv__(self, other):
+        return self._apply_ufunc(np.divide, other, self)
+
+    def __idiv__(self, other):
+        return self._apply_inplace(np.divide, other)
+
+    def __floordiv__(self, other):
+        return self._apply_ufunc(np.floor_divide, self, other)
+
+    def __rfloordiv__(self, other):
+        return self._apply_ufunc(np.floor_divide, other, self)
+
+    def __mod__(self, other):
+        return self._apply_ufunc(np.remainder, self, other)
+
+    def __rmod__(self, other):
+        return self._apply_ufunc(np.remainder, other, self)
+
+    def __pow__(self, other):
+        return self._apply_ufunc(np.power, self, other)
+
+    def __rpow__(self, other):
+        return self._apply_ufunc(np.power, other, self)
+
+    def __neg__(self):
+        return self._apply_ufunc(np.negative, self)
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        return self._apply_ufunc(np.absolute, self)
+
+    def __lt__(self, other):
+        return self._apply_ufunc(np.less, self, other)
+
+    def __le__(self, other):
+        return self._apply_ufunc(np.less_equal, self, other)
+
+    def __gt__(self, other):
+        return self._apply_ufunc(np.greater, self, other)
+
+    def __ge__(self, other):
+        return self._apply_ufunc(np.greater_equal, self, other)
+
+    def __eq__(self, other):
+        return self._apply_ufunc(np.equal, self, other)
+
+    def __ne__(self, other):
+        return self._apply_ufunc(np.not_equal, self, other)
+
+
+# Regridding
+# ----------------------------------------------------------------------------
+
+    def regrid(self, latitude, longitude, cache=True):
+        """Regrid to the given latitudes and longitudes, conserving area
+        means
+
+        See ``geodas.core.regrid.ConservativeRegridder``; the sparse weight
+        matrix is computed once for each pair of grids and cached in memory
+        and, if ``cache`` is ``True``, on disk.
+
+        """
+        from geodas.core.regrid import ConservativeRegridder
+        regridder = ConservativeRegridder(self.coordinates['latitude'],
+                                          self.coordinates['longitude'],
+                                          latitude, longitude, cache)
+        return regridder(self)
+
+    def interpolate(self, method='linear', **kwargs):
+        """Interpolate to new coordinate values
+
+        The new values are given as keyword arguments, e.g.::
+
+            gdata.interpolate(latitude=lats, longitude=lons)
+
+        ``method`` is ``'linear'`` (``'bilinear'`` for two dimensions) or
+        ``'nearest'``. The interpolation is separable: along each dimension,
+        an index and weight table is computed once for each pair of
+        coordinates (see ``geodas.core.interpolate``) and applied to all
+        other dimensions at once. Points outside the source grid are NaN.
+
+        """
+        from geodas.core.interpolate import get_interpolation_table
+        data = self.filled()
+        coordinates = self.coordinates
+        for dim, values in kwargs.items():
+            try:
+                axis = coordinates.axis(dim)
+            except ValueError:
+                raise ValueError("You asked me to interpolate along %s, but "
+                                 "I don't know anything about this "
+                                 "coordinate dimension" % dim)
+            if not coordinates.is_monotonic(dim):
+                raise ValueError("I can only interpolate along sorted "
+                                 "coordinates, and %s isn't sorted" % dim)
+            src = coordinates[dim]
+            table = get_interpolation_table(src, values, method)
+            data = table.apply(data, axis)
+            units = getattr(src, 'units', None)
+            coordinates = coordinates.replace(dim, as_coordinate(values, dim,
+                                                                 units))
+        return gridded_array(data, coordinates, self.title)
+
+    def sample(self, method='nearest', as_array=False, max_distance=None,
+               **points):
+        """Extract the values at many points, e.g.::
+
+            gdata.sample(latitude=lats, longitude=lons)
+
+        See ``geodas.core.interpolate.sample``.
+
+        """
+        from geodas.core.interpolate import sample
+        return sample(self, method, as_array, max_distance, **points)
+
+    def coarsen(self, how='mean', boundary='pad', nthreads=None, **factors):
+        """Reduce blocks of neighbouring grid cells to single values, e.g.::
+
+            gdata.coarsen(latitude=10, longitude=10)
+
+        See ``geodas.core.coarsen.coarsen``.
+
+        """
+        from geodas.core.coarsen import coarsen
+        return coarsen(self, how, boundary, nthreads, **factors)
+
+    def rolling(self, center=False, min_count=None, **window):
+        """Moving window statistics along one dimension, e.g.::
+
+            gdata.rolling(time=31, center=True).mean()
+
+        ``min_count`` is the minimum number of valid values in a window,
+        which defaults to the window length. See
+        ``geodas.core.rolling.Rolling``; for data coming in blocks, see
+        ``geodas.core.rolling.RollingStream``.
+
+        """
+        from geodas.core.rolling import Rolling
+        if len(window) != 1:
+            raise ValueError("I can only move a window along one dimension "
+                             "at a time")
+        dim, length = list(window.items())[0]
+        return Rolling(self, dim, length, center, min_count)
+
+    def smooth(self, kind='gaussian', keep_nan=False, nthreads=None,
+               **widths):
+        """Smooth with a separable filter, ignoring NaNs, e.g.::
+
+            gdata.smooth('gaussian', latitude=2., longitude=2.)
+
+        The widths are given in grid cells. See
+        ``geodas.core.smoothing.smooth``.
+
+        """
+        from geodas.core.smoothing import smooth
+        return smooth(self, kind, keep_nan, nthreads, **widths)
+
+
+# Deferred evaluation of expressions
+# ----------------------------------------------------------------------------
+
+    def lazy(self):
+        """Return a lazy version of this ``gridded_array``
+
+        Arithmetic on the returned object is deferred and evaluated in one
+        pass by ``evaluate()``, without a full-size temporary array for
+        each intermediate result::
+
+            anomaly = ((data.lazy() - clim) / std).evaluate()
+
+        """
+        from geodas.core.lazy import LazyArray
+        return LazyArray(self)
+
 
 # Return a copy of an existing ``gridded_data`` instance
 # ----------------------------------------------------------------------------
 
     def copy(self):
-        # TODO: replace OrderedDict with CoordinateSet
-        newcoords = OrderedDict()
-        # TODO: add keys() as property to CoordinateSet
-        for dim in list(self.coordinates.keys()):
-            # TODO: implement copy() method for CoordinateArray
-            newcoords[dim] = self.coordinates[dim].copy()
-        newdata = self.data.copy()
-        return gridded_array(newdata, newcoords, self.title)
+        """Return a copy of this ``gridded_array``
+
+        The copy shares the data buffer with this array; the buffer is only
+        copied when one of the two is written to through item assignment or
+        an in-place operator (copy-on-write, see ``data``). Data in shared
+        memory is copied right away, as it is never detached. As coordinates
+        are never modified in place, the coordinate objects are shared.
+
+        """
+        if self._shm is not None:
+            return gridded_array(self.data.copy(),
+                                 CoordinateSet(self.coordinates), self.title,
+                                 self.valid, self.grid)
+        return self._share(self.data, CoordinateSet(self.coordinates),
+                           self.valid, self.grid)
+
+
+# Reduction kernels not provided by bottleneck
+# ============================================================================
+
+def _nancount(data, axis=None):
+    """Count the values in ``data`` which are not NaN"""
+    data = np.asarray(data)
+    if np.issubdtype(data.dtype, np.inexact):
+        return np.sum(~np.isnan(data), axis=axis)
+    if axis is None:
+        return data.size
+    shape = list(data.shape)
+    n = shape.pop(axis)
+    return np.full(shape, n, dtype=np.intp)
 
 
 # Creating ``gridded_array`` objects
 # ============================================================================
 
 def empty(coordinates, dtype=float, masked=False):
-    """Get an empty ``gridded_array`` of dtype ``dtype``."""
-    if masked:
-        _data = ma.empty([coordinates[dim].size for dim in list(coordinates.keys())],
-                                 dtype=dtype)
+    """Get an empty ``gridded_array`` of dtype ``dtype``.
+
+    If ``masked`` is ``True``, all values are marked as missing: floating
+    point data is filled with NaN, integer data gets a ``ValidityMask``.
+    Assigning values with ``gdata[key] = value`` marks them as valid.
+
+    """
+    coordinates = CoordinateSet(coordinates)
+    valid = None
+    if masked and np.issubdtype(np.dtype(dtype), np.inexact):
+        _data = np.full(coordinates.shape, np.nan, dtype=dtype)
     else:
-        _data = np.empty([coordinates[dim].size for dim in list(coordinates.keys())],
-                                 dtype=dtype)
-    return gridded_array(_data, coordinates)
+        _data = np.empty(coordinates.shape, dtype=dtype)
+        if masked:
+            valid = ValidityMask.empty(coordinates.shape)
+    return gridded_array(_data, coordinates, valid=valid)
 
 def ones(coordinates, dtype=float):
     """Get a ``gridded_array`` filled with ones of dtype ``dtype``."""
-    return gridded_array(np.ones([coordinates[dim].size
-                                         for dim in list(coordinates.keys())],
-                                 dtype=dtype), coordinates)
+    coordinates = CoordinateSet(coordinates)
+    return gridded_array(np.ones(coordinates.shape, dtype=dtype), coordinates)
+
+def shared_empty(coordinates, dtype=float):
+    """Get an empty ``gridded_array`` of dtype ``dtype`` in shared memory.
+
+    Pickling the result, e.g. to send it to the workers of a
+    ``multiprocessing.Pool``, only transfers a handle to the memory and the
+    coordinates; the workers map the same memory without copying it, and
+    their writes are seen by all other processes. Unlike for other data,
+    slices of the result are not copied when written to, so that all
+    processes always work on the same memory.
+
+    The memory stays allocated until ``release_shared()`` is called on the
+    result (or an array derived from it) in this process, or until this
+    process exits; it isn't released on garbage collection, as pickled
+    handles may still be waiting to be attached by other processes::
+
+        gdata = shared_empty(coordinates)
+        try:
+            pool.map(fill, [(gdata, i) for i in range(n)])
+        finally:
+            release_shared(gdata)
+
+    """
+    coordinates = CoordinateSet(coordinates)
+    dtype = np.dtype(dtype)
+    buf = SharedBuffer.create(int(np.prod(coordinates.shape)) *
+                              dtype.itemsize)
+    res = gridded_array(buf.ndarray(coordinates.shape, dtype), coordinates)
+    res._shm = buf
+    return res
+
+def release_shared(gdata):
+    """Release the shared memory of ``gdata`` (see ``shared_empty``)
+
+    The arrays which already use the memory stay valid, but it can no
+    longer be attached by other processes. Nothing is done for data which
+    isn't in shared memory, or which was created by another process.
+
+    """
+    if gdata._shm is not None:
+        gdata._shm.close()
 
+def _from_shared(handle, coordinates, title, valid, grid=None):
+    """Unpickle a ``gridded_array`` whose data is in shared memory"""
+    res = gridded_array(from_handle(handle), coordinates, title, valid, grid)
+    res._shm = handle[0]
+    return res
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+#
+# geodas - Geospatial Data Analysis in Python
+#
+# :Author:    Andreas Hilboll <andreas@hilboll.de>
+# :Date:      Wed Jan 23 11:45:02 2013
+# :Website:   http://andreas-h.github.com/geodas/
+# :License:   GPLv3
+# :Version:   0.1
+# :Copyright: (c) 2012-2013 Andreas Hilboll <andreas@hilboll.de>
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Library imports
+# ============================================================================
+
+import numpy as np
+import pandas as pd
+
+from geodas.core.coordinate import DatetimeCoordinate, as_coordinate
+
+
+# Assigning time steps to groups
+# ============================================================================
+
+"""The names of the supported resampling rules, and the according pandas
+period frequencies. Any other pandas period frequency string can be used
+directly."""
+_resample_freqs = {
+                   'hourly' : 'H',
+                   'daily' : 'D',
+                   'pentad' : 'pentad',
+                   'monthly' : 'M',
+                   'seasonal' : 'Q-NOV',
+                   'annual' : 'A',
+                   'yearly' : 'A',
+                  }
+
+
+def _pentad_labels(times):
+    """Pentads are 73 five-day periods per year; in leap years, February
+    29th is part of the 12th pentad."""
+    doy = times.dayofyear - 1
+    year = times.year
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    doy = doy - (leap & (doy >= 59))
+    ordinals = (year - year.min()) * 73 + doy // 5
+    first = ordinals.min()
+    labels = ordinals - first
+    groups = np.arange(first, ordinals.max() + 1)
+    gyear = year.min() + groups // 73
+    gstart = (gyear - 1970).astype('M8[Y]').astype('M8[D]') + \
+             (groups % 73) * 5
+    gleap = (gyear % 4 == 0) & ((gyear % 100 != 0) | (gyear % 400 == 0))
+    gstart = gstart + (gleap & (groups % 73 >= 12))
+    return labels, gstart.astype('M8[ns]')
+
+
+def group_labels(times, rule):
+    """Assign each time step to a resampling period
+
+    Parameters
+    ----------
+    times : array_like
+        the points in time, as ``datetime64`` array or ``DatetimeCoordinate``
+
+    rule : str
+        one of ``hourly``, ``daily``, ``pentad``, ``monthly``, ``seasonal``
+        (DJF, MAM, JJA, SON; December belongs to the following year's DJF),
+        ``annual``/``yearly``, or any pandas period frequency string
+
+    Returns
+    -------
+    labels : numpy.ndarray
+        the index of the period each time step belongs to
+
+    periods : numpy.ndarray
+        the start of all periods between the first and the last time step,
+        as ``datetime64[ns]``
+
+    """
+    if not isinstance(times, DatetimeCoordinate):
+        times = as_coordinate(times, 'time')
+    freq = _resample_freqs.get(rule, rule)
+    if freq == 'pentad':
+        return _pentad_labels(times)
+    try:
+        periods = times.to_datetime().to_period(freq)
+    except ValueError:
+        raise ValueError("You asked me to resample the time coordinate "
+                         "according to the rule '%s', but I don't know how "
+                         "to do that." % rule)
+    ordinals = np.asarray(periods.asi8)
+    labels = ordinals - ordinals.min()
+    periods = pd.period_range(start=periods.min(), end=periods.max(),
+                              freq=periods.freq)
+    return labels, periods.to_timestamp(how='start').values
+
+
+# Reducing groups of data
+# ============================================================================
+
+"""The statistics ``group_reduce`` knows how to calculate"""
+_group_statistics = ['mean', 'sum', 'min', 'max', 'std', 'var', 'count', ]
+
+
+def group_reduce(data, labels, ngroups, axis=0, how='mean'):
+    """Calculate NaN-ignoring statistics of ``data`` for all groups
+
+    All elements along ``axis`` with the same label are reduced. The data
+    is sorted by label (if it isn't already), and then every group is
+    reduced in one pass over the contiguous runs of equal labels. When
+    several statistics are requested, they are all calculated from the
+    same accumulators (sums, counts, minima, maxima). The variance needs a
+    second pass, summing the squared deviations from the group means, which
+    is numerically stable also for data with a large mean.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+
+    labels : numpy.ndarray
+        the group of each element along ``axis``, between 0 and
+        ``ngroups - 1``
+
+    ngroups : int
+
+    axis : int
+
+    how : str or list of str
+        the statistic(s) to calculate; one or more of ``mean``, ``sum``,
+        ``min``, ``max``, ``std``, ``var`` (both with zero degrees of
+        freedom), and ``count`` (the number of valid values)
+
+    Returns
+    -------
+    out : numpy.ndarray or list of numpy.ndarray
+        the group statistics, with ``ngroups`` elements along ``axis``; a
+        list if ``how`` is a list. Groups without any valid data are NaN
+        (0 for ``count``).
+
+    """
+    hows = [how] if isinstance(how, str) else list(how)
+    for h in hows:
+        if h not in _group_statistics:
+            raise ValueError("You asked me to calculate the statistic '%s', "
+                             "but I don't know how to do that." % h)
+    labels = np.asarray(labels)
+    data = np.rollaxis(np.asarray(data), axis)
+    if np.any(labels[1:] < labels[:-1]):
+        order = np.argsort(labels, kind='mergesort')
+        labels = labels[order]
+        data = np.take(data, order, axis=0)
+    starts = np.r_[0, np.flatnonzero(np.diff(labels)) + 1]
+    present = labels[starts]
+    # the accumulators, each only calculated when needed
+    acc = {}
+    valid = ~np.isnan(data)
+    if set(hows) & set(['mean', 'sum', 'std', 'var', 'count']):
+        acc['count'] = np.add.reduceat(valid, starts, axis=0, dtype=np.intp)
+    if set(hows) & set(['mean', 'sum', 'std', 'var']):
+        zeroed = np.where(valid, data, 0.)
+        acc['sum'] = np.add.reduceat(zeroed, starts, axis=0)
+        if set(hows) & set(['std', 'var']):
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = acc['sum'] / acc['count']
+            # centred second moments: deviations from the mean of the group
+            # each element belongs to
+            lengths = np.diff(np.r_[starts, labels.size])
+            dev = data - np.repeat(mean, lengths, axis=0)
+            dev[~valid] = 0.
+            dev *= dev
+            acc['m2'] = np.add.reduceat(dev, starts, axis=0)
+            del dev
+        del zeroed
+    if 'min' in hows:
+        acc['min'] = np.fmin.reduceat(data, starts, axis=0)
+    if 'max' in hows:
+        acc['max'] = np.fmax.reduceat(data, starts, axis=0)
+    del valid
+    res = []
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for h in hows:
+            if h == 'count':
+                group = acc['count']
+            elif h == 'mean':
+                group = acc['sum'] / acc['count']
+            elif h == 'sum':
+                group = np.where(acc['count'] > 0, acc['sum'], np.nan)
+            elif h in ['std', 'var']:
+                group = acc['m2'] / acc['count']
+                if h == 'std':
+                    group = np.sqrt(group)
+            else:
+                group = acc[h]
+            out = np.empty((ngroups, ) + data.shape[1:],
+                           dtype=np.intp if h == 'count' else
+                                 np.result_type(group.dtype, float))
+            out.fill(0 if h == 'count' else np.nan)
+            out[present] = group
+            res.append(np.rollaxis(out, 0, axis + 1))
+    return res[0] if isinstance(how, str) else res
@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+#
+# geodas - Geospatial Data Analysis in Python
+#
+# :Author:    Andreas Hilboll <andreas@hilboll.de>
+# :Date:      Wed Jan 23 11:45:02 2013
+# :Website:   http://andreas-h.github.com/geodas/
+# :License:   GPLv3
+# :Version:   0.1
+# :Copyright: (c) 2012-2013 Andreas Hilboll <andreas@hilboll.de>
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Library imports
+# ============================================================================
+
+import numpy as np
+
+from geodas.core.area import cell_bounds
+from geodas.core.coordinate import RegularCoordinateArray, as_coordinate
+from geodas.core.coordinate import _values_key
+
+
+# Index and weight tables along one axis
+# ============================================================================
+
+class InterpolationTable(object):
+    """How to interpolate along one axis from one coordinate to another
+
+    Parameters
+    ----------
+    index : numpy.ndarray
+        for each target point, the index of the (left) source point
+
+    weight : numpy.ndarray
+        for linear interpolation, the weight of the right source point
+        ``index + 1``; ``None`` for nearest-neighbour interpolation
+
+    outside : numpy.ndarray
+        the indices of the target points outside the source grid
+
+    """
+
+    __slots__ = ('index', 'weight', 'outside')
+
+    def __init__(self, index, weight, outside):
+        self.index = index
+        self.weight = weight
+        self.outside = outside
+
+    def apply(self, data, axis):
+        """Interpolate ``data`` along ``axis``"""
+        if self.weight is None:
+            res = data.take(self.index, axis=axis)
+        else:
+            if not np.issubdtype(data.dtype, np.inexact):
+                data = data.astype(float)
+            shape = [1] * data.ndim
+            shape[axis] = self.weight.size
+            weight = self.weight.reshape(shape)
+            res = data.take(self.index, axis=axis)
+            right = data.take(self.index + 1, axis=axis)
+            # res * (1 - weight) + right * weight, without further
+            # temporaries; terms with zero weight must not contribute, not
+            # even NaN
+            res *= 1. - weight
+            np.copyto(res, 0., where=(weight == 1.))
+            right *= weight
+            np.copyto(right, 0., where=(weight == 0.))
+            res += right
+        if self.outside.size:
+            if not np.issubdtype(res.dtype, np.inexact):
+                res = res.astype(float)
+            index = [slice(None)] * res.ndim
+            index[axis] = self.outside
+            res[tuple(index)] = np.nan
+        return res
+
+
+def _positions(src, dst):
+    """Fractional index of the values ``dst`` in the sorted coordinate
+    ``src``"""
+    if isinstance(src, RegularCoordinateArray):
+        return (dst - src.start) / float(src.step)
+    values = np.asarray(src)
+    if np.issubdtype(values.dtype, np.datetime64):
+        # points in time are converted to (float) nanoseconds
+        values = values.astype('M8[ns]').view(np.int64)
+        dst = np.asarray(dst, dtype='M8[ns]').view(np.int64)
+    values = values.astype(float)
+    dst = np.asarray(dst, dtype=float)
+    if values[0] > values[-1]:
+        return values.size - 1 - _array_positions(values[::-1], dst)
+    return _array_positions(values, dst)
+
+
+def _array_positions(values, dst):
+    i = np.clip(np.searchsorted(values, dst) - 1, 0, values.size - 2)
+    return i + (dst - values[i]) / (values[i + 1] - values[i])
+
+
+def _linear_table(src, dst):
+    dst = np.asarray(dst, dtype=float)
+    n = src.size
+    pos = _positions(src, dst)
+    eps = 1e-9
+    outside = np.flatnonzero((pos < -eps) | (pos > n - 1 + eps))
+    pos = np.clip(pos, 0, n - 1)
+    index = np.minimum(np.floor(pos).astype(np.intp), n - 2)
+    return InterpolationTable(index, pos - index, outside)
+
+
+def _nearest_table(src, dst):
+    dst = np.asarray(dst, dtype=float)
+    n = src.size
+    pos = _positions(src, dst)
+    index = np.clip(np.floor(pos + .5).astype(np.intp), 0, n - 1)
+    bounds = cell_bounds(src)
+    outside = np.flatnonzero((dst < bounds.min()) | (dst > bounds.max()))
+    return InterpolationTable(index, None, outside)
+
+
+_methods = {'linear': _linear_table, 'bilinear': _linear_table,
+            'nearest': _nearest_table}
+
+_tables_cache = {}
+_tables_cache_size = 64
+
+
+def get_interpolation_table(src, dst, method='linear'):
+    """Get the (cached) ``InterpolationTable`` from the coordinate ``src``
+    to the coordinate values ``dst``
+
+    Tables are cached by the coordinate values, so that interpolating many
+    arrays between the same grids computes them only once.
+
+    """
+    if method not in _methods:
+        raise ValueError("You asked me to interpolate with the method '%s', "
+                         "but I only know %s" % (method,
+                                                 ", ".join(sorted(_methods))))
+    src = as_coordinate(src, None)
+    dst = as_coordinate(dst, None)
+    if src.size < 2:
+        raise ValueError("I cannot interpolate from a coordinate with less "
+                         "than two points")
+    key = (_methods[method], _values_key(src), _values_key(dst))
+    table = _tables_cache.get(key)
+    if table is None:
+        if len(_tables_cache) >= _tables_cache_size:
+            _tables_cache.clear()
+        table = _methods[method](src, dst)
+        _tables_cache[key] = table
+    return table
+
+
+# Extraction of values at points
+# ============================================================================
+
+def sample(gdata, method='nearest', as_array=False, max_distance=None,
+           **points):
+    """Extract the values of ``gdata`` at many points
+
+    The points are given as keyword arguments with one array of coordinate
+    values per dimension, e.g.::
+
+        sample(gdata, latitude=lats, longitude=lons)
+
+    The position of the points on the grid is calculated arithmetically for
+    regular coordinates, and with a binary search otherwise. ``method`` is
+    ``'nearest'``, or ``'linear'`` for multilinear interpolation between
+    the surrounding grid points. Points outside the grid are NaN.
+
+    If ``gdata`` is on a curvilinear grid (see
+    ``geodas.core.curvilinear``), ``latitude`` and ``longitude`` refer to
+    the two-dimensional grid point locations; the nearest grid points are
+    found in the spatial index of the grid, and only ``'nearest'`` is
+    supported. Points farther than ``max_distance`` (in m) from any grid
+    point are NaN.
+
+    Returns
+    -------
+    out : gridded_array
+        with the dimensions which were not sampled, followed by a new
+        ``point`` dimension; if ``as_array`` is ``True``, only the data
+        array is returned
+
+    """
+    from geodas.core.coordinate import CoordinateArray, CoordinateSet
+    from geodas.core.gridded_array import gridded_array
+    if method not in ('nearest', 'linear'):
+        raise ValueError("You asked me to sample with the method '%s', but "
+                         "I only know 'nearest' and 'linear'" % method)
+    coordinates = gdata.coordinates
+    # on curvilinear grids, the latitudes and longitudes translate to
+    # indices along the two grid dimensions
+    grid_index = {}
+    grid = gdata.grid
+    if (grid is not None and 'latitude' in points and 'longitude' in points
+            and 'latitude' not in coordinates):
+        if method != 'nearest':
+            raise ValueError("You asked me to sample a curvilinear grid with "
+                             "the method '%s', but I only know 'nearest' "
+                             "there" % method)
+        lat, lon = np.broadcast_arrays(np.ravel(points.pop('latitude')),
+                                       np.ravel(points.pop('longitude')))
+        grid_index = dict(zip(grid.dims, grid.nearest(lat, lon,
+                                                      max_distance)))
+        for dim in grid.dims:
+            points[dim] = grid_index[dim]
+    try:
+        axes = [coordinates.axis(dim) for dim in points]
+    except ValueError:
+        raise ValueError("You asked me to sample along %s, but I only know "
+                         "the dimensions %s" % (", ".join(points),
+                                                ", ".join(coordinates.dims)))
+    for dim in points:
+        if dim not in grid_index and not coordinates.is_monotonic(dim):
+            raise ValueError("I can only sample along sorted coordinates, "
+                             "and %s isn't sorted" % dim)
+    values = np.broadcast_arrays(*[np.ravel(v) for v in points.values()])
+    npoints = values[0].size
+    # the sampled axes go last, so that the gathered points form the last
+    # axis of the result
+    others = [i for i in range(len(coordinates)) if i not in axes]
+    data = gdata.filled().transpose(others + axes)
+    outside = np.zeros(npoints, dtype=bool)
+    indices, weights = [], []
+    for dim, v in zip(points, values):
+        n = coordinates[dim].size
+        if dim in grid_index:
+            outside |= v < 0
+            indices.append(np.maximum(v, 0))
+            weights.append(None)
+            continue
+        pos = _positions(coordinates[dim], v)
+        if method == 'nearest' or n == 1:
+            outside |= (pos < -.5) | (pos > n - .5)
+            indices.append(np.clip(np.floor(pos + .5), 0,
+                                   n - 1).astype(np.intp))
+            weights.append(None)
+        else:
+            outside |= (pos < -1e-9) | (pos > n - 1 + 1e-9)
+            pos = np.clip(pos, 0, n - 1)
+            index = np.minimum(np.floor(pos).astype(np.intp), n - 2)
+            indices.append(index)
+            weights.append(pos - index)
+    if all(w is None for w in weights):
+        res = data[(Ellipsis, ) + tuple(indices)]
+    else:
+        res = np.zeros(data.shape[:len(others)] + (npoints, ))
+        # add up the contributions of all corners of the grid cells
+        linear = [i for i, w in enumerate(weights) if w is not None]
+        for corner in range(2 ** len(linear)):
+            index = list(indices)
+            factor = 1.
+            for bit, i in enumerate(linear):
+                if corner >> bit & 1:
+                    index[i] = indices[i] + 1
+                    factor = factor * weights[i]
+                else:
+                    factor = factor * (1. - weights[i])
+            # corners with zero weight must not contribute, not even NaN
+            res += np.where(factor > 0,
+                            data[(Ellipsis, ) + tuple(index)] * factor, 0.)
+    if outside.any():
+        if not np.issubdtype(res.dtype, np.inexact):
+            res = res.astype(float)
+        res[..., outside] = np.nan
+    if as_array:
+        return res
+    newcoords = CoordinateSet([(coordinates.name(i),
+                                coordinates[coordinates.name(i)])
+                               for i in others] +
+                              [('point', CoordinateArray(np.arange(npoints),
+                                                         'point'))])
+    return gridded_array(res, newcoords, gdata.title)
@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+#
+# geodas - Geospatial Data Analysis in Python
+#
+# :Author:    Andreas Hilboll <andreas@hilboll.de>
+# :Date:      Wed Jan 23 11:45:02 2013
+# :Website:   http://andreas-h.github.com/geodas/
+# :License:   GPLv3
+# :Version:   0.1
+# :Copyright: (c) 2012-2013 Andreas Hilboll <andreas@hilboll.de>
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Library imports
+# ============================================================================
+
+import numpy as np
+
+from geodas.core.alignment import get_alignment_plan
+from geodas.core.gridded_array import gridded_array
+
+
+# The operations which can be deferred
+# ============================================================================
+
+"""The supported operations: name -> (numpy ufunc, numexpr template)"""
+_operations = {
+               'add' : (np.add, '(%s + %s)'),
+               'subtract' : (np.subtract, '(%s - %s)'),
+               'multiply' : (np.multiply, '(%s * %s)'),
+               'divide' : (np.true_divide, '(%s / %s)'),
+               'power' : (np.power, '(%s ** %s)'),
+               'negative' : (np.negative, '(-%s)'),
+               'absolute' : (np.absolute, 'abs(%s)'),
+               'sqrt' : (np.sqrt, 'sqrt(%s)'),
+               'exp' : (np.exp, 'exp(%s)'),
+               'log' : (np.log, 'log(%s)'),
+               'less' : (np.less, '(%s < %s)'),
+               'less_equal' : (np.less_equal, '(%s <= %s)'),
+               'greater' : (np.greater, '(%s > %s)'),
+               'greater_equal' : (np.greater_equal, '(%s >= %s)'),
+              }
+
+"""numpy ufuncs which are deferred when applied to lazy expressions"""
+_ufunc_names = dict((v[0], k) for k, v in _operations.items())
+
+
+# Expression graph nodes
+# ============================================================================
+
+class LazyNode(object):
+    """Base class for the nodes of a deferred expression
+
+    Arithmetic operators and some numpy ufuncs (``sqrt``, ``exp``, ``log``,
+    ``absolute``) applied to lazy nodes don't calculate anything; they only
+    record the expression. ``evaluate`` then calculates the whole
+    expression at once, without a full-size temporary array per
+    operation.
+
+    """
+
+    # make numpy defer to our reflected operators in older numpy versions
+    __array_priority__ = 30
+    _deferred = True
+    operands = ()
+
+    def _combine(self, op, *operands):
+        return LazyExpression(op, [self] + list(operands))
+
+    def _rcombine(self, op, other):
+        return LazyExpression(op, [other, self])
+
+    def __add__(self, other):
+        return self._combine('add', other)
+
+    def __radd__(self, other):
+        return self._rcombine('add', other)
+
+    def __sub__(self, other):
+        return self._combine('subtract', other)
+
+    def __rsub__(self, other):
+        return self._rcombine('subtract', other)
+
+    def __mul__(self, other):
+        return self._combine('multiply', other)
+
+    def __rmul__(self, other):
+        return self._rcombine('multiply', other)
+
+    def __truediv__(self, other):
+        return self._combine('divide', other)
+
+    def __rtruediv__(self, other):
+        return self._rcombine('divide', other)
+
+    __div__ = __truediv__
+    __rdiv__ = __rtruediv__
+
+    def __pow__(self, other):
+        return self._combine('power', other)
+
+    def __rpow__(self, other):
+        return self._rcombine('power', other)
+
+    def __neg__(self):
+        return self._combine('negative')
+
+    def __abs__(self):
+        return self._combine('absolute')
+
+    def __lt__(self, other):
+        return self._combine('less', other)
+
+    def __le__(self, other):
+        return self._combine('less_equal', other)
+
+    def __gt__(self, other):
+        return self._combine('greater', other)
+
+    def __ge__(self, other):
+        return self._combine('greater_equal', other)
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if method != '__call__' or kwargs or ufunc not in _ufunc_names:
+            return NotImplemented
+        return LazyExpression(_ufunc_names[ufunc], list(inputs))
+
+    def leaves(self):
+        """All ``LazyArray`` leaves of the expression, each one once, in
+        the order of their first appearance"""
+        if not self.operands:
+            return [self]
+        res = []
+        for o in self.operands:
+            if isinstance(o, LazyNode):
+                res.extend(l for l in o.leaves() if l not in res)
+        return res
+
+    def evaluate(self, out=None, blocksize=2 ** 18, engine=None):
+        """Evaluate the expression
+
+        Parameters
+        ----------
+        out : numpy.ndarray
+            an array to store the result in; it needs to have the shape of
+            the result
+
+        blocksize : int
+            the approximate number of elements evaluated at once when using
+            numpy; each intermediate result only needs a scratch buffer of
+            this size
+
+        engine : str
+            ``'numexpr'`` or ``'numpy'``. By default, numexpr is used if it
+            can be imported.
+
+        Returns
+        -------
+        out : gridded_array
+
+        """
+        coordinates = self.coordinates
+        leaves = self.leaves()
+        views = {}
+        for leaf in leaves:
+            plan = get_alignment_plan(coordinates, leaf.gdata.coordinates)
+            views[id(leaf)] = plan.align_second(leaf.gdata.filled())
+        dtype = self._dtype(dict((k, v.dtype) for k, v in views.items()))
+        if out is None:
+            out = np.empty(coordinates.shape, dtype=dtype)
+        elif out.shape != coordinates.shape:
+            raise ValueError("The output array needs to have the shape %s" %
+                             (coordinates.shape, ))
+        if engine is None:
+            try:
+                import numexpr
+                engine = 'numexpr'
+            except ImportError:
+                engine = 'numpy'
+        title = leaves[0].gdata.title if leaves else ""
+        if engine == 'numexpr':
+            import numexpr
+            names = {}
+            expr = self._numexpr(views, names)
+            # '/' is true division, as ``numpy.true_divide`` with numpy
+            numexpr.evaluate(expr, local_dict=names, out=out,
+                             casting='same_kind', truediv=True)
+            return gridded_array(out, coordinates, title)
+        if engine != 'numpy':
+            raise ValueError("I don't know the evaluation engine %s" % engine)
+        # evaluate block by block along the outermost axis
+        nrows = out.shape[0] if out.ndim else 1
+        rowsize = max(1, out.size // max(nrows, 1))
+        step = max(1, blocksize // rowsize)
+        scratch = {}
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for start in range(0, nrows, step):
+                block = slice(start, start + step)
+                if out.ndim:
+                    blockviews = dict((k, v[block] if v.ndim and
+                                       v.shape[0] == nrows else v)
+                                      for k, v in views.items())
+                    self._numpy(blockviews, scratch, out[block])
+                else:
+                    self._numpy(views, scratch, out)
+        return gridded_array(out, coordinates, title)
+
+
+class LazyArray(LazyNode):
+    """A ``gridded_array`` as leaf of a deferred expression"""
+
+    def __init__(self, gdata):
+        self.gdata = gdata
+        self.coordinates = gdata.coordinates
+
+    def _dtype(self, dtypes):
+        return dtypes[id(self)]
+
+    def _numexpr(self, views, names):
+        name = 'a%d' % len(names)
+        names[name] = views[id(self)]
+        return name
+
+    def _numpy(self, views, scratch, out=None):
+        if out is None:
+            return views[id(self)]
+        out[...] = views[id(self)]
+        return out
+
+
+class LazyExpression(LazyNode):
+    """An operation on other lazy nodes, ``gridded_array`` objects or
+    scalars"""
+
+    def __init__(self, op, operands):
+        self.op = op
+        self.operands = [LazyArray(o) if isinstance(o, gridded_array) else o
+                         for o in operands]
+        coordinates = None
+        for o in self.operands:
+            if isinstance(o, LazyNode):
+                if coordinates is None:
+                    coordinates = o.coordinates
+                else:
+                    coordinates = get_alignment_plan(coordinates,
+                                                     o.coordinates
+                                                     ).coordinates
+            elif np.ndim(o) != 0:
+                raise ValueError("Only gridded arrays and scalars can be "
+                                 "part of deferred expressions")
+        self.coordinates = coordinates
+
+    def _dtype(self, dtypes):
+        args = [np.ones((), dtype=o._dtype(dtypes))
+                if isinstance(o, LazyNode) else o for o in self.operands]
+        with np.errstate(all='ignore'):
+            return np.asarray(_operations[self.op][0](*args)).dtype
+
+    def _numexpr(self, views, names):
+        args = []
+        for o in self.operands:
+            if isinstance(o, LazyNode):
+                args.append(o._numexpr(views, names))
+            else:
+                name = 's%d' % len(names)
+                names[name] = o
+                args.append(name)
+        return _operations[self.op][1] % tuple(args)
+
+    def _numpy(self, views, scratch, out=None):
+        """Evaluate with numpy; intermediate results are written into
+        scratch buffers, which are reused for all blocks"""
+        args = []
+        buffers = []
+        for o in self.operands:
+            if isinstance(o, LazyExpression):
+                res = o._numpy(views, scratch)
+                buffers.append(res)
+                args.append(res)
+            elif isinstance(o, LazyNode):
+                args.append(o._numpy(views, scratch))
+            else:
+                args.append(o)
+        ufunc = _operations[self.op][0]
+        if out is None:
+            shape = np.broadcast(*[np.empty(np.shape(a), dtype=bool)
+                                   for a in args]).shape
+            dtype = ufunc(*[np.ones((), dtype=np.asarray(a).dtype)
+                            if np.ndim(a) else a for a in args]).dtype
+            key = (shape, dtype)
+            out = scratch.get(key, [])
+            out = out.pop() if out else np.empty(shape, dtype=dtype)
+        ufunc(*args, out=out)
+        # the children's scratch buffers can be used again
+        for buf in buffers:
+            scratch.setdefault((buf.shape, buf.dtype), []).append(buf)
+        return out
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+#
+# geodas - Geospatial Data Analysis in Python
+#
+# :Author:    Andreas Hilboll <andreas@hilboll.de>
+# :Date:      Wed Jan 23 11:45:02 2013
+# :Website:   http://andreas-h.github.com/geodas/
+# :License:   GPLv3
+# :Version:   0.1
+# :Copyright: (c) 2012-2013 Andreas Hilboll <andreas@hilboll.de>
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Library imports
+# ============================================================================
+
+import numpy as np
+import numpy.ma as ma
+
+
+# Missing values
+# ============================================================================
+#
+# Missing values are NaN. Integer data cannot hold NaN, so it can carry a
+# ``ValidityMask`` instead, which is converted to NaN (and float) whenever
+# the data is used in a calculation. ``numpy.ma`` masked arrays are only
+# created on demand, e.g. for plotting.
+
+"""The number of set bits for each byte value"""
+_popcount = np.array([bin(i).count('1') for i in range(256)], dtype=np.intp)
+
+
+class ValidityMask(object):
+    """Compact validity mask of an array, storing one bit per element
+
+    Parameters
+    ----------
+    bits : numpy.ndarray
+        the flattened (C order) boolean mask, packed with ``numpy.packbits``
+
+    shape : tuple
+        the shape of the masked array
+
+    """
+
+    def __init__(self, bits, shape):
+        self.bits = bits
+        self.shape = tuple(shape)
+
+    @classmethod
+    def from_bool(cls, valid):
+        """Pack the boolean array ``valid``, which is ``True`` for valid
+        elements"""
+        valid = np.asarray(valid, dtype=bool)
+        return cls(np.packbits(valid.ravel()), valid.shape)
+
+    @classmethod
+    def empty(cls, shape):
+        """A mask marking all elements of an array of ``shape`` as missing"""
+        size = int(np.prod(shape))
+        return cls(np.zeros((size + 7) // 8, dtype=np.uint8), shape)
+
+    def to_bool(self):
+        """The mask as boolean array"""
+        return np.unpackbits(self.bits)[:self.size].view(bool).reshape(
+                                                                   self.shape)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+    def count(self):
+        """The number of valid elements"""
+        # the padding bits of the last byte are always zero
+        return int(_popcount[self.bits].sum())
+
+    def __getitem__(self, key):
+        return ValidityMask.from_bool(self.to_bool()[key])
+
+
+def isvalid(data, valid=None):
+    """Boolean array which is ``True`` for the valid elements of ``data``"""
+    if valid is not None:
+        return valid.to_bool()
+    data = np.asarray(data)
+    if np.issubdtype(data.dtype, np.inexact):
+        return ~np.isnan(data)
+    return np.ones(data.shape, dtype=bool)
+
+
+def filled(data, valid=None, value=np.nan):
+    """Return ``data`` with its missing values replaced by ``value``
+
+    Without a validity mask, ``data`` is returned unchanged if ``value`` is
+    NaN. Integer data with a validity mask is converted to float if
+    ``value`` is NaN.
+
+    """
+    if valid is None:
+        if np.isnan(value) or not np.issubdtype(np.asarray(data).dtype,
+                                                np.inexact):
+            return data
+        return np.where(np.isnan(data), value, data)
+    dtype = np.result_type(data, value)
+    return np.where(valid.to_bool(), data, np.array(value, dtype=dtype))
+
+
+def masked(data, valid=None):
+    """Return ``data`` as ``numpy.ma.MaskedArray``, without copying"""
+    if isinstance(data, ma.MaskedArray):
+        return data
+    return ma.MaskedArray(data, mask=~isvalid(data, valid), copy=False)
+
+
+def mask_fill_value(data, fill):
+    """Mark the elements of ``data`` equal to ``fill`` as missing
+
+    Floating point data gets NaN at these elements, integer data gets a
+    ``ValidityMask``; masked arrays (as returned by some file readers) are
+    treated the same way.
+
+    Returns
+    -------
+    data : numpy.ndarray
+
+    valid : ValidityMask or None
+
+    """
+    if isinstance(data, ma.MaskedArray):
+        missing = ma.getmaskarray(data)
+        data = data.data
+    else:
+        data = np.asarray(data)
+        missing = None
+    if fill is not None and not np.isnan(fill):
+        if missing is None:
+            missing = data == fill
+        else:
+            missing |= data == fill
+    if missing is None or not missing.any():
+        return data, None
+    if np.issubdtype(data.dtype, np.inexact):
+        if not data.flags.writeable:
+            data = data.copy()
+        data[missing] = np.nan
+        return data, None
+    return data, ValidityMask.from_bool(~missing)
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+#
+# geodas - Geospatial Data Analysis in Python
+#
+# :Author:    Andreas Hilboll <andreas@hilboll.de>
+# :Date:      Wed Jan 23 11:45:02 2013
+# :Website:   http://andreas-h.github.com/geodas/
+# :License:   GPLv3
+# :Version:   0.1
+# :Copyright: (c) 2012-2013 Andreas Hilboll <andreas@hilboll.de>
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Library imports
+# ============================================================================
+
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+
+
+# Number of worker threads
+# ============================================================================
+
+_num_threads = None
+
+"""Arrays with fewer elements are always reduced in the calling thread"""
+_min_parallel_size = 2 ** 20
+
+"""The maximum number of elements of the tiles of ``parallel_tiles``"""
+_max_tile_size = 2 ** 22
+
+
+def set_num_threads(nthreads):
+    """Set the default number of worker threads for reductions
+
+    If ``nthreads`` is ``None``, the value of the ``threads`` entry of the
+    ``[geodas]`` section in ``~/.geodasrc`` is used, or the number of CPUs
+    if there is no such entry.
+
+    """
+    global _num_threads
+    _num_threads = None if nthreads is None else max(1, int(nthreads))
+
+
+def get_num_threads():
+    """Get the default number of worker threads for reductions"""
+    if _num_threads is not None:
+        return _num_threads
+    import geodas
+    try:
+        return max(1, int(geodas.__config__['threads']))
+    except (AttributeError, KeyError, ValueError):
+        return multiprocessing.cpu_count()
+
+
+# Tiled reductions in a thread pool
+# ============================================================================
+
+def parallel_reduce(func, data, axis, nthreads=None, **kwargs):
+    """Reduce ``data`` along ``axis`` with ``func``, tile by tile in threads
+
+    The array is split into tiles along its outermost non-reduced axis, and
+    ``func(tile, axis=axis, **kwargs)`` is called for all tiles in a pool
+    of threads. This relies on ``func`` releasing the GIL, which is the case
+    for the bottleneck and most numpy reductions. The partial results are
+    written into one preallocated output array.
+
+    Parameters
+    ----------
+    func : callable
+
+    data : numpy.ndarray
+
+    axis : int
+        the (single) axis to reduce
+
+    nthreads : int
+        the number of worker threads; defaults to ``get_num_threads()``.
+        Small arrays, and arrays which have no other axis to split along,
+        are reduced in the calling thread.
+
+    Returns
+    -------
+    out : numpy.ndarray
+
+    """
+    if nthreads is None:
+        nthreads = get_num_threads()
+    axis = axis % data.ndim
+    others = [i for i in range(data.ndim) if i != axis]
+    if nthreads < 2 or not others or data.size < _min_parallel_size:
+        return func(data, axis=axis, **kwargs)
+    # prefer splitting along an outer axis, which gives large contiguous
+    # blocks within each tile
+    split = [i for i in others if data.shape[i] >= nthreads]
+    split = split[0] if split else max(others, key=lambda i: data.shape[i])
+    ntiles = min(data.shape[split], 4 * nthreads)
+    bounds = np.linspace(0, data.shape[split], ntiles + 1).astype(int)
+    tiles = list(zip(bounds[:-1], bounds[1:]))
+
+    def _tile(i):
+        index = [slice(None)] * data.ndim
+        index[split] = slice(*tiles[i])
+        return func(data[tuple(index)], axis=axis, **kwargs)
+
+    # reduce the first tile in the calling thread to learn the output dtype
+    first = _tile(0)
+    # the split axis' position in the output array; some functions (like
+    # ``numpy.nanpercentile``) prepend additional axes
+    outsplit = (split if split < axis else split - 1) + \
+               first.ndim - (data.ndim - 1)
+    outshape = list(first.shape)
+    outshape[outsplit] = data.shape[split]
+    out = np.empty(outshape, dtype=first.dtype)
+
+    def _store(i, res):
+        index = [slice(None)] * out.ndim
+        index[outsplit] = slice(*tiles[i])
+        out[tuple(index)] = res
+
+    _store(0, first)
+    pool = ThreadPool(min(nthreads, len(tiles) - 1) or 1)
+    try:
+        pool.map(lambda i: _store(i, _tile(i)), range(1, len(tiles)))
+    finally:
+        pool.close()
+        pool.join()
+    return out
+
+
+# Tiled filters with overlapping halos
+# ============================================================================
+
+def parallel_tiles(func, data, axis, halo=0, nthreads=None):
+    """Apply ``func`` to ``data`` tile by tile along ``axis``, in threads
+
+    ``func`` has to return an array of the same shape as its argument.
+    The tiles are extended by ``halo`` elements on both sides (as far as
+    ``data`` reaches), so that filters reaching at most ``halo`` elements
+    along ``axis`` give the same result as on the whole array; only the
+    inner part of each tile's result is stored in the output array. The
+    tiles have at most ``_max_tile_size`` elements (plus the halo), which
+    bounds the memory needed for temporary arrays in ``func``.
+
+    Parameters
+    ----------
+    func : callable
+
+    data : numpy.ndarray
+
+    axis : int
+        the axis to split ``data`` along
+
+    halo : int
+
+    nthreads : int
+        the number of worker threads; defaults to ``get_num_threads()``
+
+    Returns
+    -------
+    out : numpy.ndarray
+
+    """
+    if nthreads is None:
+        nthreads = get_num_threads()
+    axis = axis % data.ndim
+    n = data.shape[axis]
+    ntiles = -(-data.size // _max_tile_size)
+    if nthreads > 1 and data.size >= _min_parallel_size:
+        ntiles = max(ntiles, 4 * nthreads)
+    ntiles = max(1, min(ntiles, n))
+    if ntiles == 1:
+        return func(data)
+    bounds = np.linspace(0, n, ntiles + 1).astype(int)
+    tiles = list(zip(bounds[:-1], bounds[1:]))
+
+    def _tile(i):
+        start, stop = tiles[i]
+        index = [slice(None)] * data.ndim
+        index[axis] = slice(max(start - halo, 0), min(stop + halo, n))
+        res = func(data[tuple(index)])
+        index[axis] = slice(start - max(start - halo, 0),
+                            stop - max(start - halo, 0))
+        return res[tuple(index)]
+
+    first = _tile(0)
+    out = np.empty(data.shape, dtype=first.dtype)
+
+    def _store(i, res):
+        index = [slice(None)] * out.ndim
+        index[axis] = slice(*tiles[i])
+        out[tuple(index)] = res
+
+    _store(0, first)
+    if nthreads < 2:
+        for i in range(1, len(tiles)):
+            _store(i, _tile(i))
+        return out
+    pool = ThreadPool(min(nthreads, len(tiles) - 1))
+    try:
+        pool.map(lambda i: _store(i, _tile(i)), range(1, len(tiles)))
+    finally:
+        pool.close()
+        pool.join()
+    return out
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+#
+# geodas - Geospatial Data Analysis in Python
+#
+# :Author:    Andreas Hilboll <andreas@hilboll.de>
+# :Date:      Wed Jan 23 11:45:02 2013
+# :Website:   http://andreas-h.github.com/geodas/
+# :License:   GPLv3
+# :Version:   0.1
+# :Copyright: (c) 2012-2013 Andreas Hilboll <andreas@hilboll.de>
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Library imports
+# ============================================================================
+
+try:
+    import copyreg
+except ImportError:
+    import copy_reg as copyreg
+
+import numpy as np
+
+try:
+    from pickle import PickleBuffer
+except ImportError:
+    try:
+        from pickle5 import PickleBuffer
+    except ImportError:
+        # Python < 3.8 without the pickle5 backport. This includes Python 2,
+        # where protocol 5 doesn't exist and everything below is inert:
+        # reduce_with_buffers always lets the default pickling take over.
+        PickleBuffer = None
+
+
+# Out-of-band pickling of data buffers (pickle protocol 5)
+# ============================================================================
+
+class OutOfBand(object):
+    """Wrapper which pickles the ``numpy.ndarray`` ``arr`` as a
+    ``PickleBuffer``
+
+    With protocol 5 and a ``buffer_callback``, the array's memory is handed
+    to the callback instead of being copied into the pickle stream; without
+    a callback, it is written to the stream with one copy. Unpickling
+    returns the array itself, not the wrapper.
+
+    """
+
+    def __init__(self, arr):
+        self.arr = arr
+
+    def __reduce_ex__(self, protocol):
+        arr = self.arr
+        if arr.flags.c_contiguous:
+            order = 'C'
+        elif arr.flags.f_contiguous:
+            order = 'F'
+        else:
+            arr = np.ascontiguousarray(arr)
+            order = 'C'
+        # export the raw bytes, as not all dtypes (e.g. datetime64) support
+        # the buffer protocol
+        buf = PickleBuffer(arr.ravel(order=order).view(np.uint8))
+        return (_from_buffer, (buf, arr.dtype.str, arr.shape, order))
+
+
+def _from_buffer(buf, dtype, shape, order):
+    """Rebuild an array from an out-of-band buffer, without copying"""
+    arr = np.frombuffer(buf, dtype=np.dtype(dtype))
+    return arr.reshape(shape, order=order)
+
+
+def reduce_with_buffers(obj, protocol, state, names):
+    """Implementation of ``__reduce_ex__`` pickling the arrays stored as
+    ``names`` in ``state`` out-of-band
+
+    Returns ``None`` if out-of-band pickling isn't available for
+    ``protocol``, so that the caller can fall back to the default.
+
+    """
+    if protocol < 5 or PickleBuffer is None:
+        return None
+    state = dict(state)
+    for name in names:
+        arr = state.get(name)
+        if (type(arr) is np.ndarray and arr.size and
+                not arr.dtype.hasobject):
+            state[name] = OutOfBand(arr)
+    return (copyreg.__newobj__, (type(obj), ), state)
+
+
+# State of objects with ``__slots__``
+# ============================================================================
+
+def _slot_descriptors(cls):
+    """The slot descriptors of ``cls`` and its base classes, by name"""
+    res = {}
+    for klass in reversed(cls.__mro__):
+        for name in klass.__dict__.get('__slots__', ()):
+            if name not in ('__weakref__', '__dict__'):
+                res[name] = klass.__dict__[name]
+    return res
+
+
+def get_slots_state(obj):
+    """The values of all ``__slots__`` of ``obj`` which are set, as dict"""
+    state = {}
+    for name, descr in _slot_descriptors(type(obj)).items():
+        try:
+            state[name] = descr.__get__(obj, type(obj))
+        except AttributeError:
+            pass
+    return state
+
+
+def set_slots_state(obj, state):
+    """Set the ``__slots__`` of ``obj`` from the dict ``state``"""
+    descriptors = _slot_descriptors(type(obj))
+    for name, value in state.items():
+        descriptors[name].__set__(obj, value)
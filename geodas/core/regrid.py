@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+#
+# geodas - Geospatial Data Analysis in Python
+#
+# :Author:    Andreas Hilboll <andreas@hilboll.de>
+# :Date:      Wed Jan 23 11:45:02 2013
+# :Website:   http://andreas-h.github.com/geodas/
+# :License:   GPLv3
+# :Version:   0.1
+# :Copyright: (c) 2012-2013 Andreas Hilboll <andreas@hilboll.de>
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Library imports
+# ============================================================================
+
+import hashlib
+import os
+import os.path
+
+import numpy as np
+
+from geodas.core.area import cell_bounds
+from geodas.core.coordinate import CoordinateSet, as_coordinate
+
+
+# One-dimensional overlap of grid cells
+# ============================================================================
+
+def _overlap_matrix(src_bounds, dst_bounds, transform=None):
+    """Overlap of the source cells with the target cells, as sparse matrix
+
+    Element ``(j, i)`` is the length of the overlap of source cell ``i`` with
+    target cell ``j``, measured in ``transform(x)`` (e.g. the sine of the
+    latitude). The boundaries can be ascending or descending.
+
+    All cell boundaries are merged into one sorted list; each segment
+    between two consecutive boundaries lies in exactly one source and one
+    target cell, so the overlaps are found in O((n + m) log(n + m)) time.
+
+    """
+    import scipy.sparse as sp
+    nsrc, ndst = src_bounds.size - 1, dst_bounds.size - 1
+    src_flip = src_bounds[0] > src_bounds[-1]
+    dst_flip = dst_bounds[0] > dst_bounds[-1]
+    src = src_bounds[::-1] if src_flip else src_bounds
+    dst = dst_bounds[::-1] if dst_flip else dst_bounds
+    points = np.union1d(src, dst)
+    mids = .5 * (points[1:] + points[:-1])
+    isrc = np.searchsorted(src, mids) - 1
+    idst = np.searchsorted(dst, mids) - 1
+    tpoints = transform(points) if transform is not None else points
+    length = np.diff(tpoints)
+    inside = ((isrc >= 0) & (isrc < nsrc) & (idst >= 0) & (idst < ndst) &
+              (length > 0))
+    isrc, idst, length = isrc[inside], idst[inside], length[inside]
+    if src_flip:
+        isrc = nsrc - 1 - isrc
+    if dst_flip:
+        idst = ndst - 1 - idst
+    return sp.csr_matrix((length, (idst, isrc)), shape=(ndst, nsrc))
+
+
+def _latitude_overlap(src, dst):
+    return _overlap_matrix(cell_bounds(src, -90., 90.),
+                           cell_bounds(dst, -90., 90.),
+                           lambda x: np.sin(np.deg2rad(x)))
+
+
+def _longitude_overlap(src, dst):
+    src_bounds = cell_bounds(src)
+    dst_bounds = cell_bounds(dst)
+    overlap = _overlap_matrix(src_bounds, dst_bounds, np.deg2rad)
+    # on global grids, target cells may lie one revolution off the source
+    # grid (e.g. -180..180 vs. 0..360)
+    if abs(src_bounds[-1] - src_bounds[0]) >= 360. - 1e-6:
+        for shift in (-360., 360.):
+            overlap = overlap + _overlap_matrix(src_bounds + shift,
+                                                dst_bounds, np.deg2rad)
+    return overlap
+
+
+# Caching of the weight matrices
+# ============================================================================
+
+_weights_cache = {}
+_weights_cache_size = 16
+
+"""Increase when the weights change, to invalidate cached files"""
+_weights_version = 1
+
+
+def get_cache_dir():
+    """The directory for cached regridding weights
+
+    This is the ``cache_dir`` entry of the ``[geodas]`` section in
+    ``~/.geodasrc``, or ``~/.cache/geodas``.
+
+    """
+    import geodas
+    try:
+        return os.path.expanduser(geodas.__config__['cache_dir'])
+    except (AttributeError, KeyError):
+        return os.path.join(os.path.expanduser('~'), '.cache', 'geodas')
+
+
+def _grid_key(*coords):
+    """A hash identifying the cell boundaries of ``coords``"""
+    md5 = hashlib.md5(str(_weights_version).encode())
+    for c in coords:
+        md5.update(np.ascontiguousarray(cell_bounds(c),
+                                        dtype='<f8').tostring())
+    return md5.hexdigest()
+
+
+def _load_weights(key, compute, cache):
+    """Get the weights with ``key`` from memory, from disk, or compute them
+    with ``compute()``"""
+    import scipy.sparse as sp
+    weights = _weights_cache.get(key)
+    if weights is not None:
+        return weights
+    filename = os.path.join(get_cache_dir(), 'regrid-%s.npz' % key)
+    if cache and os.path.exists(filename):
+        weights = sp.load_npz(filename).tocsr()
+    else:
+        weights = compute()
+        if cache:
+            try:
+                if not os.path.isdir(get_cache_dir()):
+                    os.makedirs(get_cache_dir())
+                # write to a temporary file first, so that concurrent
+                # readers never see incomplete files
+                tmpname = '%s.%d.npz' % (filename[:-4], os.getpid())
+                sp.save_npz(tmpname, weights)
+                os.rename(tmpname, filename)
+            except (IOError, OSError):
+                pass
+    if len(_weights_cache) >= _weights_cache_size:
+        _weights_cache.clear()
+    _weights_cache[key] = weights
+    return weights
+
+
+# Conservative regridding
+# ============================================================================
+
+class ConservativeRegridder(object):
+    """Area-conservative regridding between rectilinear lat/lon grids
+
+    The value of a target cell is the area-weighted mean of the source cells
+    overlapping it. The overlap areas form a sparse matrix, which is the
+    Kronecker product of the one-dimensional overlaps in latitude (in
+    units of the sine of latitude) and longitude. It is computed once per
+    pair of grids and cached in memory and, if ``cache`` is ``True``, on
+    disk (see ``get_cache_dir``).
+
+    Missing (NaN) source values are left out, and the weights of each
+    target cell are renormalized to the valid source cells. Target cells
+    without any valid overlapping source cell are NaN.
+
+    Parameters
+    ----------
+    src_lat, src_lon : CoordinateArray
+        the source grid
+
+    dst_lat, dst_lon : CoordinateArray
+        the target grid
+
+    cache : bool
+
+    """
+
+    def __init__(self, src_lat, src_lon, dst_lat, dst_lon, cache=True):
+        self.src_lat = as_coordinate(src_lat, 'latitude')
+        self.src_lon = as_coordinate(src_lon, 'longitude')
+        self.dst_lat = as_coordinate(dst_lat, 'latitude', 'degrees_north')
+        self.dst_lon = as_coordinate(dst_lon, 'longitude', 'degrees_east')
+        key = _grid_key(self.src_lat, self.src_lon, self.dst_lat,
+                        self.dst_lon)
+        self.weights = _load_weights(key, self._compute_weights, cache)
+
+    def _compute_weights(self):
+        import scipy.sparse as sp
+        lat = _latitude_overlap(self.src_lat, self.dst_lat)
+        lon = _longitude_overlap(self.src_lon, self.dst_lon)
+        return sp.kron(lat, lon, format='csr')
+
+    def __call__(self, gdata):
+        """Regrid the ``gridded_array`` ``gdata``"""
+        from geodas.core.gridded_array import gridded_array
+        coordinates = gdata.coordinates
+        ilat = coordinates.axis('latitude')
+        ilon = coordinates.axis('longitude')
+        if not (self.src_lat.equals(coordinates['latitude']) and
+                self.src_lon.equals(coordinates['longitude'])):
+            raise ValueError("You asked me to regrid data which isn't on the "
+                             "source grid of this regridder")
+        others = [i for i in range(len(coordinates)) if i not in (ilat, ilon)]
+        data = gdata.filled().transpose(others + [ilat, ilon])
+        leading = data.shape[:-2]
+        # one column per time step, level, ...
+        data = data.reshape((-1, self.src_lat.size * self.src_lon.size)).T
+        valid = ~np.isnan(data)
+        if valid.all():
+            norm = self.weights.sum(axis=1).A
+            values = self.weights.dot(data)
+        else:
+            norm = self.weights.dot(valid.astype(float))
+            values = self.weights.dot(np.where(valid, data, 0.))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            values = values / norm
+        values[np.broadcast_to(norm, values.shape) <= 0] = np.nan
+        values = values.T.reshape(leading + (self.dst_lat.size,
+                                             self.dst_lon.size))
+        # move latitude and longitude back to their original positions
+        order = others + [ilat, ilon]
+        values = values.transpose(np.argsort(order))
+        newcoords = CoordinateSet([(k, self.dst_lat if k == 'latitude' else
+                                    self.dst_lon if k == 'longitude' else v)
+                                   for k, v in coordinates.items()])
+        return gridded_array(values, newcoords, gdata.title)
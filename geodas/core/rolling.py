@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+#
+# geodas - Geospatial Data Analysis in Python
+#
+# :Author:    Andreas Hilboll <andreas@hilboll.de>
+# :Date:      Wed Jan 23 11:45:02 2013
+# :Website:   http://andreas-h.github.com/geodas/
+# :License:   GPLv3
+# :Version:   0.1
+# :Copyright: (c) 2012-2013 Andreas Hilboll <andreas@hilboll.de>
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Library imports
+# ============================================================================
+
+import bottleneck as bn
+import numpy as np
+
+from geodas.core.coordinate import as_coordinate
+from geodas.core.gridded_array import gridded_array
+
+
+# Moving window kernels
+# ============================================================================
+
+"""The bottleneck functions calculating the moving window statistics in
+O(n) time, independent of the window length"""
+_kernels = {
+            'sum' : bn.move_sum,
+            'mean' : bn.move_mean,
+            'std' : bn.move_std,
+            'var' : bn.move_var,
+            'min' : bn.move_min,
+            'max' : bn.move_max,
+            'median' : bn.move_median,
+           }
+
+
+def _index(ndim, axis, sl):
+    index = [slice(None)] * ndim
+    index[axis] = sl
+    return tuple(index)
+
+
+def _move(how, data, window, min_count, axis, **kwargs):
+    """Trailing moving window statistic; windows longer than the axis
+    are allowed"""
+    n = data.shape[axis]
+    if window <= n:
+        return _kernels[how](data, window, min_count, axis=axis, **kwargs)
+    # the NaN padding doesn't change the partial windows at the start
+    shape = list(data.shape)
+    shape[axis] = window
+    padded = np.full(shape, np.nan, dtype=np.result_type(data.dtype, float))
+    padded[_index(data.ndim, axis, slice(window - n, None))] = data
+    res = _kernels[how](padded, window, min_count, axis=axis, **kwargs)
+    return res[_index(data.ndim, axis, slice(window - n, None))]
+
+
+def _check_window(how, window, min_count):
+    if how not in _kernels:
+        raise ValueError("You asked me to calculate the moving %s, but I "
+                         "don't know how to do that" % how)
+    if int(window) != window or window < 1:
+        raise ValueError("The window length has to be a positive integer, "
+                         "not %r" % window)
+    if min_count is not None and not 1 <= min_count <= window:
+        raise ValueError("The minimum number of valid values has to be "
+                         "between 1 and the window length %d, not %r" %
+                         (window, min_count))
+
+
+def move(data, how, window, axis=-1, center=False, min_count=None,
+         **kwargs):
+    """Moving window statistic ``how`` of ``data`` along ``axis``
+
+    Trailing windows end at each position; centred windows are shifted by
+    ``(window - 1) // 2`` positions, so that even windows reach one value
+    further back than forward (as in pandas). Near the start and end of
+    the axis, the windows hold fewer values. The result is NaN where a
+    window holds less than ``min_count`` valid values, which defaults to
+    ``window``. ``kwargs`` are passed to the bottleneck function, e.g.
+    ``ddof`` for ``'std'`` and ``'var'``.
+
+    """
+    _check_window(how, window, min_count)
+    window = int(window)
+    axis = axis % data.ndim
+    res = _move(how, data, window, min_count, axis, **kwargs)
+    shift = (window - 1) // 2 if center else 0
+    if not shift:
+        return res
+    n = data.shape[axis]
+    split = max(n - shift, 0)
+    out = np.empty_like(res)
+    out[_index(data.ndim, axis, slice(0, split))] = \
+                            res[_index(data.ndim, axis, slice(shift, None))]
+    # the windows reaching beyond the end of the axis are calculated from
+    # the last values, padded with NaN
+    tail = data[_index(data.ndim, axis, slice(max(n - window + 1, 0),
+                                              None))]
+    shape = list(tail.shape)
+    shape[axis] += shift
+    padded = np.full(shape, np.nan,
+                     dtype=np.result_type(data.dtype, float))
+    padded[_index(data.ndim, axis, slice(0, tail.shape[axis]))] = tail
+    res = _move(how, padded, window, min_count, axis, **kwargs)
+    out[_index(data.ndim, axis, slice(split, None))] = \
+                    res[_index(data.ndim, axis, slice(shape[axis] - n + split,
+                                                      None))]
+    return out
+
+
+# Moving window statistics of ``gridded_array`` objects
+# ============================================================================
+
+class Rolling(object):
+    """Moving window statistics along one dimension of a ``gridded_array``
+
+    Returned by ``gridded_array.rolling``, e.g.::
+
+        gdata.rolling(time=31, center=True).mean()
+
+    The statistics ignore NaNs and have the coordinates of ``gdata``; see
+    ``move`` for the definition of the windows.
+
+    Parameters
+    ----------
+    gdata : gridded_array
+
+    dim : str
+        the name of the dimension to move the window along
+
+    window : int
+        the number of elements in the window
+
+    center : bool
+        use centred instead of trailing windows
+
+    min_count : int
+        the minimum number of valid values in a window; defaults to
+        ``window``
+
+    """
+
+    def __init__(self, gdata, dim, window, center=False, min_count=None):
+        if dim not in gdata.coordinates:
+            raise ValueError("You asked me to move a window along %s, but I "
+                             "don't know anything about this coordinate "
+                             "dimension" % dim)
+        _check_window('mean', window, min_count)
+        self.gdata = gdata
+        self.dim = dim
+        self.window = window
+        self.center = center
+        self.min_count = min_count
+
+    def _apply(self, how, **kwargs):
+        gdata = self.gdata
+        data = move(gdata.filled(), how, self.window,
+                    gdata.coordinates.axis(self.dim), self.center,
+                    self.min_count, **kwargs)
+        return gridded_array(data, gdata.coordinates, gdata.title,
+                             grid=gdata.grid)
+
+    def sum(self):
+        return self._apply('sum')
+
+    def mean(self):
+        return self._apply('mean')
+
+    def std(self, ddof=0):
+        return self._apply('std', ddof=ddof)
+
+    def var(self, ddof=0):
+        return self._apply('var', ddof=ddof)
+
+    def min(self):
+        return self._apply('min')
+
+    def max(self):
+        return self._apply('max')
+
+    def median(self):
+        return self._apply('median')
+
+
+# Moving window statistics of data coming in blocks
+# ============================================================================
+
+class RollingStream(object):
+    """Moving window statistics of data fed block by block
+
+    Consecutive blocks along the dimension ``dim`` (e.g. one file per
+    month) are passed to ``add``, which returns the statistic for all
+    positions whose windows are complete; the last ``window - 1`` values
+    are carried over to the next block. After the last block, ``flush``
+    returns the remaining positions of centred windows. The concatenated
+    results equal ``Rolling`` on the concatenated blocks.
+
+    Parameters
+    ----------
+    dim : str
+
+    window : int
+
+    how : str
+        ``'mean'``, ``'sum'``, ``'std'``, ``'var'``, ``'min'``, ``'max'``
+        or ``'median'``
+
+    center : bool
+
+    min_count : int
+
+    kwargs :
+        passed to the bottleneck function, e.g. ``ddof``
+
+    """
+
+    def __init__(self, dim, window, how='mean', center=False,
+                 min_count=None, **kwargs):
+        _check_window(how, window, min_count)
+        self.dim = dim
+        self.window = int(window)
+        self.how = how
+        self.min_count = min_count
+        self.kwargs = kwargs
+        self.coordinates = None
+        self.title = ""
+        self._axis = None
+        self._carry = None
+        # the trailing windows which don't belong to any centred window
+        self._skip = (self.window - 1) // 2 if center else 0
+        self._shift = self._skip
+        self._values = None
+
+    def _check_coordinates(self, gdata):
+        if self.dim not in gdata.coordinates:
+            raise ValueError("You asked me to move a window along %s, but I "
+                             "don't know anything about this coordinate "
+                             "dimension" % self.dim)
+        axis = gdata.coordinates.axis(self.dim)
+        if self.coordinates is None:
+            self.coordinates = gdata.coordinates
+            self.title = gdata.title
+            self._axis = axis
+        elif (axis != self._axis or not self.coordinates.drop(axis).equals(
+                                         gdata.coordinates.drop(axis))):
+            raise ValueError("The coordinates of the data you passed don't "
+                             "match the coordinates of the data I "
+                             "got so far.")
+
+    def _push(self, data, values):
+        """Add ``data`` (with the window dimension first) and return the
+        results which are complete"""
+        if self._carry is not None:
+            ncarry = self._carry.shape[0]
+            data = np.concatenate([self._carry, data])
+        else:
+            ncarry = 0
+        res = _move(self.how, data, self.window, self.min_count, 0,
+                    **self.kwargs)[ncarry:]
+        self._carry = data[max(data.shape[0] - self.window + 1, 0):]
+        if self._values is None:
+            self._values = values
+        else:
+            self._values = np.concatenate([self._values, values])
+        skip = min(self._skip, res.shape[0])
+        res = res[skip:]
+        self._skip -= skip
+        if not res.shape[0]:
+            return None
+        values = self._values[:res.shape[0]]
+        self._values = self._values[res.shape[0]:]
+        coord = self.coordinates[self.dim]
+        coordinates = self.coordinates.replace(self.dim, as_coordinate(
+                                   values, self.dim,
+                                   getattr(coord, 'units', None)))
+        return gridded_array(np.moveaxis(res, 0, self._axis), coordinates,
+                             self.title)
+
+    def add(self, gdata):
+        """Add the next block ``gdata``, and return the moving window
+        statistic of all positions which can be calculated now, as
+        ``gridded_array`` (``None`` if there are none yet)"""
+        self._check_coordinates(gdata)
+        data = np.moveaxis(gdata.filled(), self._axis, 0)
+        return self._push(data, np.asarray(gdata.coordinates[self.dim]))
+
+    def flush(self):
+        """Return the moving window statistic of the positions at the end,
+        whose centred windows reach beyond the last block (``None`` for
+        trailing windows)"""
+        if self._carry is None or not self._shift or self._values is None \
+                                                  or not self._values.size:
+            return None
+        shape = (self._shift, ) + self._carry.shape[1:]
+        padding = np.full(shape, np.nan,
+                          dtype=np.result_type(self._carry.dtype, float))
+        return self._push(padding, self._values[:0])
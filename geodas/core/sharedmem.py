@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+#
+# geodas - Geospatial Data Analysis in Python
+#
+# :Author:    Andreas Hilboll <andreas@hilboll.de>
+# :Date:      Wed Jan 23 11:45:02 2013
+# :Website:   http://andreas-h.github.com/geodas/
+# :License:   GPLv3
+# :Version:   0.1
+# :Copyright: (c) 2012-2013 Andreas Hilboll <andreas@hilboll.de>
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Library imports
+# ============================================================================
+
+import atexit
+import mmap
+import os
+import tempfile
+
+import numpy as np
+
+
+# Shared memory buffers
+# ============================================================================
+
+"""The buffers created by this process (by name), which are removed at
+exit unless they have been closed before"""
+_owned = {}
+
+
+def _tempdir():
+    """Directory for the memory-mapped files; /dev/shm is backed by RAM"""
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+
+class SharedBuffer(object):
+    """A block of memory which can be mapped by several processes
+
+    The memory is a memory-mapped file, in the RAM-backed ``/dev/shm`` if
+    available. Pickling a ``SharedBuffer`` only transfers its name, so
+    that the receiving process maps the same memory without copying it.
+
+    Use ``SharedBuffer.create()`` to allocate a new buffer. The buffer is
+    not removed when it is garbage collected, as pickled handles may still
+    be waiting to be attached by other processes (e.g. queued tasks of a
+    ``multiprocessing.Pool``). The process which created it removes it with
+    ``close()`` (or by using the buffer as context manager), or at exit.
+
+    """
+
+    def __init__(self, kind, name, size, owner=False):
+        self.kind = kind
+        self.name = name
+        self.size = size
+        if kind != 'mmap':
+            raise ValueError("I don't know the shared memory kind %s" % kind)
+        with open(name, 'r+b') as f:
+            self.buffer = mmap.mmap(f.fileno(), size)
+        if owner:
+            # forked children inherit this, but must not remove the buffer
+            _owned[name] = os.getpid()
+
+    @classmethod
+    def create(cls, size):
+        """Allocate a new buffer of ``size`` bytes"""
+        size = max(int(size), 1)
+        fd, name = tempfile.mkstemp(prefix='geodas-', dir=_tempdir())
+        try:
+            os.ftruncate(fd, size)
+        finally:
+            os.close(fd)
+        return cls('mmap', name, size, owner=True)
+
+    def __reduce__(self):
+        return (SharedBuffer, (self.kind, self.name, self.size))
+
+    def ndarray(self, shape, dtype, offset=0, strides=None):
+        """Return an array using this buffer as memory"""
+        return np.ndarray(shape, dtype, buffer=self.buffer, offset=offset,
+                          strides=strides)
+
+    def handle(self, arr):
+        """Return a picklable description of the array ``arr``, which must
+        use this buffer as memory, or ``None`` if it doesn't"""
+        if not isinstance(arr, np.ndarray) or type(arr) is not np.ndarray:
+            return None
+        base = self.ndarray((self.size, ), np.uint8)
+        start = base.__array_interface__['data'][0]
+        offset = arr.__array_interface__['data'][0] - start
+        if not 0 <= offset < self.size or not np.may_share_memory(arr, base):
+            return None
+        return (self, arr.shape, arr.dtype.str, offset, arr.strides)
+
+    def close(self):
+        """Remove the buffer, if it was created by this process
+
+        Processes which already mapped the buffer can still use it, but it
+        cannot be attached any more.
+
+        """
+        _unlink(self.name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def from_handle(handle):
+    """Return the array described by ``handle`` (see
+    ``SharedBuffer.handle``)"""
+    buf, shape, dtype, offset, strides = handle
+    return buf.ndarray(shape, np.dtype(dtype), offset, strides)
+
+
+def _unlink(name):
+    """Remove the buffer file ``name`` if it was created by this process"""
+    if _owned.get(name) != os.getpid():
+        return
+    del _owned[name]
+    try:
+        os.unlink(name)
+    except OSError:
+        pass
+
+
+@atexit.register
+def _cleanup():
+    for name in list(_owned):
+        _unlink(name)
@@ -25,22 +25,24 @@
 # Library imports
 # ============================================================================
 
-import copy
 from collections import OrderedDict
 
 import numpy as np
-import numpy.ma as ma
-import pandas as pd
 
+from geodas.core.coordinate import CoordinateArray, CoordinateSet, \
+                                   DatetimeCoordinate, as_coordinate
 from geodas.core.coordinate import _array_get_common_range_index as \
                                    _get_common_range_index
+from geodas.core.curvilinear import as_slice_request
+from geodas.core.groupby import group_labels, group_reduce
+from geodas.core.missing import ValidityMask
 from geodas import gridded_array
 
 
 # Prepare slice indices according to actual and requested coordinates
 # ============================================================================
 
-def get_coordinate_slices(coordinates, slice_request={}):
+def get_coordinate_slices(coordinates, slice_request={}, grid=None):
     """Calculate slice objects for coordinate ranges in given dimension
     variables
 
@@ -52,7 +54,7 @@ def get_coordinate_slices(coordinates, slice_request={}):
 
     Parameters
     ----------
-    coordinates : OrderedDict
+    coordinates : CoordinateSet
         The coordinate variables of the underlying dataset
 
     slice_request : dict
@@ -61,6 +63,12 @@ def get_coordinate_slices(coordinates, slice_request={}):
         ``(min, max)``. ``min`` and ``max`` must be in the same units as the
         according coordinate from ``coordinates``.
 
+    grid : CurvilinearGrid
+        for data on a curvilinear grid, ``latitude`` and ``longitude``
+        ranges in ``slice_request`` are translated to index ranges along
+        the two grid dimensions, covering all grid points within the
+        requested box (see ``geodas.core.curvilinear``)
+
     Returns
     -------
     slices : tuple
@@ -70,14 +78,23 @@ def get_coordinate_slices(coordinates, slice_request={}):
     # TODO: write tests for slicing!
     # TODO: re-write get_coordinate_slices using class methods of
     #       CoordinateArray to properly handle datetime issues
+    if not isinstance(coordinates, CoordinateSet):
+        coordinates = CoordinateSet(coordinates)
+    if grid is not None and 'latitude' not in coordinates:
+        slice_request = as_slice_request(coordinates, grid, slice_request)
     # start with maximum slices (whole coordinate array) for each dimension
-    coord_idx = [(0, coordinates[c].size) for c in list(coordinates.keys())]
+    coord_idx = [(0, size) for size in coordinates.shape]
     # overwrite for slice_request
     try:
         for c in slice_request:
-            # TODO: make the list of time labels generic
-            if c in ["time", "date", "datetime", ]:
-                slice_request[c] = np.datetime64(slice_request[c])
+            axis = coordinates.axis(c)
+            if np.issubdtype(np.asarray(coordinates[c][:1]).dtype,
+                             np.datetime64):
+                if isinstance(slice_request[c], (tuple, list)):
+                    slice_request[c] = tuple(np.datetime64(t)
+                                             for t in slice_request[c])
+                else:
+                    slice_request[c] = np.datetime64(slice_request[c])
             if not hasattr(slice_request[c], "__iter__"):
                 # TODO: Handling the case of single requested values, i.e.
                 # when slice_request[c] is a single value, is tricky and a **very**
@@ -85,7 +102,7 @@ def get_coordinate_slices(coordinates, slice_request={}):
                 _add = np.timedelta64(1) if isinstance(slice_request[c],
                                                    np.datetime64) else .000001
                 slice_request[c] = (slice_request[c], slice_request[c] + _add)
-            coord_idx[list(coordinates.keys()).index(c)] = slice_request[c]
+            coord_idx[axis] = slice_request[c]
     except ValueError:
         raise ValueError("one of the slice_request you provided for "
                          "selecting a coordinate range is not contained in "
@@ -93,111 +110,306 @@ def get_coordinate_slices(coordinates, slice_request={}):
     coord_slices = [slice(l, u) for l, u in coord_idx]
     slices = []
     for dim, sl in zip(coordinates, coord_slices):
-        if dim in list(slice_request.keys()):
-            slices.append(slice(*_get_common_range_index((coordinates[dim],
-                                                          (sl.start,
-                                                           sl.stop)))[0]))
+        if dim in slice_request:
+            if isinstance(coordinates[dim], CoordinateArray):
+                # regular coordinates answer this without searching
+                slices.append(slice(*coordinates[dim].index_range(sl.start,
+                                                                  sl.stop)))
+            else:
+                slices.append(slice(*_get_common_range_index(
+                                    (coordinates[dim], (sl.start,
+                                                        sl.stop)))[0]))
         else:
             slices.append(sl)
     slices = tuple(slices)
     return slices
 
 
-"""We want to be able to automatically select the appropriate lambda function
-with a string"""
-_timeselect_funcs = {
-                     "JAN" : lambda x: x.month == 1,
-                     "FEB" : lambda x: x.month == 2,
-                     "MAR" : lambda x: x.month == 3,
-                     "APR" : lambda x: x.month == 4,
-                     "MAY" : lambda x: x.month == 5,
-                     "JUN" : lambda x: x.month == 6,
-                     "JUL" : lambda x: x.month == 7,
-                     "AUG" : lambda x: x.month == 8,
-                     "SEP" : lambda x: x.month == 9,
-                     "OCT" : lambda x: x.month == 10,
-                     "NOV" : lambda x: x.month == 11,
-                     "DEC" : lambda x: x.month == 12,
-                     "MAM" : lambda x: x.month in [3, 4, 5],
-                     "JJA" : lambda x: x.month in [6, 7, 8],
-                     "SON" : lambda x: x.month in [9, 10, 11],
-                     "DJF" : lambda x: x.month in [12, 1, 2],
-                    }
-
-
-def _get_timeselect_func(date, rule):
-    if rule == 'monthly':
-        return lambda x: x.month == date.month and x.year == date.year
-    elif rule in ['annual', 'yearly']:
-        return lambda x: x.year == date.year
+# Vectorized selection of coordinate values
+# ============================================================================
+
+"""The months covered by the named selection rules"""
+_timeselect_months = {
+                      "JAN" : [1], "FEB" : [2], "MAR" : [3], "APR" : [4],
+                      "MAY" : [5], "JUN" : [6], "JUL" : [7], "AUG" : [8],
+                      "SEP" : [9], "OCT" : [10], "NOV" : [11], "DEC" : [12],
+                      "MAM" : [3, 4, 5],
+                      "JJA" : [6, 7, 8],
+                      "SON" : [9, 10, 11],
+                      "DJF" : [12, 1, 2],
+                     }
+
+"""The codes of the meteorological seasons, as in
+``DatetimeCoordinate.season``"""
+_season_codes = {"DJF" : 0, "MAM" : 1, "JJA" : 2, "SON" : 3, }
+
+"""Calendar fields which can be used as selection keywords; they apply to
+the datetime coordinate of the data"""
+_calendar_fields = ['year', 'month', 'day', 'hour', 'dayofyear', 'season',
+                    'season_year', ]
+
+
+def _datetime_axis(coordinates):
+    """Return the name of the (first) datetime coordinate in
+    ``coordinates``"""
+    for dim, coord in coordinates.items():
+        if np.issubdtype(np.asarray(coord[:1]).dtype, np.datetime64):
+            return dim
+    raise ValueError("You asked me to select by a calendar field, but "
+                     "there is no datetime coordinate in the dataset")
+
+
+def _rule_mask(values, rule):
+    """Compile the selection ``rule`` into a boolean mask over ``values``
+
+    ``rule`` can be a ``(min, max)`` tuple or a ``slice`` (both with
+    inclusive bounds), a list or array of accepted values, a boolean array
+    of the same length as ``values``, or a single accepted value.
+
+    """
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        _conv = lambda v: v if v is None else np.datetime64(v)
     else:
-        raise ValueError()
+        _conv = lambda v: v
+    if isinstance(rule, slice):
+        rule = (rule.start, rule.stop)
+    if isinstance(rule, tuple):
+        if len(rule) != 2:
+            raise ValueError("Range selections have to be given as "
+                             "(min, max) tuples")
+        lower, upper = [_conv(r) for r in rule]
+        mask = np.ones(values.shape, dtype=bool)
+        if lower is not None:
+            mask &= values >= lower
+        if upper is not None:
+            mask &= values <= upper
+        return mask
+    if isinstance(rule, (list, np.ndarray)):
+        rule = np.asarray(rule)
+        if rule.dtype == bool:
+            if rule.shape != values.shape:
+                raise ValueError("Boolean selections need to have the same "
+                                 "length as the coordinate")
+            return rule
+        if np.issubdtype(values.dtype, np.datetime64):
+            rule = rule.astype(values.dtype)
+        return np.in1d(values, rule)
+    return values == _conv(rule)
+
+
+def _compile_rule(coordinates, key, rule):
+    """Return the tuple ``(dim, mask)`` for a single selection keyword"""
+    if key in _calendar_fields and key not in coordinates:
+        dim = _datetime_axis(coordinates)
+        times = as_coordinate(coordinates[dim], dim)
+        if key == 'season':
+            if isinstance(rule, str):
+                rule = [rule]
+            if isinstance(rule, list):
+                rule = [_season_codes.get(r, r) for r in rule]
+        return dim, _rule_mask(getattr(times, key), rule)
+    if key not in coordinates:
+        raise ValueError("You asked me to select along '%s', but I don't "
+                         "know anything about this coordinate "
+                         "dimension" % key)
+    coord = coordinates[key]
+    if isinstance(rule, str) and rule.upper() in _timeselect_months:
+        times = as_coordinate(coord, key)
+        if not hasattr(times, 'month'):
+            raise ValueError("You asked me to select '%s' along the "
+                             "coordinate '%s', which doesn't hold points in "
+                             "time." % (rule, key))
+        return key, np.in1d(times.month, _timeselect_months[rule.upper()])
+    if hasattr(rule, '__call__'):
+        # first try to evaluate the function on the whole coordinate at
+        # once, e.g. ``lambda t: t.month == 1`` on a DatetimeCoordinate
+        coord = as_coordinate(coord, key)
+        try:
+            mask = np.asarray(rule(coord))
+        except Exception:
+            mask = None
+        if mask is None or mask.dtype != bool or mask.shape != coord.shape:
+            values = coord.values
+            if np.issubdtype(values.dtype, np.datetime64):
+                values = values.astype('M8[us]')
+            mask = np.array([bool(rule(v)) for v in values.astype(object)],
+                            dtype=bool)
+        return key, mask
+    return key, _rule_mask(coord, rule)
+
+
+def get_coordinate_masks(coordinates, **kwargs):
+    """Calculate boolean masks selecting coordinate values
+
+    Parameters
+    ----------
+    coordinates : CoordinateSet
+        The coordinate variables of the underlying dataset
+
+    kwargs :
+        The selection rules. The keys are either names of coordinates, or
+        calendar fields (``year``, ``month``, ``day``, ``hour``,
+        ``dayofyear``, ``season``, ``season_year``) which refer to the
+        dataset's datetime coordinate. The values can be
+
+        - a ``(min, max)`` tuple or a ``slice(min, max)``, selecting the
+          closed range ``[min, max]``; one of the bounds may be ``None``
+        - a list or array of accepted values, or a boolean array
+        - a single accepted value
+        - for datetime coordinates, a month or season name like ``"JAN"``
+          or ``"JJA"``; for ``season``, a season name or list of names
+        - a function, which is called with the whole coordinate (and
+          element-wise if that doesn't result in a boolean array)
+
+    Returns
+    -------
+    masks : OrderedDict
+        A dictionary ``{dim : mask}`` of boolean arrays, in axis order, for
+        all dimensions which are restricted by ``kwargs``. Several rules
+        for the same dimension are combined by logical *and*.
+
+    """
+    if not isinstance(coordinates, CoordinateSet):
+        coordinates = CoordinateSet(coordinates)
+    masks = {}
+    for key, rule in kwargs.items():
+        dim, mask = _compile_rule(coordinates, key, rule)
+        masks[dim] = mask if dim not in masks else masks[dim] & mask
+    return OrderedDict([(dim, masks[dim]) for dim in coordinates
+                        if dim in masks])
+
+
+def _take(data, idx, axis, out=None):
+    """Take ``idx`` along ``axis``; contiguous ranges become views"""
+    if idx.size and idx[-1] - idx[0] + 1 == idx.size:
+        sl = [slice(None)] * data.ndim
+        sl[axis] = slice(idx[0], idx[-1] + 1)
+        return data[tuple(sl)]
+    if out is not None:
+        return np.take(data, idx, axis=axis, out=out)
+    return np.take(data, idx, axis=axis)
 
 
 def select(gdata, **kwargs):
-    """pass selection lambda function as kwargs, e.g.:
+    """Select a subset of ``gdata`` by rules on its coordinate values
+
+    The rules are passed as keyword arguments and compiled into boolean
+    masks by ``get_coordinate_masks``; see there for the supported rules.
+    Examples::
+
+        select(gdata, time="JJA")
+        select(gdata, month=[6, 7, 8], year=slice(2000, 2010))
+        select(gdata, latitude=(-30., 30.), time=lambda t: t.hour == 12)
+
+    Rules on several dimensions are combined, and each dimension is
+    gathered only once.
 
-       time=lambda x: x.month == 1
     """
-    # TODO: this is very preliminary, and verrrry ugggly
-    for kw in list(kwargs.keys()):
-        if kw in list(gdata.coordinates.keys()):
-            f = kwargs[kw]
-            if isinstance(f, str):
-                f = _timeselect_funcs[f]
-            if not hasattr(f, '__call__'):
-                raise ValueError("You asked me to select using a descriptor I"
-                                 "don't understand!")
-            if kw in ['time', 'datetime', 'date']:     # TODO
-                idx = ([f(d) for d in gdata.coordinates[kw].astype(object)])
-                # TODO: boolean indexing with 1d index array on 3d data
-                # array doesn't work
-                # uggggly workaround
-                idx = np.where(idx, np.arange(len(idx), dtype=float), np.nan)
-                idx = ma.masked_invalid(idx)
-                idx = idx.compressed()
-                idx = np.int32(idx)
-                # end of ugggggly workaround
-                newcoords = copy.copy(gdata.coordinates)
-                newcoords['time'] = newcoords['time'][idx]
-                newdata = gdata.data[idx]
-                return gridded_array(newdata, newcoords, gdata.title)
-
-
-def resample(gdata, **kwargs):
-    """resample ``gdata`` according to rules. currently, only monthly resampling for ``time`` coordinate is supported.
-
-       time='monthly'
+    coordinates = gdata.coordinates
+    masks = get_coordinate_masks(coordinates, **kwargs)
+    newcoords = coordinates
+    steps = []
+    index = {}
+    for dim, mask in masks.items():
+        idx = np.flatnonzero(mask)
+        newcoords = newcoords.replace(dim, coordinates[dim][idx])
+        steps.append((coordinates.axis(dim), idx))
+        index[dim] = idx
+    # gather the most selective dimension first, so that intermediate
+    # arrays are as small as possible; the last gather goes directly into
+    # the preallocated output array
+    steps.sort(key=lambda s: s[1].size / float(gdata.data.shape[s[0]] or 1))
+    data = gdata.data
+    for i, (axis, idx) in enumerate(steps):
+        out = None
+        if i == len(steps) - 1 and type(data) is np.ndarray:
+            shape = list(data.shape)
+            shape[axis] = idx.size
+            out = np.empty(shape, dtype=data.dtype)
+        data = _take(data, idx, axis, out)
+    valid = None
+    if gdata.valid is not None:
+        valid = gdata.valid.to_bool()
+        for axis, idx in steps:
+            valid = _take(valid, idx, axis)
+        valid = ValidityMask.from_bool(valid)
+    grid = gdata.grid.take(index) if gdata.grid is not None else None
+    return gdata._share(data, newcoords, valid, grid)
+
+
+def resample(gdata, how='mean', stack=False, **kwargs):
+    """Resample ``gdata`` to a coarser time resolution
+
+    The rule is given as keyword argument, with the name of the datetime
+    coordinate as key, e.g.::
+
+        resample(gdata, time='monthly')
+        resample(gdata, how=['mean', 'min', 'max', 'std', 'count'],
+                 time='monthly')
+
+    Supported rules are ``hourly``, ``daily``, ``pentad``, ``monthly``,
+    ``seasonal``, ``annual``/``yearly``, and any pandas period frequency
+    string; see ``geodas.core.groupby.group_labels``. The time coordinate
+    of the result contains the start of each period, from the first to the
+    last period covered by ``gdata``. The data is the NaN-ignoring
+    statistic ``how`` of all time steps within the period, NaN for periods
+    without data.
+
+    Parameters
+    ----------
+    gdata : gridded_array
+
+    how : str or list of str
+        the statistic(s) to calculate, see
+        ``geodas.core.groupby.group_reduce``. Several statistics are
+        calculated in one pass over the data.
+
+    stack : bool
+        if ``how`` is a list, return one ``gridded_array`` with an
+        additional leading ``statistic`` axis instead of a list of
+        ``gridded_array`` objects
+
+    Returns
+    -------
+    out : gridded_array or list of gridded_array
+
     """
-    # TODO: this is very preliminary, and verrrry ugggly
-    # TODO: this only works if the coordinates are ordered time-long-lat
+    if len(kwargs) > 1 and not isinstance(how, str):
+        raise ValueError("I can only calculate several statistics when "
+                         "resampling along one coordinate at a time.")
+    results = [gdata]
     for kw in list(kwargs.keys()):
-        if kw in list(gdata.coordinates.keys()):
-            if kw != 'time':
-                raise ValueError("You asked me to resample along coordinate "
-                                 "'%s', but I don't know how to do that." %
-                                                                           kw)
-            if kwargs[kw] not in ['annual', 'yearly', 'monthly']:
-                raise ValueError("You asked me to resample alon the time "
-                                 "coordinate according to the rule '%$s', "
-                                 "but I don't know now to do that." %
-                                                                   kwargs[kw])
-            if kwargs[kw] in ['annual', 'yearly']:
-                freq = 'Y'
-            elif kwargs[kw] in ['monthly']:
-                freq = 'M'
-            times = pd.period_range(start=gdata.coordinates['time'].min().astype(object),
-                                    end=gdata.coordinates['time'].max().astype(object),
-                                    freq=freq)
-            data = np.ones(np.r_[times.size, gdata.data.shape[1:]]) * np.nan
-            for i, m in enumerate(times):
-                f = _get_timeselect_func(m, kwargs[kw])
-                tmpdata = select(gdata, time=f)
-                data[i] = tmpdata.mean(axis='time').data
-            newcoords = copy.copy(gdata.coordinates)
-            newcoords['time'] = np.array(times.to_datetime())
-            newdata = gridded_array(data, newcoords, title=gdata.title)
-    return newdata
+        if kw not in gdata.coordinates:
+            raise ValueError("You asked me to resample along coordinate "
+                             "'%s', but I don't know anything about this "
+                             "coordinate dimension." % kw)
+        times = as_coordinate(gdata.coordinates[kw], kw)
+        if not isinstance(times, DatetimeCoordinate):
+            raise ValueError("You asked me to resample along coordinate "
+                             "'%s', but I don't know how to do that." % kw)
+        labels, periods = group_labels(times, kwargs[kw])
+        axis = gdata.coordinates.axis(kw)
+        data = group_reduce(gdata.filled(), labels, periods.size, axis, how)
+        newcoords = gdata.coordinates.replace(
+                                 kw, DatetimeCoordinate(periods, kw))
+        if isinstance(how, str):
+            gdata = gridded_array(data, newcoords, title=gdata.title)
+            results = [gdata]
+        else:
+            results = [gridded_array(d, newcoords, title=gdata.title)
+                       for d in data]
+    if isinstance(how, str):
+        return results[0]
+    if not stack:
+        return results
+    newcoords = CoordinateSet([('statistic', CoordinateArray(
+                                              np.array(how), 'statistic'))] +
+                              list(results[0].coordinates.items()))
+    data = np.empty(newcoords.shape, dtype=float)
+    for i, res in enumerate(results):
+        data[i] = res.data
+    return gridded_array(data, newcoords, title=gdata.title)
 
 
 # Get a subset from a ``gridded_array`` based on coordinate slices
@@ -205,19 +417,19 @@ def resample(gdata, **kwargs):
 
 def get_slice(gdata, **kwargs):
     # TODO: This really should go into the gridded_array class
-    # open the coordinate variables
-    dimorder = {gdata.coordinates.keys().index(k) : k for k in gdata.coordinates.keys()}
-    coordinates = OrderedDict()
-    for d in range(len(dimorder)):
-        coordinates[dimorder[d]] = gdata.coordinates[dimorder[d]]
+    coordinates = gdata.coordinates
     # coordinate slicing
-    slices = get_coordinate_slices(coordinates, kwargs)
+    slices = get_coordinate_slices(coordinates, kwargs, gdata.grid)
     # slice the coordinate arrays themselves
-    for i, c in enumerate(list(coordinates.keys())):
-        coordinates[c] = coordinates[c][slices[i]]
+    coordinates = CoordinateSet([(c, coordinates[c][sl]) for c, sl
+                                 in zip(coordinates.keys(), slices)])
     # read requested slice from disk
     data = gdata.data[slices]
-    return gridded_array(data, coordinates, gdata.title)
+    valid = gdata.valid[slices] if gdata.valid is not None else None
+    grid = None
+    if gdata.grid is not None:
+        grid = gdata.grid.take(dict(zip(coordinates.keys(), slices)))
+    return gdata._share(data, coordinates, valid, grid)
 
 
 # Grouping by time
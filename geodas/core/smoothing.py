@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+#
+# geodas - Geospatial Data Analysis in Python
+#
+# :Author:    Andreas Hilboll <andreas@hilboll.de>
+# :Date:      Wed Jan 23 11:45:02 2013
+# :Website:   http://andreas-h.github.com/geodas/
+# :License:   GPLv3
+# :Version:   0.1
+# :Copyright: (c) 2012-2013 Andreas Hilboll <andreas@hilboll.de>
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Library imports
+# ============================================================================
+
+import numpy as np
+
+from geodas.core.area import cell_bounds
+from geodas.core.gridded_array import gridded_array
+from geodas.core.parallel import parallel_tiles
+
+
+# One-dimensional filter kernels
+# ============================================================================
+
+def boxcar_kernel(width):
+    """Weights of a running mean over ``width`` grid cells (an odd
+    number)"""
+    if int(width) != width or width < 1 or width % 2 != 1:
+        raise ValueError("The width of a boxcar filter has to be an odd "
+                         "number of grid cells, not %r" % width)
+    return np.full(int(width), 1. / width)
+
+
+def gaussian_kernel(sigma, truncate=4.):
+    """Weights of a Gaussian filter with standard deviation ``sigma`` (in
+    grid cells), truncated at ``truncate`` standard deviations"""
+    if not sigma > 0:
+        raise ValueError("The width of a Gaussian filter has to be "
+                         "positive, not %r" % sigma)
+    radius = int(truncate * sigma + .5)
+    x = np.arange(-radius, radius + 1, dtype=float)
+    weights = np.exp(-.5 * (x / sigma) ** 2)
+    return weights / weights.sum()
+
+
+_kernels = {
+            'boxcar' : boxcar_kernel,
+            'gaussian' : gaussian_kernel,
+           }
+
+
+def _is_periodic(coord):
+    """Whether the longitude coordinate ``coord`` spans the whole globe"""
+    if coord.size < 2:
+        return False
+    bounds = cell_bounds(coord)
+    return abs(bounds[-1] - bounds[0]) >= 360. - 1e-6
+
+
+# NaN-aware separable filtering
+# ============================================================================
+
+def _filter(data, kernels, keep_nan=False):
+    """Apply the one-dimensional ``kernels``, a list of ``(axis, weights,
+    mode)``, one after the other to ``data``, ignoring NaNs
+
+    The data (with NaN replaced by 0) and the indicator of valid values are
+    filtered alike; their ratio is the weighted mean of the valid values
+    within the filter window (normalized convolution). Where there are no
+    valid values within the window, the result is NaN.
+
+    """
+    from scipy.ndimage import correlate1d
+    valid = ~np.isnan(data)
+    num = np.where(valid, data, 0.)
+    den = valid.astype(num.dtype)
+    tmp = np.empty_like(num)
+    for axis, weights, mode in kernels:
+        correlate1d(num, weights, axis, output=tmp, mode=mode, cval=0.)
+        num, tmp = tmp, num
+        correlate1d(den, weights, axis, output=tmp, mode=mode, cval=0.)
+        den, tmp = tmp, den
+    with np.errstate(invalid='ignore', divide='ignore'):
+        np.divide(num, den, out=num)
+    # the weights of the valid values may not add up to exactly 0
+    num[den < 1e-12] = np.nan
+    if keep_nan:
+        num[~valid] = np.nan
+    return num
+
+
+def smooth(gdata, kind='gaussian', keep_nan=False, nthreads=None,
+           **widths):
+    """Smooth ``gdata`` with a separable filter, ignoring NaNs, e.g.::
+
+        smooth(gdata, 'gaussian', latitude=2., longitude=2.)
+        smooth(gdata, 'boxcar', latitude=5, longitude=5)
+
+    The filter is applied along one dimension after the other, as a
+    weighted mean of the valid values within the window. Along longitude
+    on global grids, the window wraps around at the dateline; along all
+    other dimensions, and for regional grids, the window is cut off at the
+    edges of the grid.
+
+    The data is split into tiles with at most
+    ``geodas.core.parallel._max_tile_size`` elements, which are filtered in
+    ``nthreads`` threads (see ``geodas.core.parallel.parallel_tiles``).
+    Tiles are preferably taken along a dimension which isn't filtered; if
+    all are, the tiles overlap by the radius of the filter.
+
+    Parameters
+    ----------
+    gdata : gridded_array
+
+    kind : str
+        ``'gaussian'``, where ``widths`` are the standard deviations, or
+        ``'boxcar'``, where ``widths`` are the (odd) window lengths
+
+    keep_nan : bool
+        if ``True``, missing values stay missing; otherwise, they are
+        filled with the mean of the valid values in their window
+
+    nthreads : int
+
+    widths :
+        the widths of the filter in grid cells, by dimension name
+
+    Returns
+    -------
+    out : gridded_array
+
+    """
+    if kind not in _kernels:
+        raise ValueError("You asked me to smooth with a %s filter, but I "
+                         "only know %s" % (kind, ", ".join(sorted(_kernels))))
+    coordinates = gdata.coordinates
+    kernels = []
+    for dim, width in widths.items():
+        if dim not in coordinates:
+            raise ValueError("You asked me to smooth along %s, but I don't "
+                             "know anything about this coordinate "
+                             "dimension" % dim)
+        periodic = dim == 'longitude' and _is_periodic(coordinates[dim])
+        kernels.append((coordinates.axis(dim), _kernels[kind](width),
+                        'wrap' if periodic else 'constant'))
+    data = gdata.filled()
+    if not np.issubdtype(data.dtype, np.inexact):
+        data = data.astype(float)
+    func = lambda tile: _filter(tile, kernels, keep_nan)
+    # split along the outermost dimension which isn't filtered, or along
+    # the outermost filtered one with overlapping tiles; the tiles cannot
+    # be split along periodic dimensions
+    radius = dict((axis, weights.size // 2)
+                  for axis, weights, mode in kernels if mode != 'wrap')
+    wrapped = [axis for axis, weights, mode in kernels if mode == 'wrap']
+    axes = [i for i in range(data.ndim) if i not in radius and
+            i not in wrapped and data.shape[i] > 1]
+    axes += [i for i in sorted(radius) if data.shape[i] > 1]
+    if axes:
+        res = parallel_tiles(func, data, axes[0], radius.get(axes[0], 0),
+                             nthreads)
+    else:
+        res = func(data)
+    return gridded_array(res, coordinates, gdata.title, grid=gdata.grid)
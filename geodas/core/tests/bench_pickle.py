@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+*****************************************************************************
+geodas - Geospatial Data Analysis in Python
+*****************************************************************************
+
+:Author:    Andreas Hilboll <andreas@hilboll.de>
+:Date:      Mon Jan 21 19:52:07 2013
+:Website:   http://andreas-h.github.com/geodas/
+:License:   GPLv3
+:Version:   0.1
+:Copyright: (c) 2012-2013 Andreas Hilboll <andreas@hilboll.de>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+# Library imports
+# ============================================================================
+
+import pickle
+import time
+
+import numpy as np
+
+from geodas.core.gridded_array import gridded_array
+from geodas.core.pickling import PickleBuffer
+
+
+def _roundtrip(gdata, protocol, out_of_band=False):
+    buffers = []
+    t0 = time.time()
+    if out_of_band:
+        s = pickle.dumps(gdata, protocol, buffer_callback=buffers.append)
+    else:
+        s = pickle.dumps(gdata, protocol)
+    t1 = time.time()
+    if out_of_band:
+        res = pickle.loads(s, buffers=buffers)
+    else:
+        res = pickle.loads(s)
+    t2 = time.time()
+    np.testing.assert_array_equal(res.data, gdata.data)
+    return t1 - t0, t2 - t1, len(s)
+
+
+def bench_pickle(shape=(48, 181, 360)):
+    """Pickling a (time, latitude, longitude) array"""
+    dims = ['time', 'latitude', 'longitude']
+    gdata = gridded_array(np.random.rand(*shape),
+                          [(d, np.arange(n, dtype=float))
+                           for d, n in zip(dims, shape)])
+    print("")
+    print("pickling a %s array (%.0f MB)" % (shape, gdata.data.nbytes / 1e6))
+    cases = [('protocol 2', 2, False)]
+    if PickleBuffer is not None and pickle.HIGHEST_PROTOCOL >= 5:
+        cases += [('protocol 5, in-band', 5, False),
+                  ('protocol 5, out-of-band', 5, True)]
+    else:
+        print("  (protocol 5 is not available in this Python version)")
+    for title, protocol, out_of_band in cases:
+        dump, load, size = _roundtrip(gdata, protocol, out_of_band)
+        print("  %-24s dumps %7.3f s, loads %7.3f s, %9d bytes" % (
+                    title, dump, load, size))
+
+
+if __name__ == "__main__":
+    bench_pickle()
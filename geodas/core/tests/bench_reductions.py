@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+*****************************************************************************
+geodas - Geospatial Data Analysis in Python
+*****************************************************************************
+
+:Author:    Andreas Hilboll <andreas@hilboll.de>
+:Date:      Mon Jan 21 19:52:07 2013
+:Website:   http://andreas-h.github.com/geodas/
+:License:   GPLv3
+:Version:   0.1
+:Copyright: (c) 2012-2013 Andreas Hilboll <andreas@hilboll.de>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+
+# Library imports
+# ============================================================================
+
+import time
+
+import numpy as np
+
+from geodas.core.gridded_array import gridded_array
+from geodas.core.parallel import get_num_threads
+
+
+def bench_reductions_threads(shape=(48, 17, 181, 360), nthreads=None):
+    """Reductions of a (time, level, latitude, longitude) array"""
+    if nthreads is None:
+        nthreads = get_num_threads()
+    dims = ['time', 'level', 'latitude', 'longitude']
+    data = np.random.rand(*shape)
+    data[data < .05] = np.nan
+    gdata = gridded_array(data, [(d, np.arange(n))
+                                 for d, n in zip(dims, shape)])
+    print("")
+    print("reductions of a %s array with %d threads" % (shape, nthreads))
+    for method, axis in [('mean', 'time'), ('std', 'time'),
+                         ('median', 'time'), ('mean', 'level'),
+                         ('max', ['latitude', 'longitude'])]:
+        t0 = time.time()
+        serial = getattr(gdata, method)(axis, nthreads=1)
+        t1 = time.time()
+        threaded = getattr(gdata, method)(axis, nthreads=nthreads)
+        t2 = time.time()
+        np.testing.assert_array_equal(threaded.data, serial.data)
+        print("  %-6s along %-28s %7.3f s -> %7.3f s (%4.1f x)" % (
+                    method, axis, t1 - t0, t2 - t1, (t1 - t0) / (t2 - t1)))
+
+
+def bench_coarsen(shape=(12, 1800, 3600), factor=10):
+    """Coarsening a 0.1 degree (time, latitude, longitude) array to 1
+    degree, compared to a loop over the blocks"""
+    data = np.random.rand(*shape)
+    data[data < .05] = np.nan
+    gdata = gridded_array(data, [('time', np.arange(shape[0])),
+                                 ('latitude', np.arange(shape[1])),
+                                 ('longitude', np.arange(shape[2]))])
+    print("")
+    print("coarsening a %s array by %d" % (shape, factor))
+    for how in ['mean', 'max', 'median']:
+        func = getattr(np, 'nan' + how)
+        t0 = time.time()
+        ny, nx = shape[1] // factor, shape[2] // factor
+        loop = np.empty((shape[0], ny, nx))
+        for j in range(ny):
+            for i in range(nx):
+                loop[:, j, i] = func(data[:, j * factor:(j + 1) * factor,
+                                          i * factor:(i + 1) * factor]
+                                     .reshape(shape[0], -1), axis=1)
+        t1 = time.time()
+        res = gdata.coarsen(how, latitude=factor, longitude=factor)
+        t2 = time.time()
+        np.testing.assert_allclose(res.data, loop)
+        print("  %-6s %7.3f s -> %7.3f s (%4.1f x)" % (
+                    how, t1 - t0, t2 - t1, (t1 - t0) / (t2 - t1)))
+
+
+def bench_rolling(shape=(3650, 90, 180), window=31):
+    """Centred running means along time, compared to a loop over the
+    windows"""
+    data = np.random.rand(*shape)
+    data[data < .05] = np.nan
+    gdata = gridded_array(data, [('time', np.arange(shape[0])),
+                                 ('latitude', np.arange(shape[1])),
+                                 ('longitude', np.arange(shape[2]))])
+    print("")
+    print("running %d-step means of a %s array" % (window, shape))
+    t0 = time.time()
+    loop = np.empty(shape)
+    for i in range(shape[0]):
+        block = data[max(i - window // 2, 0):i + (window - 1) // 2 + 1]
+        loop[i] = np.nanmean(block, axis=0)
+        loop[i][np.sum(~np.isnan(block), axis=0) < 1] = np.nan
+    t1 = time.time()
+    res = gdata.rolling(time=window, center=True, min_count=1).mean()
+    t2 = time.time()
+    np.testing.assert_allclose(res.data, loop)
+    print("  mean   %7.3f s -> %7.3f s (%4.1f x)" % (
+                t1 - t0, t2 - t1, (t1 - t0) / (t2 - t1)))
+
+
+def bench_smoothing(shape=(24, 721, 1440), nthreads=None):
+    """Gaussian smoothing over latitude and longitude, in one thread and
+    in ``nthreads`` threads"""
+    if nthreads is None:
+        nthreads = get_num_threads()
+    data = np.random.rand(*shape)
+    data[data < .05] = np.nan
+    gdata = gridded_array(data, [('time', np.arange(shape[0])),
+                                 ('latitude', np.linspace(-90., 90.,
+                                                          shape[1])),
+                                 ('longitude', np.arange(shape[2]) *
+                                               360. / shape[2])])
+    print("")
+    print("gaussian smoothing of a %s array with %d threads" % (shape,
+                                                                 nthreads))
+    t0 = time.time()
+    serial = gdata.smooth(latitude=3., longitude=3., nthreads=1)
+    t1 = time.time()
+    threaded = gdata.smooth(latitude=3., longitude=3., nthreads=nthreads)
+    t2 = time.time()
+    np.testing.assert_array_equal(threaded.data, serial.data)
+    print("  smooth %7.3f s -> %7.3f s (%4.1f x)" % (
+                t1 - t0, t2 - t1, (t1 - t0) / (t2 - t1)))
+
+
+if __name__ == "__main__":
+    bench_reductions_threads()
+    bench_coarsen()
+    bench_rolling()
+    bench_smoothing()
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+*****************************************************************************
+geodas - Geospatial Data Analysis in Python
+*****************************************************************************
+
+:Author:    Andreas Hilboll <andreas@hilboll.de>
+:Date:      Mon Jan 21 19:52:07 2013
+:Website:   http://andreas-h.github.com/geodas/
+:License:   GPLv3
+:Version:   0.1
+:Copyright: (c) 2012-2013 Andreas Hilboll <andreas@hilboll.de>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+# Library imports
+# ============================================================================
+
+import time
+
+import numpy as np
+
+from geodas.core import regrid
+from geodas.core.coordinate import RegularCoordinateArray
+from geodas.core.gridded_array import gridded_array
+
+
+def _grid(step):
+    return (RegularCoordinateArray(-90. + .5 * step, step, int(180 / step),
+                                   'latitude'),
+            RegularCoordinateArray(-180. + .5 * step, step, int(360 / step),
+                                   'longitude'))
+
+
+def _bench(gdata, lat, lon, title):
+    regrid._weights_cache.clear()
+    t0 = time.time()
+    res = gdata.regrid(lat, lon, cache=False)
+    t1 = time.time()
+    res = gdata.regrid(lat, lon, cache=False)
+    t2 = time.time()
+    nnz = list(regrid._weights_cache.values())[0].nnz
+    print("  %-22s %7.3f s, with cached weights %7.3f s (%d weights)" % (
+                title, t1 - t0, t2 - t1, nnz))
+    return res
+
+
+def bench_regrid_conservative(ntime=24, src_step=1., dst_step=.25):
+    """Conservative regridding of a (time, latitude, longitude) array"""
+    lat, lon = _grid(src_step)
+    data = np.random.rand(ntime, lat.size, lon.size)
+    data[data < .05] = np.nan
+    gdata = gridded_array(data, [('time', np.arange(ntime)),
+                                 ('latitude', lat), ('longitude', lon)])
+    dst_lat, dst_lon = _grid(dst_step)
+    print("")
+    print("conservative regridding of %d time steps" % ntime)
+    fine = _bench(gdata, dst_lat, dst_lon,
+                  "%g deg -> %g deg" % (src_step, dst_step))
+    _bench(fine, lat, lon, "%g deg -> %g deg" % (dst_step, src_step))
+
+
+if __name__ == "__main__":
+    bench_regrid_conservative()
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+*****************************************************************************
+geodas - Geospatial Data Analysis in Python
+*****************************************************************************
+
+:Author:    Andreas Hilboll <andreas@hilboll.de>
+:Date:      Mon Jan 21 19:52:07 2013
+:Website:   http://andreas-h.github.com/geodas/
+:License:   GPLv3
+:Version:   0.1
+:Copyright: (c) 2012-2013 Andreas Hilboll <andreas@hilboll.de>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+
+# Library imports
+# ============================================================================
+
+import time
+
+import bottleneck as bn
+import numpy as np
+import pandas as pd
+
+from geodas.core.coordinate import DatetimeCoordinate
+from geodas.core.gridded_array import gridded_array
+from geodas.core.slicing import resample
+
+
+def _resample_loop(gdata):
+    """Monthly means the way ``resample`` used to calculate them: one scan
+    over all time steps, with a Python call per time step, for each month"""
+    times = gdata.coordinates['time'].values.astype('M8[us]').astype(object)
+    periods = pd.period_range(times.min(), times.max(), freq='M')
+    out = np.empty((periods.size, ) + gdata.data.shape[1:])
+    for i, p in enumerate(periods):
+        idx = [t.month == p.month and t.year == p.year for t in times]
+        out[i] = bn.nanmean(gdata.data[np.array(idx)], axis=0)
+    return out
+
+
+def bench_resample_monthly(nyears=10, nlat=18, nlon=36):
+    """Monthly means of hourly data"""
+    times = pd.date_range('2000-01-01', periods=nyears * 8760, freq='H')
+    data = np.random.rand(times.size, nlat, nlon)
+    gdata = gridded_array(data, [('time', DatetimeCoordinate(times.values)),
+                                 ('latitude', np.arange(nlat)),
+                                 ('longitude', np.arange(nlon))])
+    t0 = time.time()
+    ref = _resample_loop(gdata)
+    t1 = time.time()
+    res = resample(gdata, time='monthly')
+    t2 = time.time()
+    np.testing.assert_allclose(res.data, ref, rtol=1e-12)
+    print("")
+    print("monthly means of %d years of hourly %dx%d fields" % (nyears,
+                                                                nlat, nlon))
+    print("  loop over months:  %8.3f s" % (t1 - t0))
+    print("  resample:          %8.3f s" % (t2 - t1))
+    print("  speedup:           %8.1f x" % ((t1 - t0) / (t2 - t1)))
+
+
+if __name__ == "__main__":
+    bench_resample_monthly()
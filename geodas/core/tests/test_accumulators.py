@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+*****************************************************************************
+geodas - Geospatial Data Analysis in Python
+*****************************************************************************
+
+:Author:    Andreas Hilboll <andreas@hilboll.de>
+:Date:      Mon Jan 21 19:52:07 2013
+:Website:   http://andreas-h.github.com/geodas/
+:License:   GPLv3
+:Version:   0.1
+:Copyright: (c) 2012-2013 Andreas Hilboll <andreas@hilboll.de>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+
+# Library imports
+# ============================================================================
+
+import numpy as np
+from numpy.testing import assert_equal, assert_almost_equal, \
+                          assert_array_equal, assert_array_almost_equal, \
+                          assert_allclose, TestCase, run_module_suite
+
+from geodas.core.accumulators import CountAccumulator, \
+                                     HistogramAccumulator, MeanAccumulator, \
+                                     MinMaxAccumulator
+from geodas.core.gridded_array import gridded_array
+from geodas.core.slicing import get_slice
+
+
+def _make_data(shape=(40, 9, 12)):
+    coords = [('time', np.arange(shape[0], dtype=float)),
+              ('latitude', np.arange(shape[1], dtype=float)),
+              ('longitude', np.arange(shape[2], dtype=float))]
+    data = np.random.randn(*shape) * 10. + 1000.
+    data[np.random.rand(*shape) < .1] = np.nan
+    data[:, 0, 0] = np.nan
+    return gridded_array(data, coords, 'test')
+
+
+def _blocks(gdata, bounds=(0, 7, 8, 25, 40)):
+    return [get_slice(gdata, time=(lo, hi - 1))
+            for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+
+class TestAccumulators(TestCase):
+    def setUp(self):
+        self.gdata = _make_data()
+
+    def test_mean(self):
+        acc = MeanAccumulator('time')
+        for block in _blocks(self.gdata):
+            acc.add(block)
+        assert_allclose(acc.mean().data, self.gdata.mean('time').data)
+        assert_allclose(acc.std().data, self.gdata.std('time').data)
+        assert_allclose(acc.var(ddof=1).data,
+                        self.gdata.var('time', ddof=1).data)
+        assert_array_equal(acc.count().data, self.gdata.count('time').data)
+        assert acc.mean().coordinates.dims == ('latitude', 'longitude')
+
+    def test_merge(self):
+        blocks = _blocks(self.gdata)
+        acc1, acc2 = MeanAccumulator('time'), MeanAccumulator('time')
+        for block in blocks[:2]:
+            acc1.add(block)
+        for block in blocks[2:]:
+            acc2.add(block)
+        acc1.merge(acc2)
+        assert_allclose(acc1.mean().data, self.gdata.mean('time').data)
+        assert_allclose(acc1.std().data, self.gdata.std('time').data)
+        mm1, mm2 = MinMaxAccumulator('time'), MinMaxAccumulator('time')
+        mm1.add(blocks[0])
+        mm2.add(blocks[1]).add(blocks[2]).add(blocks[3])
+        mm1.merge(mm2)
+        assert_array_equal(mm1.min().data, self.gdata.min('time').data)
+        assert_array_equal(mm1.max().data, self.gdata.max('time').data)
+
+    def test_samples(self):
+        acc = MeanAccumulator()
+        count = CountAccumulator()
+        for i in range(self.gdata.data.shape[0]):
+            field = get_slice(self.gdata, time=i).mean('time')
+            acc.add(field)
+            count.add(field)
+        assert_allclose(acc.mean().data, self.gdata.mean('time').data)
+        assert_array_equal(count.count().data, self.gdata.count('time').data)
+
+    def test_histogram(self):
+        bins = np.linspace(970., 1030., 7)
+        acc = HistogramAccumulator(bins, 'time')
+        for block in _blocks(self.gdata):
+            acc.add(block)
+        hist = acc.histogram()
+        assert hist.coordinates.dims == ('bin', 'latitude', 'longitude')
+        values = self.gdata.data[:, 3, 4]
+        assert_array_equal(hist.data[:, 3, 4],
+                           np.histogram(values[~np.isnan(values)], bins)[0])
+
+    def test_coordinate_check(self):
+        acc = MeanAccumulator('time')
+        acc.add(self.gdata)
+        other = get_slice(self.gdata, latitude=(0, 4))
+        self.assertRaises(ValueError, acc.add, other)
+        self.assertRaises(ValueError, acc.merge, MinMaxAccumulator('time'))
+
+
+if __name__ == "__main__":
+    run_module_suite()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+*****************************************************************************
+geodas - Geospatial Data Analysis in Python
+*****************************************************************************
+
+:Author:    Andreas Hilboll <andreas@hilboll.de>
+:Date:      Mon Jan 21 19:52:07 2013
+:Website:   http://andreas-h.github.com/geodas/
+:License:   GPLv3
+:Version:   0.1
+:Copyright: (c) 2012-2013 Andreas Hilboll <andreas@hilboll.de>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+
+# Library imports
+# ============================================================================
+
+import numpy as np
+from numpy.testing import assert_array_equal, TestCase, run_module_suite
+
+from geodas.core.batch import GriddedBatch
+from geodas.core.gridded_array import gridded_array
+
+
+class TestGriddedBatch(TestCase):
+    def setUp(self):
+        self.coords = [('time', np.arange(10.))]
+        self.arrays = [gridded_array(np.random.rand(10), self.coords,
+                                     'station %d' % i) for i in range(5)]
+
+    def test_from_arrays(self):
+        batch = GriddedBatch.from_arrays(self.arrays)
+        assert len(batch) == 5
+        assert batch.data.shape == (5, 10)
+        member = batch[3]
+        assert member.title == 'station 3'
+        assert_array_equal(member.data, self.arrays[3].data)
+        assert np.may_share_memory(member.data, batch.data)
+        # all members share one set of coordinates
+        assert batch[0].coordinates is batch[4].coordinates
+        assert len(batch[1:3]) == 2
+        other = gridded_array(np.ones(4), [('time', np.arange(4.))])
+        self.assertRaises(ValueError, GriddedBatch.from_arrays,
+                          self.arrays + [other])
+
+    def test_fill(self):
+        batch = GriddedBatch.empty(5, self.coords)
+        assert np.isnan(batch.data).all()
+        for i, gdata in enumerate(self.arrays):
+            batch[i] = gdata
+        assert_array_equal(batch.data, [a.data for a in self.arrays])
+        res = batch.as_gridded_array().mean(axis='member')
+        assert_array_equal(res.data, np.mean([a.data for a in self.arrays],
+                                             axis=0))
+
+
+if __name__ == "__main__":
+    run_module_suite()
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+*****************************************************************************
+geodas - Geospatial Data Analysis in Python
+*****************************************************************************
+
+:Author:    Andreas Hilboll <andreas@hilboll.de>
+:Date:      Mon Jan 21 19:52:07 2013
+:Website:   http://andreas-h.github.com/geodas/
+:License:   GPLv3
+:Version:   0.1
+:Copyright: (c) 2012-2013 Andreas Hilboll <andreas@hilboll.de>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+
+# Library imports
+# ============================================================================
+
+
+import numpy as np
+from numpy.testing import assert_allclose, assert_array_equal, TestCase, \
+                          run_module_suite
+
+from geodas.core.coordinate import DatetimeCoordinate, \
+                                   RegularCoordinateArray
+from geodas.core.gridded_array import gridded_array
+
+
+def _coarsen_loop(data, fy, fx, func, trim=False):
+    ny = data.shape[1] // fy if trim else -(-data.shape[1] // fy)
+    nx = data.shape[2] // fx if trim else -(-data.shape[2] // fx)
+    res = np.empty((data.shape[0], ny, nx))
+    for t in range(data.shape[0]):
+        for j in range(ny):
+            for i in range(nx):
+                block = data[t, j * fy:(j + 1) * fy, i * fx:(i + 1) * fx]
+                res[t, j, i] = func(block)
+    return res
+
+
+class TestCoarsen(TestCase):
+    def setUp(self):
+        rs = np.random.RandomState(1)
+        data = rs.randn(2, 23, 30)
+        data[rs.rand(*data.shape) < .2] = np.nan
+        data[0, :5, :5] = np.nan
+        self.lat = RegularCoordinateArray(-89.5, 1., 23, 'latitude')
+        self.lon = RegularCoordinateArray(.5, 1., 30, 'longitude')
+        self.gdata = gridded_array(data, [('time', np.arange(2.)),
+                                          ('latitude', self.lat),
+                                          ('longitude', self.lon)])
+
+    def test_reductions(self):
+        count = lambda b: np.sum(~np.isnan(b))
+        for how, func in [('mean', np.nanmean), ('sum', np.nansum),
+                          ('min', np.nanmin), ('max', np.nanmax),
+                          ('count', count), ('median', np.nanmedian),
+                          ('std', np.nanstd), ('var', np.nanvar)]:
+            with np.errstate(invalid='ignore'):
+                with np.warnings.catch_warnings():
+                    np.warnings.simplefilter('ignore')
+                    for trim in (False, True):
+                        exp = _coarsen_loop(self.gdata.data, 5, 10, func,
+                                            trim)
+                        res = self.gdata.coarsen(
+                                  how, boundary='trim' if trim else 'pad',
+                                  latitude=5, longitude=10)
+                        assert_allclose(res.data, exp, err_msg=how)
+
+    def test_coordinates(self):
+        res = self.gdata.coarsen(longitude=10, latitude=5, boundary='trim')
+        self.assertTrue(isinstance(res.coordinates['latitude'],
+                                   RegularCoordinateArray))
+        assert_allclose(res.coordinates['latitude'],
+                        [-87.5, -82.5, -77.5, -72.5])
+        assert_allclose(res.coordinates['longitude'], [5., 15., 25.])
+        res = self.gdata.coarsen(latitude=5)
+        assert_allclose(res.coordinates['latitude'],
+                        [-87.5, -82.5, -77.5, -72.5, -68.5])
+        self.assertEqual(res.coordinates['longitude'].size, 30)
+        gdata = gridded_array(np.arange(5.), [('x', np.array([0., 1., 3.,
+                                                              7., 8.]))])
+        res = gdata.coarsen(x=2)
+        assert_allclose(res.coordinates['x'], [.5, 5., 8.])
+        assert_allclose(res.data, [.5, 2.5, 4.])
+
+    def test_datetime(self):
+        times = DatetimeCoordinate(np.arange('2000-01-01', '2000-01-08',
+                                             dtype='M8[D]'), 'time')
+        gdata = gridded_array(np.arange(7.), [('time', times)])
+        res = gdata.coarsen(time=2)
+        assert_array_equal(res.data, [.5, 2.5, 4.5, 6.])
+        assert_array_equal(np.asarray(res.coordinates['time']),
+                           np.array(['2000-01-01T12', '2000-01-03T12',
+                                     '2000-01-05T12', '2000-01-07T00'],
+                                    dtype='M8[h]'))
+
+    def test_errors(self):
+        self.assertRaises(ValueError, self.gdata.coarsen, depth=2)
+        self.assertRaises(ValueError, self.gdata.coarsen, latitude=2.5)
+        self.assertRaises(ValueError, self.gdata.coarsen, 'mode',
+                          latitude=2)
+        self.assertRaises(ValueError, self.gdata.coarsen,
+                          boundary='exact', latitude=2)
+
+
+if __name__ == "__main__":
+    run_module_suite()
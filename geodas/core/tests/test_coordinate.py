@@ -30,12 +30,20 @@ geodas - Geospatial Data Analysis in Python
 # Library imports
 # ============================================================================
 
+import gc
+import weakref
+
 import numpy as np
+import pandas as pd
 from numpy.testing import assert_equal, assert_almost_equal, \
                           assert_array_equal, assert_array_almost_equal, \
                           assert_allclose, TestCase, run_module_suite
 
-from geodas.core.coordinate import _array_get_common_range_index
+from geodas.core.coordinate import _array_get_common_range_index, \
+                                   as_coordinate, CoordinateArray, \
+                                   CoordinateSet, DatetimeCoordinate, \
+                                   intern_coordinate, intern_coordinates, \
+                                   RegularCoordinateArray
 
 
 class TestCoordinateArray(TestCase):
@@ -49,5 +57,182 @@ class TestCoordinateArray(TestCase):
         assert bounds[2] == (0, 4)
         print("success")
 
+    def test_index_range_descending(self):
+        c = CoordinateArray(np.array([5., 4., 2., 1., 0.]), 'latitude')
+        assert c.index_range(1., 4.) == (1, 4)
+        assert c.index(2.2) == 2
+
+
+class TestRegularCoordinateArray(TestCase):
+    def test_as_coordinate(self):
+        c = as_coordinate(np.linspace(-179.5, 179.5, 360), 'longitude')
+        assert isinstance(c, RegularCoordinateArray)
+        assert_almost_equal(c.step, 1.)
+        assert_array_almost_equal(np.asarray(c),
+                                  np.linspace(-179.5, 179.5, 360))
+        c = as_coordinate(np.array([0., 1., 3.]), 'level')
+        assert not isinstance(c, RegularCoordinateArray)
+
+    def test_as_coordinate_float32(self):
+        # float32 axes, as the readers get them from netCDF or HDF files
+        for values in [np.arange(-89.95, 90., .1),
+                       np.arange(-179.995, 180., .01),
+                       np.arange(0., 360., .01)]:
+            data = values.astype(np.float32)
+            c = as_coordinate(data, 'x')
+            assert isinstance(c, RegularCoordinateArray)
+            assert_allclose(np.asarray(c), data, rtol=0, atol=1e-4)
+            assert c.index(data[123]) == 123
+        data = np.arange(0., 360., .01).astype(np.float32)
+        data[1000] += .001
+        assert not isinstance(as_coordinate(data, 'x'),
+                              RegularCoordinateArray)
+
+    def test_slicing(self):
+        c = RegularCoordinateArray(.5, 1., 10, 'longitude')
+        assert_array_equal(np.asarray(c[2:8:3]), np.arange(10)[2:8:3] + .5)
+        assert_array_equal(np.asarray(c[::-1]), np.arange(10)[::-1] + .5)
+        assert_array_equal(np.asarray(c[7:2]), [])
+        assert c[-1] == 9.5
+        assert_array_equal(c[[1, 3]].values, [1.5, 3.5])
+
+    def test_index_range(self):
+        values = np.arange(12) + .5
+        c = RegularCoordinateArray(.5, 1., 12, 'x')
+        for lower, upper in [(3., 6.5), (-4., 2.), (3.5, 3.5), (20., 30.)]:
+            assert (c.index_range(lower, upper) ==
+                    _array_get_common_range_index((values,
+                                                   (lower, upper)))[0])
+        c = RegularCoordinateArray(89.5, -1., 180, 'latitude')
+        start, stop = c.index_range(-10., 10.)
+        assert_array_equal(np.asarray(c[start:stop]),
+                           np.arange(9.5, -10., -1.))
+        assert c.index(0.2) == 89
+
+    def test_equals(self):
+        a = RegularCoordinateArray(.1 * 3, .1, 10, 'x')
+        b = RegularCoordinateArray(.3, .1, 10, 'x')
+        assert a.start != b.start
+        assert a.equals(b) and b.equals(a)
+        assert not a.equals(RegularCoordinateArray(.3, .1, 11, 'x'))
+        assert not a.equals(RegularCoordinateArray(.3001, .1, 10, 'x'))
+        assert not a.equals(RegularCoordinateArray(.3, .1001, 10, 'x'))
+        # arrays are compared with the same tolerance, in both directions
+        values = np.arange(-179.95, 180., .1)
+        c = as_coordinate(values, 'x')
+        assert isinstance(c, RegularCoordinateArray)
+        assert c.equals(values)
+        assert CoordinateArray(values, 'x').equals(c)
+        assert not c.equals(values + .01)
+        s1 = CoordinateSet([('x', c)])
+        s2 = CoordinateSet([('x', values)])
+        assert s1.equals(s2) and s2.equals(s1)
+
+class TestCoordinateSet(TestCase):
+    def setUp(self):
+        self.coords = CoordinateSet([('time', np.arange(5)),
+                                     ('latitude', np.array([1., 2., 4.])),
+                                     ('longitude', np.arange(4.))])
+
+    def test_axis(self):
+        c = self.coords
+        assert c.dims == ('time', 'latitude', 'longitude')
+        assert c.shape == (5, 3, 4)
+        assert c.axis('longitude') == 2
+        assert c.axis(-1) == 2
+        c['level'] = np.arange(2)
+        assert c.axis('level') == 3
+        del c['time']
+        assert c.axis('level') == 2
+        self.assertRaises(ValueError, c.axis, 'time')
+
+    def test_derived(self):
+        c = self.coords
+        d = c.drop('latitude')
+        assert d.dims == ('time', 'longitude')
+        assert d['time'] is c['time']
+        d = c.replace(1, np.arange(3))
+        assert d.dims == c.dims
+        assert d['longitude'] is c['longitude']
+        d = c.reorder(['longitude', 'time', 'latitude'])
+        assert d.shape == (4, 5, 3)
+        self.assertRaises(ValueError, c.reorder, ['time', 'latitude'])
+
+    def test_flags(self):
+        c = self.coords
+        assert c.is_monotonic('latitude')
+        assert not c.is_regular('latitude')
+        assert c.is_regular('longitude')
+        c['latitude'] = np.array([1., 2., 3.])
+        assert c.is_regular('latitude')
+
+
+class TestDatetimeCoordinate(TestCase):
+    def test_fields(self):
+        times = pd.date_range('1969-11-29', periods=2000, freq='7H')
+        c = as_coordinate(times.values, 'time')
+        assert isinstance(c, DatetimeCoordinate)
+        assert_array_equal(c.year, times.year)
+        assert_array_equal(c.month, times.month)
+        assert_array_equal(c.day, times.day)
+        assert_array_equal(c.hour, times.hour)
+        assert_array_equal(c.dayofyear, times.dayofyear)
+        assert_array_equal(c.season, [(m % 12) // 3 for m in times.month])
+        assert_array_equal(c.season_year[c.month == 12],
+                           times.year[times.month == 12] + 1)
+        assert c.year is c.year
+
+    def test_slicing(self):
+        c = DatetimeCoordinate(pd.date_range('2000-01-01', periods=10))
+        sub = c[2:5]
+        assert isinstance(sub, DatetimeCoordinate)
+        assert_array_equal(sub.day, [3, 4, 5])
+        assert c.index_range('2000-01-03', '2000-01-04') == (2, 4)
+
+
+class TestCompactLayout(TestCase):
+    def test_slots(self):
+        for c in [CoordinateArray(np.array([1., 3., 4.]), 'x'),
+                  RegularCoordinateArray(0., 1., 5, 'x'),
+                  DatetimeCoordinate(pd.date_range('2000-01-01', periods=3))]:
+            assert not hasattr(c, '__dict__')
+
+    def test_pickle(self):
+        import pickle
+        coords = [CoordinateArray(np.array([1., 3., 4.]), 'x', 'm'),
+                  RegularCoordinateArray(0., 1., 5, 'x'),
+                  DatetimeCoordinate(pd.date_range('2000-01-01', periods=3))]
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            for c in coords:
+                res = pickle.loads(pickle.dumps(c, protocol))
+                assert type(res) is type(c)
+                assert res.equals(c) and res.units == c.units
+
+    def test_intern(self):
+        a = intern_coordinate(as_coordinate(np.arange(5.), 'x'))
+        assert intern_coordinate(as_coordinate(np.arange(5.), 'x')) is a
+        assert intern_coordinate(as_coordinate(np.arange(5.), 'y')) is not a
+        v = np.array([1., 3., 4.])
+        b = intern_coordinate(CoordinateArray(v, 'x'))
+        assert intern_coordinate(b) is b
+        assert intern_coordinate(b.copy()) is b
+        assert not b.values.flags.writeable
+        # the values of the caller are neither frozen nor shared
+        assert v.flags.writeable
+        v[0] = -1.
+        assert b.values[0] == 1.
+        s1 = intern_coordinates(CoordinateSet([('x', np.arange(5.)),
+                                               ('z', [1., 3., 4.])]))
+        s2 = intern_coordinates(CoordinateSet([('x', np.arange(5.)),
+                                               ('z', [1., 3., 4.])]))
+        assert s1 is s2
+        assert s1['x'] is a
+        # nothing is kept alive by the interning itself
+        refs = [weakref.ref(s1), weakref.ref(s1['z'])]
+        del a, b, s1, s2
+        gc.collect()
+        assert all(ref() is None for ref in refs)
+
+
 if __name__ == "__main__":
     run_module_suite()
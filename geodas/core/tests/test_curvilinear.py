@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+*****************************************************************************
+geodas - Geospatial Data Analysis in Python
+*****************************************************************************
+
+:Author:    Andreas Hilboll <andreas@hilboll.de>
+:Date:      Mon Jan 21 19:52:07 2013
+:Website:   http://andreas-h.github.com/geodas/
+:License:   GPLv3
+:Version:   0.1
+:Copyright: (c) 2012-2013 Andreas Hilboll <andreas@hilboll.de>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+
+# Library imports
+# ============================================================================
+
+
+import pickle
+
+import numpy as np
+from numpy.testing import assert_array_equal, TestCase, run_module_suite
+
+from geodas.core import curvilinear
+from geodas.core.curvilinear import CurvilinearGrid, _xyz
+from geodas.core.gridded_array import gridded_array
+from geodas.core.slicing import get_slice, select
+
+
+def _nearest_brute(grid, lat, lon):
+    dist = np.sum((_xyz(grid.latitude, grid.longitude)[None, :, :] -
+                   _xyz(lat, lon)[:, None, :]) ** 2, axis=2)
+    return np.unravel_index(np.argmin(dist, axis=1), grid.shape)
+
+
+class TestCurvilinearGrid(TestCase):
+    def setUp(self):
+        # a rotated grid crossing the dateline
+        iy, ix = np.mgrid[:40, :60]
+        self.lat = 30. + .5 * iy + .1 * ix
+        self.lon = (170. + .5 * ix - .1 * iy + 180.) % 360. - 180.
+        self.grid = CurvilinearGrid(self.lat, self.lon)
+        curvilinear._index_cache.clear()
+
+    def test_nearest(self):
+        rs = np.random.RandomState(0)
+        lat = rs.uniform(32., 45., 50)
+        lon = rs.uniform(170., 185., 50)
+        iy, ix = self.grid.nearest(lat, lon)
+        exp_y, exp_x = _nearest_brute(self.grid, lat, lon)
+        assert_array_equal(iy, exp_y)
+        assert_array_equal(ix, exp_x)
+
+    def test_nearest_max_distance(self):
+        iy, ix = self.grid.nearest([40., 0.], [-175., 0.],
+                                   max_distance=100e3)
+        self.assertTrue(iy[0] >= 0 and ix[0] >= 0)
+        assert_array_equal([iy[1], ix[1]], [-1, -1])
+
+    def test_bbox_points(self):
+        for lat, lon in [((35., 40.), (175., -175.)),
+                         ((35., 40.), (-178., -170.)),
+                         ((None, 33.), None),
+                         ((50., 60.), (0., 10.))]:
+            res = self.grid.bbox_points(lat, lon)
+            inside = (self.lat >= (lat[0] if lat[0] is not None else -90.))
+            inside &= self.lat <= lat[1]
+            if lon is not None:
+                inside &= ((self.lon - lon[0]) % 360. <=
+                           (lon[1] - lon[0]) % 360.)
+            assert_array_equal(res, np.flatnonzero(inside))
+
+    def test_index_cached(self):
+        first = curvilinear.get_spatial_index(self.grid)
+        other = CurvilinearGrid(self.lat.copy(), self.lon.copy())
+        self.assertTrue(curvilinear.get_spatial_index(other) is first)
+        self.assertTrue(curvilinear.get_spatial_index(self.grid[:10, :10])
+                        is not first)
+
+    def test_missing_locations(self):
+        lat = self.lat.copy()
+        lat[:20] = np.nan
+        grid = CurvilinearGrid(lat, self.lon)
+        iy, ix = grid.nearest(30., 170.)
+        self.assertEqual(iy, 20)
+        self.assertEqual(grid.bbox_points((40., 41.), None).min(),
+                         20 * 60)
+
+
+class TestCurvilinearArray(TestCase):
+    def setUp(self):
+        iy, ix = np.mgrid[:40, :60]
+        self.lat = 30. + .5 * iy + .1 * ix
+        self.lon = -10. + .5 * ix - .1 * iy
+        self.grid = CurvilinearGrid(self.lat, self.lon)
+        data = np.arange(3 * 40 * 60, dtype=float).reshape(3, 40, 60)
+        self.gdata = gridded_array(data, [('time', np.arange(3.)),
+                                          ('y', np.arange(40)),
+                                          ('x', np.arange(60))],
+                                   grid=self.grid)
+
+    def test_get_slice(self):
+        res = get_slice(self.gdata, latitude=(40., 45.),
+                        longitude=(0., 5.))
+        inside = ((self.lat >= 40.) & (self.lat <= 45.) &
+                  (self.lon >= 0.) & (self.lon <= 5.))
+        iy, ix = np.nonzero(inside)
+        sy = slice(iy.min(), iy.max() + 1)
+        sx = slice(ix.min(), ix.max() + 1)
+        assert_array_equal(res.data, self.gdata.data[:, sy, sx])
+        assert_array_equal(res.coordinates['y'], np.arange(40)[sy])
+        assert_array_equal(res.grid.latitude, self.lat[sy, sx])
+        assert_array_equal(res.grid.longitude, self.lon[sy, sx])
+        self.assertRaises(ValueError, get_slice, self.gdata,
+                          latitude=(80., 85.))
+
+    def test_nearest(self):
+        lat = np.array([35., 42.3, 50.])
+        lon = np.array([-5., 3.2, 20.])
+        res = self.gdata.nearest(lat, lon)
+        iy, ix = _nearest_brute(self.grid, lat, lon)
+        self.assertEqual(res.coordinates.dims, ('time', 'point'))
+        assert_array_equal(res.data, self.gdata.data[:, iy, ix])
+        res = self.gdata.nearest([40., 0.], [0., 0.], max_distance=100e3)
+        self.assertTrue(np.isnan(res.data[:, 1]).all())
+        self.assertRaises(ValueError, self.gdata.sample, method='linear',
+                          latitude=lat, longitude=lon)
+
+    def test_grid_propagation(self):
+        self.assertTrue(self.gdata.mean('time').grid is self.grid)
+        self.assertTrue((self.gdata * 2).grid is self.grid)
+        self.assertTrue(self.gdata.copy().grid is self.grid)
+        self.assertTrue(self.gdata.mean('x').grid is None)
+        res = select(self.gdata, y=[3, 5, 10])
+        assert_array_equal(res.grid.latitude, self.lat[[3, 5, 10]])
+
+    def test_pickle(self):
+        res = pickle.loads(pickle.dumps(self.gdata, 2))
+        assert_array_equal(res.grid.latitude, self.lat)
+        self.assertEqual(res.grid.dims, ('y', 'x'))
+        self.assertEqual(res.grid.key, self.grid.key)
+
+
+if __name__ == "__main__":
+    run_module_suite()
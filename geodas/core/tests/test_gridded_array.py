@@ -0,0 +1,379 @@
+# -*- coding: utf-8 -*-
+"""
+*****************************************************************************
+geodas - Geospatial Data Analysis in Python
+*****************************************************************************
+
+:Author:    Andreas Hilboll <andreas@hilboll.de>
+:Date:      Mon Jan 21 19:52:07 2013
+:Website:   http://andreas-h.github.com/geodas/
+:License:   GPLv3
+:Version:   0.1
+:Copyright: (c) 2012-2013 Andreas Hilboll <andreas@hilboll.de>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+
+# Library imports
+# ============================================================================
+
+import gc
+
+import numpy as np
+from numpy.testing import assert_equal, assert_almost_equal, \
+                          assert_array_equal, assert_array_almost_equal, \
+                          assert_allclose, TestCase, run_module_suite
+
+from geodas.core import parallel
+from geodas.core.alignment import align, get_alignment_plan
+from geodas.core.area import cell_area
+from geodas.core.coordinate import CoordinateArray, \
+                                   RegularCoordinateArray, get_common_range
+from geodas.core.gridded_array import gridded_array
+
+
+def _make_data(shape=(6, 4, 9, 12)):
+    dims = ['time', 'level', 'latitude', 'longitude']
+    coords = [(d, np.arange(n, dtype=float)) for d, n in zip(dims, shape)]
+    data = np.random.rand(*shape)
+    data[data < .1] = np.nan
+    return gridded_array(data, coords, 'test')
+
+
+class TestReductions(TestCase):
+    def setUp(self):
+        self.gdata = _make_data()
+
+    def test_multiple_axes(self):
+        data = self.gdata.data
+        for method, func in [('sum', np.nansum), ('mean', np.nanmean),
+                             ('std', np.nanstd), ('var', np.nanvar),
+                             ('min', np.nanmin), ('max', np.nanmax),
+                             ('median', np.nanmedian)]:
+            res = getattr(self.gdata, method)(axis=['longitude', 'level'])
+            assert res.coordinates.dims == ('time', 'latitude')
+            expected = func(data.transpose(0, 2, 1, 3).reshape(6, 9, -1),
+                            axis=-1)
+            assert_allclose(res.data, expected, rtol=1e-12)
+            res = getattr(self.gdata, method)(axis=1)
+            assert_allclose(res.data, func(data, axis=1), rtol=1e-12)
+            assert_allclose(getattr(self.gdata, method)(), func(data),
+                            rtol=1e-12)
+
+    def test_count(self):
+        res = self.gdata.count(axis=('time', 'latitude'))
+        assert_array_equal(res.data, (~np.isnan(self.gdata.data)).sum(
+                                                               axis=(0, 2)))
+        res = gridded_array(np.ones((3, 4), dtype=int),
+                            [('x', np.arange(3)), ('y', np.arange(4))])
+        assert_array_equal(res.count('x').data, 3)
+
+    def test_percentile(self):
+        res = self.gdata.percentile([10, 90], axis=['time', 'level'])
+        assert res.coordinates.dims == ('percentile', 'latitude',
+                                        'longitude')
+        assert res.data.shape == (2, 9, 12)
+        res = self.gdata.percentile(50, axis=['time', 'level'])
+        assert_allclose(res.data, self.gdata.median(['time', 'level']).data)
+
+    def test_unknown_axis(self):
+        self.assertRaises(ValueError, self.gdata.mean, 'altitude')
+
+
+class TestParallelReductions(TestCase):
+    def setUp(self):
+        self._min_size = parallel._min_parallel_size
+        parallel._min_parallel_size = 0
+        self.gdata = _make_data((6, 4, 19, 12))
+
+    def tearDown(self):
+        parallel._min_parallel_size = self._min_size
+
+    def test_threads(self):
+        for method in ['sum', 'mean', 'std', 'min', 'max', 'median',
+                       'count']:
+            for axis in ['time', 'longitude', ['time', 'latitude']]:
+                serial = getattr(self.gdata, method)(axis, nthreads=1)
+                threaded = getattr(self.gdata, method)(axis, nthreads=3)
+                assert_array_equal(threaded.data, serial.data)
+        serial = self.gdata.percentile([5, 50], 'level', nthreads=1)
+        threaded = self.gdata.percentile([5, 50], 'level', nthreads=3)
+        assert_array_equal(threaded.data, serial.data)
+
+    def test_num_threads(self):
+        parallel.set_num_threads(2)
+        assert parallel.get_num_threads() == 2
+        parallel.set_num_threads(None)
+        assert parallel.get_num_threads() >= 1
+
+
+class TestAreaWeighting(TestCase):
+    def setUp(self):
+        lat = RegularCoordinateArray(-89., 2., 90, 'latitude')
+        lon = RegularCoordinateArray(-179., 2., 180, 'longitude')
+        self.gdata = gridded_array(np.random.rand(3, 90, 180),
+                                   [('time', np.arange(3)),
+                                    ('latitude', lat), ('longitude', lon)])
+
+    def test_cell_area(self):
+        coords = self.gdata.coordinates
+        area = cell_area(coords['latitude'], coords['longitude'])
+        assert_allclose(area.sum(), 4 * np.pi * 6371007.2 ** 2)
+        # irregular coordinates give the same result
+        area2 = cell_area(np.asarray(coords['latitude']),
+                          np.asarray(coords['longitude']))
+        assert_allclose(area2, area)
+
+    def test_area_mean(self):
+        coords = self.gdata.coordinates
+        area = cell_area(coords['latitude'], coords['longitude'])
+        data = self.gdata.data
+        data[0, :10] = np.nan
+        res = self.gdata.area_mean()
+        assert res.coordinates.dims == ('time', )
+        valid = ~np.isnan(data)
+        expected = (np.nansum(data * area, axis=(1, 2)) /
+                    (valid * area).sum(axis=(1, 2)))
+        assert_allclose(res.data, expected)
+        res = self.gdata.area_mean(axis=['longitude', 'latitude'])
+        assert_allclose(res.data, expected)
+        # zonal means are unweighted on a regular grid
+        res = self.gdata.area_mean(axis='longitude')
+        assert_allclose(res.data, np.nanmean(data, axis=2))
+        self.assertRaises(ValueError, self.gdata.area_mean, 'time')
+
+    def test_area_sum(self):
+        ones = gridded_array(np.ones(self.gdata.data.shape),
+                             self.gdata.coordinates)
+        assert_allclose(ones.area_sum().data, 4 * np.pi * 6371007.2 ** 2)
+
+
+class TestArithmetics(TestCase):
+    def setUp(self):
+        self.lat = np.arange(-85., 90., 10.)
+        self.lon = np.arange(-175., 180., 10.)
+        self.a = gridded_array(np.random.rand(4, 18, 36),
+                               [('time', np.arange(4.)),
+                                ('latitude', self.lat),
+                                ('longitude', self.lon)], 'a')
+
+    def test_transpose(self):
+        b = gridded_array(np.random.rand(36, 18),
+                          [('longitude', self.lon), ('latitude', self.lat)])
+        res = self.a - b
+        assert res.coordinates.dims == ('time', 'latitude', 'longitude')
+        assert_array_equal(res.data, self.a.data - b.data.T[np.newaxis])
+        res = b * self.a
+        assert res.coordinates.dims == ('longitude', 'latitude', 'time')
+        assert_array_equal(res.data, b.data[..., np.newaxis] *
+                                     self.a.data.transpose(2, 1, 0))
+
+    def test_regular_rounding(self):
+        a = gridded_array(np.ones(10),
+                          [('x', RegularCoordinateArray(.1 * 3, .1, 10, 'x'))])
+        b = gridded_array(np.ones(10),
+                          [('x', RegularCoordinateArray(.3, .1, 10, 'x'))])
+        res = a + b
+        assert res.data.shape == (10, )
+        assert_array_equal(res.data, 2.)
+
+    def test_common_range(self):
+        b = gridded_array(np.random.rand(9, 5),
+                          [('latitude', self.lat[4:13]),
+                           ('level', np.arange(5.))])
+        res = self.a / b
+        assert res.coordinates.dims == ('time', 'latitude', 'longitude',
+                                        'level')
+        assert res.data.shape == (4, 9, 36, 5)
+        assert_array_equal(res.coordinates['latitude'], self.lat[4:13])
+        assert_allclose(res.data, self.a.data[:, 4:13, :, np.newaxis] /
+                                  b.data[np.newaxis, :, np.newaxis])
+        c = gridded_array(np.ones(18), [('latitude', self.lat + 1.)])
+        self.assertRaises(ValueError, lambda: self.a + c)
+
+    def test_scalars_and_ufuncs(self):
+        assert_array_equal((2. * self.a + 1.).data, 2. * self.a.data + 1.)
+        assert_array_equal((-self.a).data, -self.a.data)
+        assert_array_equal((self.a > .5).data, self.a.data > .5)
+        res = np.sqrt(self.a)
+        assert isinstance(res, gridded_array)
+        assert_array_equal(res.data, np.sqrt(self.a.data))
+        b = gridded_array(np.random.rand(36), [('longitude', self.lon)])
+        res = np.maximum(self.a, b)
+        assert_array_equal(res.data, np.maximum(self.a.data, b.data))
+
+    def test_classic_division(self):
+        ints = gridded_array(np.arange(6).reshape(2, 3),
+                             [('time', np.arange(2.)),
+                              ('level', np.arange(3.))])
+        assert_array_equal((ints.__div__(4)).data,
+                           np.divide(ints.data, 4))
+        assert_array_equal((ints.__truediv__(4)).data, ints.data / 4.)
+        # gridded arrays are still hashable by identity
+        assert len(set([ints, self.a, ints])) == 2
+
+    def test_inplace(self):
+        b = gridded_array(np.random.rand(36, 18),
+                          [('longitude', self.lon), ('latitude', self.lat)])
+        expected = self.a.data + b.data.T
+        data = self.a.data
+        self.a += b
+        assert self.a.data is data
+        assert_array_equal(self.a.data, expected)
+
+    def test_plan_cache(self):
+        b = gridded_array(np.random.rand(18), [('latitude', self.lat)])
+        plan = get_alignment_plan(self.a.coordinates, b.coordinates)
+        assert get_alignment_plan(self.a.coordinates, b.coordinates) is plan
+        first, second = plan.apply(self.a.data, b.data)
+        assert first.base is not None and second.base is not None
+
+
+class TestAlign(TestCase):
+    def setUp(self):
+        self.lat = np.arange(-85., 90., 10.)
+        self.a = gridded_array(np.random.rand(4, 18),
+                               [('time', np.arange(4.)),
+                                ('latitude', self.lat)], 'a')
+        self.b = gridded_array(np.random.rand(9, 3),
+                               [('latitude', self.lat[4:13]),
+                                ('level', np.arange(3.))], 'b')
+        self.c = gridded_array(np.random.rand(12, 2),
+                               [('latitude', self.lat[6:]),
+                                ('time', np.arange(1., 3.))], 'c')
+
+    def test_inner(self):
+        a, b, c = align(self.a, self.b, self.c)
+        assert_array_equal(a.coordinates['latitude'], self.lat[6:13])
+        assert_array_equal(b.coordinates['latitude'], self.lat[6:13])
+        assert_array_equal(c.coordinates['latitude'], self.lat[6:13])
+        assert_array_equal(a.coordinates['time'], [1., 2.])
+        assert c.coordinates.dims == ('latitude', 'time')
+        assert_array_equal(a.data, self.a.data[1:3, 6:13])
+        assert_array_equal(b.data, self.b.data[2:, :])
+        for res, orig in [(a, self.a), (b, self.b), (c, self.c)]:
+            assert np.may_share_memory(res.data, orig.data)
+
+    def test_exact(self):
+        a, b = align(self.a, self.a.copy(), join='exact')
+        assert a.coordinates['latitude'] is self.a.coordinates['latitude']
+        self.assertRaises(ValueError, align, self.a, self.b, join='exact')
+        self.assertRaises(ValueError, align, self.a, self.b, join='outer')
+
+    def test_mismatch(self):
+        d = gridded_array(np.ones(18), [('latitude', self.lat + 1.)])
+        self.assertRaises(ValueError, align, self.a, d)
+
+    def test_get_common_range(self):
+        coords = [RegularCoordinateArray(89.5, -1., 180, 'latitude'),
+                  CoordinateArray(np.arange(-20.5, 40.), 'latitude'),
+                  np.arange(-60.5, 10.)]
+        assert get_common_range(coords) == [(80, 111), (0, 31), (40, 71)]
+
+
+class TestCopyOnWrite(TestCase):
+    def setUp(self):
+        self.gdata = _make_data()
+
+    def test_copy(self):
+        orig = self.gdata.data.copy()
+        res = self.gdata.copy()
+        # copying doesn't allocate a new buffer
+        assert res.data is self.gdata.data
+        res[0] = 1.
+        assert not np.may_share_memory(res.data, self.gdata.data)
+        assert_array_equal(self.gdata.data, orig)
+        assert_array_equal(res.data[0], 1.)
+        # the source stays writable
+        self.gdata.data[0, 0] = 5.
+        assert_array_equal(res.data[0], 1.)
+        # writing to the source copies its buffer as well
+        res = self.gdata.copy()
+        self.gdata -= 1.
+        assert_array_equal(self.gdata.data[1:], orig[1:] - 1.)
+        assert_array_equal(res.data[1:], orig[1:])
+
+    def test_coordinates(self):
+        res = self.gdata.copy()
+        assert res.coordinates is not self.gdata.coordinates
+        assert res.coordinates['latitude'] is \
+            self.gdata.coordinates['latitude']
+        coord = CoordinateArray(np.arange(5.), 'level')
+        res = coord.copy()
+        assert np.may_share_memory(res.values, coord.values)
+        assert not res.values.flags.writeable
+        assert coord.values.flags.writeable
+
+    def test_get_slice(self):
+        from geodas.core.slicing import get_slice
+        orig = self.gdata.data.copy()
+        res = get_slice(self.gdata, latitude=(2., 5.))
+        assert np.may_share_memory(res.data, self.gdata.data)
+        # both buffers stay writable
+        assert res.data.flags.writeable
+        assert self.gdata.data.flags.writeable
+        res[...] = 0.
+        assert not np.may_share_memory(res.data, self.gdata.data)
+        assert_array_equal(self.gdata.data, orig)
+        assert_array_equal(res.data, 0.)
+        # the original copies its buffer as well before it's modified
+        other = get_slice(self.gdata, latitude=(2., 5.))
+        data = self.gdata.data
+        self.gdata += 1.
+        assert self.gdata.data is not data
+        assert_array_equal(other.data, orig[:, :, 2:6])
+        assert_array_equal(self.gdata.data, orig + 1.)
+
+    def test_no_copy_when_alone(self):
+        from geodas.core.slicing import get_slice
+        res = get_slice(self.gdata, latitude=(2., 5.))
+        del res
+        gc.collect()
+        data = self.gdata.data
+        self.gdata[0] = 1.
+        assert self.gdata.data is data
+
+
+class TestPickle(TestCase):
+    def setUp(self):
+        self.gdata = _make_data()
+
+    def _check(self, res):
+        assert_array_equal(res.data, self.gdata.data)
+        assert res.coordinates.dims == self.gdata.coordinates.dims
+        assert_array_equal(res.coordinates['latitude'],
+                           self.gdata.coordinates['latitude'])
+
+    def test_pickle(self):
+        import pickle
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            self._check(pickle.loads(pickle.dumps(self.gdata, protocol)))
+
+    def test_out_of_band(self):
+        import pickle
+        from geodas.core.pickling import PickleBuffer
+        if PickleBuffer is None or pickle.HIGHEST_PROTOCOL < 5:
+            self.skipTest("pickle protocol 5 is not available")
+        buffers = []
+        s = pickle.dumps(self.gdata, 5, buffer_callback=buffers.append)
+        assert len(s) < self.gdata.data.nbytes
+        res = pickle.loads(s, buffers=buffers)
+        self._check(res)
+        assert np.may_share_memory(res.data, self.gdata.data)
+
+
+if __name__ == "__main__":
+    run_module_suite()
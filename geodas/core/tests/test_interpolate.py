@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+*****************************************************************************
+geodas - Geospatial Data Analysis in Python
+*****************************************************************************
+
+:Author:    Andreas Hilboll <andreas@hilboll.de>
+:Date:      Mon Jan 21 19:52:07 2013
+:Website:   http://andreas-h.github.com/geodas/
+:License:   GPLv3
+:Version:   0.1
+:Copyright: (c) 2012-2013 Andreas Hilboll <andreas@hilboll.de>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+
+# Library imports
+# ============================================================================
+
+import numpy as np
+import pandas as pd
+from numpy.testing import assert_allclose, assert_array_equal, TestCase, \
+                          run_module_suite
+
+from geodas.core import interpolate
+from geodas.core.coordinate import RegularCoordinateArray
+from geodas.core.gridded_array import gridded_array
+
+
+class TestInterpolation(TestCase):
+    def setUp(self):
+        self.lat = RegularCoordinateArray(-85., 10., 18, 'latitude')
+        self.lon = np.array([0., 10., 30., 60., 100., 150.])
+        lat = np.asarray(self.lat)
+        # a bilinear function is reproduced exactly
+        data = (np.arange(1., 4.)[:, None, None] *
+                (1. + .1 * lat[:, None] + .01 * self.lon[None, :] +
+                 .001 * lat[:, None] * self.lon[None, :]))
+        self.gdata = gridded_array(data, [('time', np.arange(3.)),
+                                          ('latitude', self.lat),
+                                          ('longitude', self.lon)])
+
+    def _expected(self, lat, lon):
+        lat, lon = np.asarray(lat)[:, None], np.asarray(lon)[None, :]
+        return (np.arange(1., 4.)[:, None, None] *
+                (1. + .1 * lat + .01 * lon + .001 * lat * lon))
+
+    def test_bilinear(self):
+        lat = np.arange(-80., 81., 2.5)
+        lon = np.array([0., 5., 17., 59., 149.])
+        res = self.gdata.interpolate(latitude=lat, longitude=lon)
+        assert res.coordinates.dims == ('time', 'latitude', 'longitude')
+        assert_allclose(res.data, self._expected(lat, lon), atol=1e-12)
+        assert_array_equal(res.coordinates['latitude'], lat)
+
+    def test_descending(self):
+        gdata = gridded_array(self.gdata.data[:, ::-1],
+                              [('time', np.arange(3.)),
+                               ('latitude', self.lat[::-1]),
+                               ('longitude', self.lon)])
+        lat = np.array([3., -7.5, 12.])
+        res = gdata.interpolate(method='bilinear', latitude=lat)
+        assert_allclose(res.data, self._expected(lat, self.lon), atol=1e-12)
+
+    def test_outside(self):
+        res = self.gdata.interpolate(latitude=[-89., 0., 89.],
+                                     longitude=[-1., 5.])
+        assert np.isnan(res.data[:, [0, 2]]).all()
+        assert np.isnan(res.data[:, :, 0]).all()
+        assert not np.isnan(res.data[:, 1, 1]).any()
+
+    def test_nan(self):
+        # exact hits next to missing values are not missing
+        gdata = gridded_array(np.array([0., 1., np.nan, 3., 4.]),
+                              [('x', np.arange(5.))])
+        res = gdata.interpolate(x=np.arange(5.))
+        assert_array_equal(res.data, gdata.data)
+        res = gdata.interpolate(x=[.5, 1.5, 3.5])
+        assert_array_equal(res.data, [.5, np.nan, 3.5])
+
+    def test_nearest(self):
+        res = self.gdata.interpolate(method='nearest',
+                                     latitude=[-89., -81., 3., 89.],
+                                     longitude=[1., 21., 155.])
+        assert_array_equal(res.data, self.gdata.data[:, [0, 0, 9, 17]]
+                                                    [:, :, [0, 2, 5]])
+        res = self.gdata.interpolate(method='nearest', latitude=[91.])
+        assert np.isnan(res.data).all()
+
+    def test_table_cache(self):
+        interpolate._tables_cache.clear()
+        lat = np.arange(-80., 81., 2.5)
+        self.gdata.interpolate(latitude=lat)
+        table = interpolate.get_interpolation_table(self.lat, lat)
+        assert len(interpolate._tables_cache) == 1
+        assert interpolate.get_interpolation_table(
+                    RegularCoordinateArray(-85., 10., 18, 'x'), lat) is table
+        self.assertRaises(ValueError, self.gdata.interpolate,
+                          method='cubic', latitude=lat)
+
+
+class TestSample(TestCase):
+    def setUp(self):
+        self.lat = RegularCoordinateArray(-85., 10., 18, 'latitude')
+        self.lon = np.array([0., 10., 30., 60., 100., 150.])
+        self.time = pd.date_range('2000-01-01', periods=4)
+        self.gdata = gridded_array(np.random.rand(4, 18, 6),
+                                   [('time', self.time),
+                                    ('latitude', self.lat),
+                                    ('longitude', self.lon)])
+
+    def test_nearest(self):
+        lat = np.array([-84., 2., 7., 86.])
+        lon = np.array([4., 16., 149., 151.])
+        res = self.gdata.sample(latitude=lat, longitude=lon)
+        assert res.coordinates.dims == ('time', 'point')
+        assert_array_equal(res.data, self.gdata.data[:, [0, 9, 9, 17],
+                                                        [0, 1, 5, 5]])
+        res = self.gdata.sample(latitude=[-1., 95.], longitude=[30., 30.],
+                                time=self.time[[2, 3]].values,
+                                as_array=True)
+        assert res.shape == (2, )
+        assert_array_equal(res[0], self.gdata.data[2, 8, 2])
+        assert np.isnan(res[1])
+
+    def test_linear(self):
+        lat = np.random.uniform(-85., 85., 1000)
+        lon = np.random.uniform(0., 150., 1000)
+        res = self.gdata.sample(method='linear', latitude=lat, longitude=lon)
+        expected = self.gdata.interpolate(latitude=lat, longitude=lon).data
+        assert_allclose(res.data, expected[:, np.arange(1000),
+                                           np.arange(1000)])
+        res = self.gdata.sample(method='linear', latitude=-80.,
+                                longitude=10., time=np.datetime64(
+                                           '2000-01-02T12:00', 'ns'),
+                                as_array=True)
+        assert_allclose(res, self.gdata.data[1:3, 0:2, 1].mean())
+
+    def test_linear_nan(self):
+        # points on valid grid points next to missing values are not missing
+        self.gdata.data[:, 5] = np.nan
+        self.gdata.data[:, :, 3] = np.nan
+        res = self.gdata.sample(method='linear', latitude=[-45., -45., -40.],
+                                longitude=[10., 30., 10.])
+        assert_array_equal(res.data[:, 0], self.gdata.data[:, 4, 1])
+        assert_array_equal(res.data[:, 1], self.gdata.data[:, 4, 2])
+        assert np.isnan(res.data[:, 2]).all()
+
+
+if __name__ == "__main__":
+    run_module_suite()
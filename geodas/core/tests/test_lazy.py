@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+*****************************************************************************
+geodas - Geospatial Data Analysis in Python
+*****************************************************************************
+
+:Author:    Andreas Hilboll <andreas@hilboll.de>
+:Date:      Mon Jan 21 19:52:07 2013
+:Website:   http://andreas-h.github.com/geodas/
+:License:   GPLv3
+:Version:   0.1
+:Copyright: (c) 2012-2013 Andreas Hilboll <andreas@hilboll.de>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+
+# Library imports
+# ============================================================================
+
+import sys
+
+import numpy as np
+from numpy.testing import assert_array_equal, assert_allclose, TestCase, \
+                          run_module_suite
+
+from geodas.core.gridded_array import gridded_array
+from geodas.core.lazy import LazyExpression
+
+
+class TestLazy(TestCase):
+    def setUp(self):
+        self.lat = np.arange(-85., 90., 10.)
+        self.lon = np.arange(-175., 180., 10.)
+        data = np.random.rand(12, 18, 36)
+        data[data < .1] = np.nan
+        self.a = gridded_array(data, [('time', np.arange(12.)),
+                                      ('latitude', self.lat),
+                                      ('longitude', self.lon)], 'a')
+        self.clim = gridded_array(np.random.rand(36, 18),
+                                  [('longitude', self.lon),
+                                   ('latitude', self.lat)])
+        self.std = gridded_array(np.random.rand(18) + 1.,
+                                 [('latitude', self.lat)])
+
+    def _expected(self):
+        return (self.a - self.clim) / self.std * 2. + 1.
+
+    def _check_engine(self, engine, **kwargs):
+        expr = (self.a.lazy() - self.clim) / self.std * 2. + 1.
+        assert isinstance(expr, LazyExpression)
+        expected = self._expected()
+        res = expr.evaluate(engine=engine, **kwargs)
+        assert isinstance(res, gridded_array)
+        assert res.coordinates.dims == expected.coordinates.dims
+        assert_allclose(res.data, expected.data, rtol=1e-14)
+
+    def test_numpy(self):
+        self._check_engine('numpy')
+        self._check_engine('numpy', blocksize=100)
+
+    def test_numexpr(self):
+        try:
+            import numexpr
+        except ImportError:
+            self.skipTest("numexpr is not installed")
+        self._check_engine('numexpr')
+        self._check_engine(None)
+
+    def test_without_numexpr(self):
+        # an entry of None in sys.modules makes the import fail
+        saved = sys.modules.get('numexpr', False)
+        sys.modules['numexpr'] = None
+        try:
+            self._check_engine(None)
+            self.assertRaises(ImportError, self._check_engine, 'numexpr')
+        finally:
+            if saved is False:
+                del sys.modules['numexpr']
+            else:
+                sys.modules['numexpr'] = saved
+
+    def test_leaves(self):
+        a = self.a.lazy()
+        expr = (a - self.clim) * a / self.std
+        leaves = expr.leaves()
+        assert len(leaves) == 3 and leaves[0] is a
+        assert leaves[1].gdata is self.clim and leaves[2].gdata is self.std
+        assert a.leaves() == [a]
+
+    def test_ufuncs_and_comparisons(self):
+        expr = np.sqrt(abs(-self.a.lazy())) > .5
+        engines = ['numpy']
+        try:
+            import numexpr
+            engines.append('numexpr')
+        except ImportError:
+            pass
+        for engine in engines:
+            res = expr.evaluate(engine=engine)
+            assert res.data.dtype == bool
+            assert_array_equal(res.data, np.sqrt(self.a.data) > .5)
+
+    def test_integer_division(self):
+        a = gridded_array(np.arange(6).reshape(2, 3),
+                          [('latitude', self.lat[:2]),
+                           ('longitude', self.lon[:3])])
+        engines = ['numpy']
+        try:
+            import numexpr
+            engines.append('numexpr')
+        except ImportError:
+            pass
+        for engine in engines:
+            res = (a.lazy() / 4).evaluate(engine=engine)
+            assert_array_equal(res.data, np.arange(6.).reshape(2, 3) / 4.)
+
+    def test_gridded_array_operand_first(self):
+        expr = self.clim * self.a.lazy()
+        assert isinstance(expr, LazyExpression)
+        res = expr.evaluate(engine='numpy')
+        assert res.coordinates.dims == ('longitude', 'latitude', 'time')
+        assert_allclose(res.data, (self.clim * self.a).data)
+
+    def test_out(self):
+        out = np.empty(self.a.data.shape)
+        res = (2 * self.a.lazy() ** 2).evaluate(out=out, engine='numpy')
+        assert res.data is out
+        assert_allclose(out, 2 * self.a.data ** 2)
+        self.assertRaises(ValueError, self.a.lazy().evaluate,
+                          out=np.empty(3))
+
+
+if __name__ == "__main__":
+    run_module_suite()
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+*****************************************************************************
+geodas - Geospatial Data Analysis in Python
+*****************************************************************************
+
+:Author:    Andreas Hilboll <andreas@hilboll.de>
+:Date:      Mon Jan 21 19:52:07 2013
+:Website:   http://andreas-h.github.com/geodas/
+:License:   GPLv3
+:Version:   0.1
+:Copyright: (c) 2012-2013 Andreas Hilboll <andreas@hilboll.de>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+
+# Library imports
+# ============================================================================
+
+import numpy as np
+import numpy.ma as ma
+from numpy.testing import assert_equal, assert_array_equal, TestCase, \
+                          run_module_suite
+
+from geodas.core.gridded_array import empty, gridded_array
+from geodas.core.missing import ValidityMask, mask_fill_value
+from geodas.core.slicing import get_slice, select
+
+
+class TestValidityMask(TestCase):
+    def test_roundtrip(self):
+        valid = np.random.rand(5, 7, 3) > .3
+        mask = ValidityMask.from_bool(valid)
+        assert mask.nbytes == 14
+        assert_array_equal(mask.to_bool(), valid)
+        assert_equal(mask.count(), valid.sum())
+        assert_array_equal(mask[1:3, ::2].to_bool(), valid[1:3, ::2])
+
+    def test_mask_fill_value(self):
+        data, valid = mask_fill_value(np.array([1., -999., 3.]), -999.)
+        assert valid is None
+        assert_array_equal(np.isnan(data), [False, True, False])
+        data, valid = mask_fill_value(np.array([1, -999, 3]), -999)
+        assert data.dtype.kind == 'i'
+        assert_array_equal(valid.to_bool(), [True, False, True])
+        data, valid = mask_fill_value(ma.masked_equal([1., 2., 3.], 2.),
+                                      None)
+        assert not isinstance(data, ma.MaskedArray)
+        assert_array_equal(np.isnan(data), [False, True, False])
+
+
+class TestIntegerData(TestCase):
+    def setUp(self):
+        data = np.arange(24).reshape(4, 6)
+        self.valid = data % 5 != 0
+        self.gdata = gridded_array(data,
+                                   [('time', np.arange(4.)),
+                                    ('latitude', np.arange(6.))], 'int',
+                                   ValidityMask.from_bool(self.valid))
+
+    def test_filled(self):
+        res = self.gdata.filled()
+        assert res.dtype.kind == 'f'
+        assert_array_equal(np.isnan(res), ~self.valid)
+        assert_array_equal(self.gdata.filled(-1)[~self.valid], -1)
+
+    def test_reductions(self):
+        expected = np.where(self.valid, self.gdata.data, 0).sum(axis=0)
+        assert_array_equal(self.gdata.sum(axis='time').data, expected)
+        assert_array_equal(self.gdata.count(axis='time').data,
+                           self.valid.sum(axis=0))
+        res = self.gdata + 1
+        assert_array_equal(np.isnan(res.data), ~self.valid)
+
+    def test_masked(self):
+        res = self.gdata.masked().data
+        assert isinstance(res, ma.MaskedArray)
+        assert np.may_share_memory(res.data, self.gdata.data)
+        assert_array_equal(res.mask, ~self.valid)
+
+    def test_slicing(self):
+        res = get_slice(self.gdata, latitude=(1., 3.))
+        assert_array_equal(res.isvalid(), self.valid[:, 1:4])
+        res = select(self.gdata, time=lambda t: t != 1.)
+        assert_array_equal(res.isvalid(), self.valid[[0, 2, 3]])
+
+
+class TestEmpty(TestCase):
+    def test_empty(self):
+        coords = [('latitude', np.arange(3.)), ('longitude', np.arange(4.))]
+        res = empty(coords, masked=True)
+        assert not isinstance(res.data, ma.MaskedArray)
+        assert np.isnan(res.data).all()
+        res = empty(coords, dtype=int, masked=True)
+        assert not res.isvalid().any()
+        res[1] = 7
+        assert_array_equal(res.isvalid().sum(axis=1), [0, 4, 0])
+
+
+if __name__ == "__main__":
+    run_module_suite()
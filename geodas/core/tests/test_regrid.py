@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+*****************************************************************************
+geodas - Geospatial Data Analysis in Python
+*****************************************************************************
+
+:Author:    Andreas Hilboll <andreas@hilboll.de>
+:Date:      Mon Jan 21 19:52:07 2013
+:Website:   http://andreas-h.github.com/geodas/
+:License:   GPLv3
+:Version:   0.1
+:Copyright: (c) 2012-2013 Andreas Hilboll <andreas@hilboll.de>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+
+# Library imports
+# ============================================================================
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from numpy.testing import assert_allclose, assert_array_equal, TestCase, \
+                          run_module_suite
+
+import geodas
+from geodas.core import regrid
+from geodas.core.coordinate import RegularCoordinateArray
+from geodas.core.gridded_array import gridded_array
+
+
+def _grid(step, lon0=-180.):
+    lat = RegularCoordinateArray(-90. + .5 * step, step, int(180 / step),
+                                 'latitude')
+    lon = RegularCoordinateArray(lon0 + .5 * step, step, int(360 / step),
+                                 'longitude')
+    return lat, lon
+
+
+class TestConservativeRegridder(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self._config = geodas.__config__.get('cache_dir')
+        geodas.__config__['cache_dir'] = self.cache_dir
+        regrid._weights_cache.clear()
+        lat, lon = _grid(4.)
+        self.gdata = gridded_array(np.random.rand(3, lat.size, lon.size),
+                                   [('time', np.arange(3.)),
+                                    ('latitude', lat), ('longitude', lon)],
+                                   'test')
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+        if self._config is None:
+            del geodas.__config__['cache_dir']
+        else:
+            geodas.__config__['cache_dir'] = self._config
+
+    def test_conservation(self):
+        for step, lon0 in [(2., -180.), (5., 0.), (1., 0.)]:
+            lat, lon = _grid(step, lon0)
+            res = self.gdata.regrid(lat, lon)
+            assert res.coordinates.dims == ('time', 'latitude', 'longitude')
+            assert res.data.shape == (3, lat.size, lon.size)
+            assert_allclose(res.area_mean().data,
+                            self.gdata.area_mean().data, rtol=1e-10)
+
+    def test_refine(self):
+        # refining by an integer factor copies the source values
+        lat, lon = _grid(2.)
+        res = self.gdata.regrid(lat, lon)
+        assert_allclose(res.data[:, ::2, ::2], self.gdata.data)
+        assert_allclose(res.data[:, 1::2, 1::2], self.gdata.data)
+
+    def test_nan(self):
+        self.gdata.data[0, 10, 20] = np.nan
+        self.gdata.data[1] = np.nan
+        lat, lon = _grid(8.)
+        res = self.gdata.regrid(lat, lon)
+        # the target cell (5, 10) covers the source cells (10:12, 20:22)
+        wlat = np.diff(np.sin(np.deg2rad([-50., -46., -42.])))
+        weights = np.repeat(wlat[:, np.newaxis], 2, axis=1)
+        values = self.gdata.data[0, 10:12, 20:22]
+        valid = ~np.isnan(values)
+        expected = ((weights * np.where(valid, values, 0.)).sum() /
+                    (weights * valid).sum())
+        assert_allclose(res.data[0, 5, 10], expected)
+        assert np.isnan(res.data[1]).all()
+        assert not np.isnan(res.data[2]).any()
+
+    def test_source_grid(self):
+        lat, lon = _grid(4.)
+        dst_lat, dst_lon = _grid(8.)
+        regridder = regrid.ConservativeRegridder(lat, lon, dst_lat, dst_lon)
+        assert regridder(self.gdata).data.shape == (3, dst_lat.size,
+                                                    dst_lon.size)
+        # same shape, but shifted by half a cell
+        lat, lon = _grid(4., -178.)
+        shifted = gridded_array(self.gdata.data,
+                                [('time', np.arange(3.)),
+                                 ('latitude', lat), ('longitude', lon)])
+        self.assertRaises(ValueError, regridder, shifted)
+
+    def test_array_coordinates(self):
+        # regular coordinates given as arrays, with rounding errors
+        lat = np.arange(-87.5, 90., 5.)
+        lon = np.arange(-179.95, 180., .1)
+        gdata = gridded_array(np.random.rand(lat.size, lon.size),
+                              [('latitude', lat), ('longitude', lon)])
+        dst_lat, dst_lon = _grid(10.)
+        regridder = regrid.ConservativeRegridder(lat, lon, dst_lat, dst_lon,
+                                                 cache=False)
+        res = regridder(gdata)
+        assert res.data.shape == (dst_lat.size, dst_lon.size)
+
+    def test_cache(self):
+        lat, lon = _grid(2.)
+        res = self.gdata.regrid(lat, lon)
+        files = os.listdir(self.cache_dir)
+        assert len(files) == 1 and files[0].startswith('regrid-')
+        regrid._weights_cache.clear()
+        assert_array_equal(self.gdata.regrid(lat, lon).data, res.data)
+
+
+if __name__ == "__main__":
+    run_module_suite()
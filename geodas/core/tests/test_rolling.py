@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+*****************************************************************************
+geodas - Geospatial Data Analysis in Python
+*****************************************************************************
+
+:Author:    Andreas Hilboll <andreas@hilboll.de>
+:Date:      Mon Jan 21 19:52:07 2013
+:Website:   http://andreas-h.github.com/geodas/
+:License:   GPLv3
+:Version:   0.1
+:Copyright: (c) 2012-2013 Andreas Hilboll <andreas@hilboll.de>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+
+# Library imports
+# ============================================================================
+
+
+import warnings
+
+import numpy as np
+import pandas as pd
+from numpy.testing import assert_allclose, assert_array_equal, TestCase, \
+                          run_module_suite
+
+from geodas.core.coordinate import DatetimeCoordinate
+from geodas.core.gridded_array import gridded_array
+from geodas.core.rolling import RollingStream
+
+
+def _rolling_loop(data, window, func, center=False, min_count=None):
+    """Moving window statistic along the first axis of ``data``"""
+    if min_count is None:
+        min_count = window
+    shift = (window - 1) // 2 if center else 0
+    res = np.full(data.shape, np.nan)
+    for i in range(data.shape[0]):
+        end = i + shift + 1
+        block = data[max(end - window, 0):end]
+        valid = np.sum(~np.isnan(block), axis=0)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            res[i] = np.where(valid >= min_count, func(block, axis=0),
+                              np.nan)
+    return res
+
+
+class TestRolling(TestCase):
+    def setUp(self):
+        rs = np.random.RandomState(2)
+        data = rs.randn(40, 3, 4)
+        data[rs.rand(*data.shape) < .2] = np.nan
+        times = DatetimeCoordinate(np.arange('2000-01-01', '2000-02-10',
+                                             dtype='M8[D]'), 'time')
+        self.gdata = gridded_array(data, [('time', times),
+                                          ('latitude', np.arange(3.)),
+                                          ('longitude', np.arange(4.))])
+
+    def test_statistics(self):
+        for how, func in [('mean', np.nanmean), ('sum', np.nansum),
+                          ('std', np.nanstd), ('var', np.nanvar),
+                          ('min', np.nanmin), ('max', np.nanmax),
+                          ('median', np.nanmedian)]:
+            for window, center, min_count in [(5, False, None),
+                                              (5, True, 3),
+                                              (6, True, 1),
+                                              (45, True, 1),
+                                              (1, False, None)]:
+                res = getattr(self.gdata.rolling(time=window, center=center,
+                                                 min_count=min_count),
+                              how)()
+                exp = _rolling_loop(self.gdata.data, window, func, center,
+                                    min_count)
+                assert_allclose(res.data, exp, atol=1e-7, err_msg=how)
+                self.assertTrue(res.coordinates.equals(
+                                                   self.gdata.coordinates))
+
+    def test_pandas(self):
+        data = np.arange(10.)
+        gdata = gridded_array(data, [('time', np.arange(10.))])
+        res = gdata.rolling(time=4, center=True, min_count=1).sum()
+        assert_array_equal(res.data, [1., 3., 6., 10., 14., 18., 22., 26.,
+                                      30., 24.])
+        frame = pd.DataFrame(self.gdata.data.reshape(40, -1))
+        for window, center, min_count in [(4, True, 1), (5, True, 2),
+                                          (8, True, 3), (6, False, 2)]:
+            res = self.gdata.rolling(time=window, center=center,
+                                     min_count=min_count).mean()
+            exp = frame.rolling(window, min_periods=min_count,
+                                center=center).mean().values
+            assert_allclose(res.data.reshape(40, -1), exp, atol=1e-7)
+
+    def test_other_axis(self):
+        res = self.gdata.rolling(longitude=3, min_count=1).mean()
+        exp = _rolling_loop(np.moveaxis(self.gdata.data, 2, 0), 3,
+                            np.nanmean, min_count=1)
+        assert_allclose(res.data, np.moveaxis(exp, 0, 2))
+
+    def test_errors(self):
+        self.assertRaises(ValueError, self.gdata.rolling, depth=3)
+        self.assertRaises(ValueError, self.gdata.rolling, time=0)
+        self.assertRaises(ValueError, self.gdata.rolling, time=3,
+                          min_count=4)
+        self.assertRaises(ValueError, self.gdata.rolling, time=3,
+                          latitude=2)
+
+
+class TestRollingStream(TestCase):
+    def setUp(self):
+        rs = np.random.RandomState(3)
+        data = rs.randn(3, 50)
+        data[rs.rand(*data.shape) < .2] = np.nan
+        self.gdata = gridded_array(data, [('latitude', np.arange(3.)),
+                                          ('time', np.arange(50.))])
+
+    def _block(self, start, stop):
+        return gridded_array(self.gdata.data[:, start:stop],
+                             [('latitude', np.arange(3.)),
+                              ('time', np.arange(start, stop, 1.))])
+
+    def _stream(self, bounds, **kwargs):
+        stream = RollingStream('time', **kwargs)
+        parts = [stream.add(self._block(a, b))
+                 for a, b in zip(bounds[:-1], bounds[1:])]
+        parts.append(stream.flush())
+        parts = [p for p in parts if p is not None]
+        data = np.concatenate([p.data for p in parts], axis=1)
+        times = np.concatenate([p.coordinates['time'] for p in parts])
+        return data, times
+
+    def test_blocks(self):
+        for kwargs in [dict(window=7), dict(window=7, center=True),
+                       dict(window=8, how='median', center=True,
+                            min_count=2),
+                       dict(window=12, how='std', min_count=3, ddof=1)]:
+            exp = self.gdata.rolling(time=kwargs['window'],
+                                     center=kwargs.get('center', False),
+                                     min_count=kwargs.get('min_count'))
+            exp = getattr(exp, kwargs.get('how', 'mean'))(
+                                            **({'ddof': 1} if 'ddof' in
+                                               kwargs else {}))
+            for bounds in [[0, 50], [0, 10, 20, 30, 40, 50],
+                           [0, 1, 2, 5, 6, 30, 50]]:
+                data, times = self._stream(bounds, **kwargs)
+                assert_allclose(data, exp.data, atol=1e-7)
+                assert_array_equal(times, np.arange(50.))
+
+    def test_mismatch(self):
+        stream = RollingStream('time', 5)
+        stream.add(self._block(0, 10))
+        other = gridded_array(self.gdata.data[:2, 10:20],
+                              [('latitude', np.arange(2.)),
+                               ('time', np.arange(10., 20.))])
+        self.assertRaises(ValueError, stream.add, other)
+
+
+if __name__ == "__main__":
+    run_module_suite()
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+*****************************************************************************
+geodas - Geospatial Data Analysis in Python
+*****************************************************************************
+
+:Author:    Andreas Hilboll <andreas@hilboll.de>
+:Date:      Mon Jan 21 19:52:07 2013
+:Website:   http://andreas-h.github.com/geodas/
+:License:   GPLv3
+:Version:   0.1
+:Copyright: (c) 2012-2013 Andreas Hilboll <andreas@hilboll.de>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+
+# Library imports
+# ============================================================================
+
+import gc
+import multiprocessing
+import os
+import pickle
+
+import numpy as np
+from numpy.testing import assert_array_equal, TestCase, run_module_suite
+
+from geodas.core.gridded_array import gridded_array, release_shared, \
+                                      shared_empty
+from geodas.core.slicing import get_slice
+
+
+def _fill_row(args):
+    gdata, i = args
+    gdata[i] = i
+
+
+def _row_sum(gdata, i):
+    return float(gdata.data[i].sum())
+
+
+class TestSharedEmpty(TestCase):
+    def setUp(self):
+        self.coords = [('time', np.arange(8.)),
+                       ('latitude', np.arange(100.)),
+                       ('longitude', np.arange(200.))]
+
+    def test_pickle_handle(self):
+        gdata = shared_empty(self.coords)
+        gdata[...] = np.random.rand(8, 100, 200)
+        s = pickle.dumps(gdata, 2)
+        assert len(s) < gdata.data.nbytes // 10
+        res = pickle.loads(s)
+        assert_array_equal(res.data, gdata.data)
+        res[0] = -1.
+        assert_array_equal(gdata.data[0], -1.)
+        # views are transferred as views on the shared memory
+        sl = get_slice(gdata, latitude=(10., 19.))
+        res = pickle.loads(pickle.dumps(sl, 2))
+        assert_array_equal(res.data, gdata.data[:, 10:20])
+        res[0] = -2.
+        assert_array_equal(gdata.data[0, 10:20], -2.)
+
+    def test_never_detached(self):
+        gdata = shared_empty(self.coords)
+        buf = gdata._shm
+        sl = get_slice(gdata, latitude=(10., 19.))
+        copied = gdata.copy()
+        # writes to the parent and to its slices stay in shared memory
+        gdata[...] = 1.
+        assert gdata._shm is buf
+        sl[...] = 2.
+        assert sl._shm is buf
+        assert_array_equal(gdata.data[:, 10:20], 2.)
+        res = pickle.loads(pickle.dumps(gdata, 2))
+        assert_array_equal(res.data[:, 10:20], 2.)
+        # explicit copies are ordinary arrays
+        assert copied._shm is None
+
+    def test_pool(self):
+        gdata = shared_empty(self.coords)
+        pool = multiprocessing.Pool(2)
+        try:
+            pool.map(_fill_row, [(gdata, i) for i in range(8)])
+        finally:
+            pool.close()
+            pool.join()
+        assert_array_equal(gdata.data[:, 0, 0], np.arange(8.))
+
+    def test_release(self):
+        gdata = shared_empty(self.coords)
+        name = gdata._shm.name
+        assert os.path.exists(name)
+        sl = get_slice(gdata, latitude=(10., 19.))
+        release_shared(sl)
+        assert not os.path.exists(name)
+        # the mapped memory stays usable
+        gdata[...] = 1.
+        assert_array_equal(sl.data, 1.)
+        release_shared(gdata)
+
+    def test_handle_outlives_array(self):
+        gdata = shared_empty(self.coords)
+        gdata[...] = 1.
+        name = gdata._shm.name
+        s = pickle.dumps(gdata, 2)
+        pool = multiprocessing.Pool(1)
+        try:
+            task = pool.apply_async(_row_sum, (gdata, 3))
+            del gdata
+            gc.collect()
+            res = pickle.loads(s)
+            assert_array_equal(res.data, 1.)
+            assert task.get(timeout=60) == 100. * 200.
+        finally:
+            pool.close()
+            pool.join()
+        release_shared(res)
+        assert not os.path.exists(name)
+
+    def test_plain_pickle(self):
+        gdata = gridded_array(np.arange(6.), [('time', np.arange(6.))])
+        res = pickle.loads(pickle.dumps(gdata, 2))
+        assert_array_equal(res.data, gdata.data)
+
+
+if __name__ == "__main__":
+    run_module_suite()
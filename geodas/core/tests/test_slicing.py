@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+*****************************************************************************
+geodas - Geospatial Data Analysis in Python
+*****************************************************************************
+
+:Author:    Andreas Hilboll <andreas@hilboll.de>
+:Date:      Mon Jan 21 19:52:07 2013
+:Website:   http://andreas-h.github.com/geodas/
+:License:   GPLv3
+:Version:   0.1
+:Copyright: (c) 2012-2013 Andreas Hilboll <andreas@hilboll.de>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+
+# Library imports
+# ============================================================================
+
+import bottleneck as bn
+import numpy as np
+import pandas as pd
+from numpy.testing import assert_equal, assert_almost_equal, \
+                          assert_array_equal, assert_array_almost_equal, \
+                          assert_allclose, TestCase, run_module_suite
+
+from geodas.core.coordinate import DatetimeCoordinate
+from geodas.core.gridded_array import gridded_array
+from geodas.core.groupby import group_labels, group_reduce
+from geodas.core.slicing import get_coordinate_masks, resample, select
+
+
+def _make_data(ntime=800, freq='D'):
+    times = pd.date_range('1999-11-15', periods=ntime, freq=freq)
+    coords = [('latitude', np.arange(-87.5, 90., 5.)),
+              ('time', DatetimeCoordinate(times.values)),
+              ('longitude', np.arange(-177.5, 180., 5.))]
+    data = np.random.rand(36, ntime, 72)
+    return gridded_array(data, coords, 'test'), times
+
+
+class TestSelect(TestCase):
+    def setUp(self):
+        self.gdata, self.times = _make_data()
+
+    def test_season(self):
+        res = select(self.gdata, time="JJA")
+        idx = np.array([t.month in [6, 7, 8] for t in self.times])
+        assert_array_equal(res.data, self.gdata.data[:, idx])
+        assert_array_equal(res.coordinates['time'].values,
+                           self.times.values[idx])
+        res2 = select(self.gdata, month=[6, 7, 8])
+        assert_array_equal(res2.data, res.data)
+        res3 = select(self.gdata, season='JJA')
+        assert_array_equal(res3.data, res.data)
+
+    def test_lambda(self):
+        res = select(self.gdata, time=lambda t: t.month == 1)
+        res2 = select(self.gdata, time=lambda t: t.month in [1])
+        idx = np.array([t.month == 1 for t in self.times])
+        assert_array_equal(res.data, self.gdata.data[:, idx])
+        assert_array_equal(res2.data, res.data)
+
+    def test_multiple_axes(self):
+        res = select(self.gdata, year=slice(2000, 2000), day=1,
+                     latitude=(-30., 30.), longitude=[-2.5, 2.5, 92.5])
+        tidx = np.array([t.year == 2000 and t.day == 1 for t in self.times])
+        lats = self.gdata.coordinates['latitude']
+        lidx = (lats >= -30.) & (lats <= 30.)
+        expected = self.gdata.data[lidx][:, tidx][:, :, [35, 36, 54]]
+        assert_array_equal(res.data, expected)
+        assert res.data.shape == (12, 12, 3)
+        assert res.coordinates.shape == res.data.shape
+
+    def test_masks(self):
+        masks = get_coordinate_masks(self.gdata.coordinates, month=12,
+                                     time=('2000-01-01', None))
+        assert list(masks.keys()) == ['time']
+        expected = [t.month == 12 and t.year >= 2000 for t in self.times]
+        assert_array_equal(masks['time'], expected)
+        self.assertRaises(ValueError, get_coordinate_masks,
+                          self.gdata.coordinates, level=1)
+
+
+def _resample_reference(gdata, rule):
+    """The straightforward loop over all periods"""
+    freq = {'monthly' : 'M', 'annual' : 'A', 'seasonal' : 'Q-NOV'}[rule]
+    times = pd.DatetimeIndex(gdata.coordinates['time'].values)
+    periods = pd.period_range(times.min(), times.max(), freq=freq)
+    axis = gdata.coordinates.axis('time')
+    data = np.rollaxis(gdata.data, axis)
+    out = np.empty((periods.size, ) + data.shape[1:])
+    for i, p in enumerate(periods):
+        idx = np.array([t.to_period(freq) == p for t in times])
+        out[i] = bn.nanmean(data[idx], axis=0)
+    return periods.to_timestamp(how='start').values, \
+           np.rollaxis(out, 0, axis + 1)
+
+
+class TestResample(TestCase):
+    def setUp(self):
+        self.gdata, self.times = _make_data(1200, '11H')
+        self.gdata.data[self.gdata.data < .1] = np.nan
+        # a gap of several months
+        idx = (self.times.month < 3) | (self.times.month > 7)
+        self.gdata = select(self.gdata, time=idx)
+        self.gdata.data[:, self.gdata.coordinates['time'].month == 9] = \
+                                                                     np.nan
+
+    def test_reference(self):
+        for rule in ['monthly', 'annual', 'seasonal']:
+            res = resample(self.gdata, time=rule)
+            times, data = _resample_reference(self.gdata, rule)
+            assert_array_equal(res.coordinates['time'].values, times)
+            assert_allclose(res.data, data, rtol=1e-12)
+            assert res.coordinates.shape == res.data.shape
+
+    def test_statistics(self):
+        hows = ['mean', 'min', 'max', 'std', 'count', 'sum']
+        res = resample(self.gdata, how=hows, time='monthly')
+        assert len(res) == len(hows)
+        times = pd.DatetimeIndex(self.gdata.coordinates['time'].values)
+        month = self.gdata.data[:, (times.year == 2000) & (times.month == 2)]
+        expected = [bn.nanmean(month, axis=1), bn.nanmin(month, axis=1),
+                    bn.nanmax(month, axis=1), bn.nanstd(month, axis=1),
+                    (~np.isnan(month)).sum(axis=1), bn.nansum(month, axis=1)]
+        for r, e in zip(res, expected):
+            assert_allclose(r.data[:, 3], e, rtol=1e-10)
+        # September only contains missing values
+        assert np.isnan(res[0].data[:, 10]).all()
+        assert np.isnan(res[1].data[:, 10]).all()
+        assert (res[4].data[:, 10] == 0).all()
+        stacked = resample(self.gdata, how=hows, stack=True, time='monthly')
+        assert stacked.coordinates.dims[0] == 'statistic'
+        assert_array_equal(stacked.data[2], res[2].data)
+
+    def test_variance_large_mean(self):
+        # temperatures in K with small variations: sum of squares minus
+        # squared mean would lose almost all significant digits
+        data = 1e6 + np.random.RandomState(0).randn(2, 1000) * 1e-3
+        labels = np.repeat(np.arange(4), 250)
+        res = group_reduce(data, labels, 4, axis=1, how='var')
+        expected = np.var(data.reshape(2, 4, 250), axis=2)
+        assert_allclose(res, expected, rtol=1e-6)
+
+    def test_seasons(self):
+        labels, periods = group_labels(self.times, 'seasonal')
+        assert str(periods[0])[:10] == '1999-09-01'
+        assert str(periods[1])[:10] == '1999-12-01'
+        assert_array_equal(labels[self.times.month == 12][:5], 1)
+        assert_array_equal(labels[(self.times.year == 2000) &
+                                  (self.times.month == 2)], 1)
+
+    def test_pentad(self):
+        times = pd.date_range('2003-12-20', '2005-01-10', freq='D')
+        labels, periods = group_labels(times, 'pentad')
+        counts = np.bincount(labels)
+        # the leap day is part of the 12th pentad of 2004
+        assert counts[14] == 6
+        assert_array_equal(np.delete(counts, [0, 14]), 5)
+        assert_array_equal(periods[labels] <= times.values, True)
+        assert str(periods[labels[times == '2004-03-01'][0]])[:10] == \
+                                                                '2004-02-25'
+        assert str(periods[labels[times == '2004-03-02'][0]])[:10] == \
+                                                                '2004-03-02'
+
+
+if __name__ == "__main__":
+    run_module_suite()
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+*****************************************************************************
+geodas - Geospatial Data Analysis in Python
+*****************************************************************************
+
+:Author:    Andreas Hilboll <andreas@hilboll.de>
+:Date:      Mon Jan 21 19:52:07 2013
+:Website:   http://andreas-h.github.com/geodas/
+:License:   GPLv3
+:Version:   0.1
+:Copyright: (c) 2012-2013 Andreas Hilboll <andreas@hilboll.de>
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+
+# Library imports
+# ============================================================================
+
+
+import warnings
+
+import numpy as np
+from numpy.testing import assert_allclose, assert_array_equal, TestCase, \
+                          run_module_suite
+
+from geodas.core import parallel
+from geodas.core.coordinate import RegularCoordinateArray
+from geodas.core.gridded_array import gridded_array
+
+
+def _boxcar_loop(data, half, periodic):
+    """Running NaN-mean over ``(2 * half + 1) ** 2`` cells of the last two
+    axes"""
+    ny, nx = data.shape[-2:]
+    res = np.empty(data.shape)
+    for j in range(ny):
+        rows = np.arange(max(j - half, 0), min(j + half + 1, ny))
+        for i in range(nx):
+            cols = np.arange(i - half, i + half + 1)
+            if periodic:
+                cols %= nx
+            else:
+                cols = cols[(cols >= 0) & (cols < nx)]
+            block = data[..., rows[:, None], cols[None, :]]
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                res[..., j, i] = np.nanmean(block.reshape(
+                                            data.shape[:-2] + (-1, )), -1)
+    return res
+
+
+class TestSmoothing(TestCase):
+    def setUp(self):
+        rs = np.random.RandomState(4)
+        data = rs.randn(3, 18, 36)
+        data[rs.rand(*data.shape) < .3] = np.nan
+        data[0, :4, :4] = np.nan
+        self.lat = RegularCoordinateArray(-85., 10., 18, 'latitude')
+        self.lon = RegularCoordinateArray(-175., 10., 36, 'longitude')
+        self.gdata = gridded_array(data, [('time', np.arange(3.)),
+                                          ('latitude', self.lat),
+                                          ('longitude', self.lon)])
+        self._max_tile_size = parallel._max_tile_size
+
+    def tearDown(self):
+        parallel._max_tile_size = self._max_tile_size
+
+    def test_boxcar_global(self):
+        res = self.gdata.smooth('boxcar', latitude=5, longitude=5)
+        assert_allclose(res.data, _boxcar_loop(self.gdata.data, 2, True))
+        self.assertTrue(res.coordinates.equals(self.gdata.coordinates))
+
+    def test_boxcar_regional(self):
+        gdata = gridded_array(self.gdata.data[:, :, :20],
+                              [('time', np.arange(3.)),
+                               ('latitude', self.lat),
+                               ('longitude', self.lon[:20])])
+        res = gdata.smooth('boxcar', latitude=3, longitude=3)
+        assert_allclose(res.data, _boxcar_loop(gdata.data, 1, False))
+
+    def test_gaussian(self):
+        from scipy.ndimage import gaussian_filter
+        data = np.random.RandomState(5).rand(18, 36)
+        gdata = gridded_array(data, [('latitude', self.lat),
+                                     ('longitude', self.lon)])
+        res = gdata.smooth(latitude=1.5, longitude=2.)
+        exp = gaussian_filter(data, (1.5, 2.), mode='wrap')
+        # away from the poles, only the wrapping along longitude matters
+        assert_allclose(res.data[6:-6], exp[6:-6])
+
+    def test_tiles(self):
+        exp = self.gdata.smooth(latitude=2., longitude=1.).data
+        # all dimensions filtered: the tiles overlap along latitude
+        exp_all = self.gdata.smooth(time=1., latitude=2., longitude=1.).data
+        parallel._max_tile_size = 100
+        for nthreads in (1, 3):
+            res = self.gdata.smooth(latitude=2., longitude=1.,
+                                    nthreads=nthreads)
+            assert_allclose(res.data, exp)
+            res = self.gdata.smooth(time=1., latitude=2., longitude=1.,
+                                    nthreads=nthreads)
+            assert_allclose(res.data, exp_all)
+
+    def test_keep_nan(self):
+        res = self.gdata.smooth('boxcar', keep_nan=True, latitude=3)
+        assert_array_equal(np.isnan(res.data), np.isnan(self.gdata.data))
+        res = self.gdata.smooth('boxcar', latitude=3)
+        self.assertTrue(np.isnan(res.data).sum() <
+                        np.isnan(self.gdata.data).sum())
+
+    def test_errors(self):
+        self.assertRaises(ValueError, self.gdata.smooth, 'median',
+                          latitude=3)
+        self.assertRaises(ValueError, self.gdata.smooth, 'boxcar',
+                          latitude=4)
+        self.assertRaises(ValueError, self.gdata.smooth, depth=1.)
+        self.assertRaises(ValueError, self.gdata.smooth, latitude=0.)
+
+
+if __name__ == "__main__":
+    run_module_suite()
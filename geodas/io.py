@@ -37,7 +37,11 @@ import numpy as np
 import pandas as pd
 
 import geodas
+from geodas.core.coordinate import CoordinateSet, DatetimeCoordinate, \
+                                   RegularCoordinateArray, as_coordinate
+from geodas.core.curvilinear import CurvilinearGrid
 from geodas.core.gridded_array import gridded_array
+from geodas.core.missing import mask_fill_value
 from geodas.core.slicing import get_coordinate_slices
 
 
@@ -97,6 +101,47 @@ def _guess_netcdf_dimensions(_file):
     return dimvars
 
 
+def _netcdf_auxiliary_names(_file):
+    """get the names of all variables which are named in the
+    ``coordinates`` attribute of a variable in ``_file``"""
+    names = set()
+    for var in _file.variables.values():
+        if 'coordinates' in var.ncattrs():
+            names.update(var.getncattr('coordinates').split())
+    return names
+
+
+def _netcdf_grid(_file, datavar, coord_names):
+    """get the ``CurvilinearGrid`` of ``datavar`` from the 2d latitude and
+    longitude variables named in its ``coordinates`` attribute, or ``None``
+    if there are none"""
+    if 'coordinates' not in datavar.ncattrs():
+        return None
+    latlon = {}
+    for var in datavar.getncattr('coordinates').split():
+        if var not in _file.variables:
+            continue
+        _var = _file.variables[var]
+        if len(_var.dimensions) != 2:
+            continue
+        stdname = (_var.getncattr('standard_name')
+                   if 'standard_name' in _var.ncattrs() else var.lower())
+        if stdname in ['lat', 'latitude', ]:
+            latlon['latitude'] = _var
+        elif stdname in ['lon', 'longitude', ]:
+            latlon['longitude'] = _var
+    if (len(latlon) != 2 or latlon['latitude'].dimensions !=
+                            latlon['longitude'].dimensions):
+        return None
+    dims = [coord_names.get(d) for d in latlon['latitude'].dimensions]
+    if None in dims:
+        return None
+    return CurvilinearGrid(
+                   np.ma.filled(latlon['latitude'][:].astype(float), np.nan),
+                   np.ma.filled(latlon['longitude'][:].astype(float), np.nan),
+                   dims)
+
+
 def read_netcdf4(filename, name=None, coords_only=False, **kwargs):
     """Read a ``gridded_array`` object from a netCDF file
 
@@ -128,6 +173,11 @@ def read_netcdf4(filename, name=None, coords_only=False, **kwargs):
 
            Passing ``None`` as upper and/or lower bound is not supported yet
 
+        If the data variable is on a curvilinear grid, i.e., its
+        ``coordinates`` attribute names two-dimensional latitude and
+        longitude variables, *latitude* and *longitude* ranges select the
+        part of the grid containing all grid points within these ranges.
+
     Returns
     -------
     out : gridded_array
@@ -135,7 +185,8 @@ def read_netcdf4(filename, name=None, coords_only=False, **kwargs):
     Notes
     -----
     This function can only read files where no two 1-dimensional variables
-    share the same dimension.
+    share the same dimension. Dimensions without a coordinate variable are
+    numbered.
 
     .. todo:: Implement climatologies according to CF-conventions
 
@@ -158,6 +209,10 @@ def read_netcdf4(filename, name=None, coords_only=False, **kwargs):
         for varname in ['climatology_bounds', 'crs', ]:
             if varname in datavars:
                 datavars.pop(datavars.index(varname))
+        # as well as auxiliary coordinates like 2d latitudes and longitudes
+        for varname in _netcdf_auxiliary_names(_file):
+            if varname in datavars:
+                datavars.pop(datavars.index(varname))
         if len(datavars) > 1:
             raise AttributeError("There is more than one non-coordinate "
                                  "variable in the file, and you didn't "
@@ -177,12 +232,17 @@ def read_netcdf4(filename, name=None, coords_only=False, **kwargs):
         datavar = groups_tmp[-1].variables[grouppath[-1]]
     # Read coordinates
     coord_shortnames = datavar.dimensions   # the name of the nc-dimension
-    coord_stdnames = [dimensions[dim][1] for dim in coord_shortnames]
+    coord_stdnames = [dimensions[dim][1] if dim in dimensions else dim
+                      for dim in coord_shortnames]
     #coord_stdnames = [s for (n, s) in dimensions.values()]   # nc-std-names
     coord_names = {k : str(v) for (k, v) in zip(coord_shortnames,  # our names
                                                 coord_stdnames)}
-    coordinates = OrderedDict()
-    for var in coord_shortnames:
+    coordinates = CoordinateSet()
+    for i, var in enumerate(coord_shortnames):
+        if var not in dimensions:
+            coordinates[coord_names[var]] = RegularCoordinateArray(
+                                        0, 1, datavar.shape[i], var)
+            continue
         coordinates[coord_names[var]] = _file.variables[dimensions[var][0]][:]
         if coord_names[var] in ['time', 'date', 'datetime']:   # TODO
             _calendar = (_file.variables[var].getncattr('calendar')
@@ -193,12 +253,24 @@ def read_netcdf4(filename, name=None, coords_only=False, **kwargs):
                                       _file.variables[var].getncattr('units'),
                                       _calendar)
             tmpdates = np.array([np.datetime64(tmpdates[i]) for i in range(tmpdates.size)])
-            coordinates[coord_names[var]] = tmpdates
+            coordinates[coord_names[var]] = DatetimeCoordinate(
+                                    tmpdates, coord_names[var],
+                                    _file.variables[var].getncattr('units'))
+        else:
+            _coordvar = _file.variables[dimensions[var][0]]
+            _units = (_coordvar.getncattr('units')
+                      if 'units' in _coordvar.ncattrs() else None)
+            coordinates[coord_names[var]] = as_coordinate(
+                                 coordinates[coord_names[var]],
+                                 coord_names[var], _units)
+    grid = _netcdf_grid(_file, datavar, coord_names)
     # coordinate slicing
-    slices = get_coordinate_slices(coordinates, kwargs)
+    slices = get_coordinate_slices(coordinates, kwargs, grid)
     # slice the coordinate arrays themselves
     for i, c in enumerate(list(coordinates.keys())):
         coordinates[c] = coordinates[c][slices[i]]
+    if grid is not None:
+        grid = grid.take(dict(zip(coordinates.keys(), slices)))
     if coords_only:
         return coordinates
     # read requested slice from disk
@@ -208,12 +280,11 @@ def read_netcdf4(filename, name=None, coords_only=False, **kwargs):
         _fill = datavar.getncattr('_FillValue')
     except:
         _fill = None
-    if _fill is not None and not np.isnan(_fill):
-        data = np.where(data != _fill, data, np.nan)
+    data, valid = mask_fill_value(data, _fill)
     dataname = (datavar.standard_name if 'standard_name'
                                       in datavar.ncattrs()
                                       else name)
-    out = gridded_array(data, coordinates, dataname)
+    out = gridded_array(data, coordinates, dataname, valid, grid)
     _file.close()
     del data
     return out
@@ -305,7 +376,7 @@ def read_hdf5(filename, name=None, coords_only=False, **kwargs):
     _dsgroup = _ds._v_parent._v_pathname
     coord_names = _ds.attrs.COORDINATES
     def _read_coords_from_group(grp, coord_names):
-        coordinates = OrderedDict()
+        coordinates = CoordinateSet()
         for c in coord_names:
             coordinates[c] = _fd.getNode("%s/%s" % (grp, c))[:]
             if c in ["time", "date", "datetime", ]:
@@ -318,6 +389,9 @@ def read_hdf5(filename, name=None, coords_only=False, **kwargs):
                     ts = [datetime.datetime.fromtimestamp(coordinates[c][i],
                             tz=pytz.utc) for i in range(coordinates[c].size)]
                     coordinates[c] = np.datetime64(ts, "us")
+                coordinates[c] = DatetimeCoordinate(coordinates[c], c)
+            else:
+                coordinates[c] = as_coordinate(coordinates[c], c)
         return coordinates
     for grp_ in ["", "/coordinates", _dsgroup]:
         try:
@@ -400,13 +474,13 @@ def read_gdal(filename, band=1, coords_only=False, **kwargs):
     minlon, lonstep, tmp0, maxlat, tmp1, latstep = _geo
     nlon = _file.RasterXSize
     nlat = _file.RasterYSize
-    coordinates = OrderedDict()
-    coordinates['longitude'] = np.linspace(minlon + .5 * lonstep,
-                                           minlon + (nlon - .5) * lonstep,
-                                           nlon)
-    coordinates['latitude'] = np.linspace(maxlat + .5 * latstep,
-                                          maxlat + (nlat - .5) * latstep,
-                                          nlat)
+    coordinates = CoordinateSet()
+    coordinates['longitude'] = RegularCoordinateArray(
+                                        minlon + .5 * lonstep, lonstep, nlon,
+                                        'longitude', 'degrees_east')
+    coordinates['latitude'] = RegularCoordinateArray(
+                                        maxlat + .5 * latstep, latstep, nlat,
+                                        'latitude', 'degrees_north')
     # coordinate slicing
     slices = get_coordinate_slices(coordinates, kwargs)
     # slice the coordinate arrays themselves
@@ -418,15 +492,16 @@ def read_gdal(filename, band=1, coords_only=False, **kwargs):
     band = _file.GetRasterBand(band)
     data = band.ReadAsArray()
     fill = band.GetNoDataValue()
-    if fill is not None and not np.isnan(fill):
-        data = np.where(data != fill, data, np.nan)
+    data, valid = mask_fill_value(data, fill)
     # TODO: check if data and lats need to be reordered
     #if np.diff(lats).max() < 0.:
     #    lats = lats[::-1]
     #    data = data[::-1]
     # read requested slice from disk
     data = data[slices]
-    out = gridded_array(data, coordinates, "")
+    if valid is not None:
+        valid = valid[slices]
+    out = gridded_array(data, coordinates, "", valid)
     return out
 
 
@@ -459,9 +534,10 @@ def read_hdf4(filename, name=None, coords_only=False, **kwargs):
     # open the coordinate variables
     dims = sds.dimensions(full=True)
     dimorder = {dims[k][1] : k for k in list(dims.keys())}
-    coordinates = OrderedDict()
+    coordinates = CoordinateSet()
     for d in range(len(dimorder)):
-        coordinates[dimorder[d]] = _file.select(dimorder[d])[:]
+        coordinates[dimorder[d]] = as_coordinate(
+                                  _file.select(dimorder[d])[:], dimorder[d])
     # coordinate slicing
     slices = get_coordinate_slices(coordinates, kwargs)
     # slice the coordinate arrays themselves
@@ -471,9 +547,6 @@ def read_hdf4(filename, name=None, coords_only=False, **kwargs):
         return coordinates
     # read requested slice from disk
     data = sds[slices]
-    fill = sds.getfillvalue()
-    if fill is not None and not np.isnan(fill):
-        data = np.where(data != fill, data, np.nan)
     # make sure latitudes go from S to N
     if coordinates['latitude'][0] > coordinates['latitude'][-1]:
         coordinates['latitude'] = coordinates['latitude'][::-1]
@@ -487,7 +560,9 @@ def read_hdf4(filename, name=None, coords_only=False, **kwargs):
                     raise ValueError("flipping data array for ascending "
                             "coordinates only works with 2d arrays!")
                 continue
-    out = gridded_array(data, coordinates, name)
+    fill = sds.getfillvalue()
+    data, valid = mask_fill_value(data, fill)
+    out = gridded_array(data, coordinates, name, valid)
     _file.end()
     return out
 
@@ -618,12 +693,10 @@ def write_netcdf(data, filename, metadata={}, fillvalue=np.nan,
         _dtype = dim.dtype if not _is_datetime_coordinate(key) else "f8"
         _v = _f.createVariable(key, _dtype, (key, ))
         _v.standard_name = key
-        try:
-            _v.units = dim.units
-        except AttributeError:
-            _v.units = _guess_units(key)
+        _units = getattr(dim, 'units', None)
+        _v.units = _units if _units is not None else _guess_units(key)
         if not _is_datetime_coordinate(key):
-            _v[:] = dim[:]
+            _v[:] = np.asarray(dim)
         else:
             _v.calendar = "gregorian"
             _v[:] = netCDF4.date2num(dim.to_datetime().to_pydatetime(),
@@ -638,7 +711,7 @@ def write_netcdf(data, filename, metadata={}, fillvalue=np.nan,
                               least_significant_digit=least_significant_digit)
     datavar.standard_name = varname
     datavar.units = varunits
-    datavar[:] = data.data
+    datavar[:] = data.data if data.valid is None else data.masked().data
 
     # Add metadata
     _f.Conventions = "CF-1.6"
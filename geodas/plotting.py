@@ -47,15 +47,19 @@ def pcolormesh(gdata, cbar=True, vmin=None, vmax=None, cmap=None,
         plt.figure()
         ax = plt.gca()
     if not vmin:
-        vmin = np.nanmin(gdata.data)
+        vmin = np.nanmin(gdata.filled())
     if not vmax:
-        vmax = np.nanmax(gdata.data)
+        vmax = np.nanmax(gdata.filled())
     if not cmap:
         cmap = mpl.cm.get_cmap('jet', ncolors)
     elif isinstance(cmap, str):
         cmap = mpl.cm.get_cmap(cmap, ncolors)
-    lons = gdata.coordinates['longitude']
-    lats = gdata.coordinates['latitude']
+    if gdata.grid is not None and 'longitude' not in gdata.coordinates:
+        lons = gdata.grid.longitude
+        lats = gdata.grid.latitude
+    else:
+        lons = gdata.coordinates['longitude']
+        lats = gdata.coordinates['latitude']
     m = Basemap(llcrnrlon=lons.min(), llcrnrlat=lats.min(),
                 urcrnrlon=lons.max(), urcrnrlat=lats.max(),
                 projection=proj, resolution='l',